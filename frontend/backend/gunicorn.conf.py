@@ -0,0 +1,82 @@
+"""
+Configuración de gunicorn
+Green House Project - Sistema de Soporte
+
+La app pasa casi todo el tiempo esperando a Postgres, SendGrid, Cloudinary
+y OpenSolar, así que por defecto usa workers gthread: cada worker atiende
+GUNICORN_THREADS requests a la vez en lugar de uno. Con
+GUNICORN_WORKER_CLASS=gevent cada worker atiende hasta GEVENT_CONNECTIONS
+requests en greenlets (necesita gevent y psycogreen).
+
+Con preload (por defecto) el master importa la app una sola vez y los
+workers la heredan por fork: arrancan más rápido y comparten en memoria
+(copy-on-write) el código y los metadatos. El pool de conexiones no se
+hereda: post_fork llama a app.reset_after_fork().
+
+Variables:
+  WEB_CONCURRENCY        workers (2)
+  GUNICORN_WORKER_CLASS  sync | gthread | gevent (gthread)
+  GUNICORN_THREADS       hilos por worker con gthread (8)
+  GEVENT_CONNECTIONS     greenlets por worker con gevent (100)
+  GUNICORN_PRELOAD       importar la app en el master (true)
+  METRICS_DIR            snapshots de métricas de los workers (services/metrics.py)
+  DB_POOL_SIZE / DB_MAX_OVERFLOW  pool de SQLAlchemy por worker (ver app.py)
+"""
+
+import os
+import sys
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+worker_connections = int(os.getenv('GEVENT_CONNECTIONS', '100'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+accesslog = '-'
+errorlog = '-'
+
+# Los workers escriben aquí sus métricas y /api/metrics las suma
+metrics_dir = os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'ghp_metrics'))
+
+if worker_class == 'gevent' and preload_app:
+    # Con preload la app se importa en el master, antes de que el worker
+    # gevent haga su monkey patch: hay que parchear antes de importar nada
+    from gevent import monkey
+    monkey.patch_all()
+
+# El pool por worker debe cubrir los requests simultáneos; si no se fijó,
+# se dimensiona según la clase de worker (app.py lee estas variables)
+if worker_class == 'gthread':
+    os.environ.setdefault('DB_POOL_SIZE', str(threads))
+elif worker_class == 'gevent':
+    # Los greenlets esperan conexión en el pool en lugar de abrir cientos
+    os.environ.setdefault('DB_POOL_SIZE', '10')
+    os.environ.setdefault('DB_MAX_OVERFLOW', '20')
+
+
+def on_starting(server):
+    # Snapshots de workers de un arranque anterior
+    if os.path.isdir(metrics_dir):
+        for name in os.listdir(metrics_dir):
+            os.remove(os.path.join(metrics_dir, name))
+
+
+def post_fork(server, worker):
+    # Con preload el worker heredó el engine del master: sus conexiones no
+    # se pueden compartir entre procesos
+    app_module = sys.modules.get('app')
+    if app_module is not None:
+        app_module.reset_after_fork()
+
+    if worker_class != 'gevent':
+        return
+    # El worker gevent aplica monkey.patch_all() al iniciar, pero psycopg2
+    # es C y bloquearía el hub en cada query: esperar de forma cooperativa
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        server.log.warning("psycogreen no instalado: las queries bloquean a todos los greenlets del worker")
+        return
+    patch_psycopg()
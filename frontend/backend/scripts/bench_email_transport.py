@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark del envío de emails contra un SendGrid simulado local.
+
+Compara el cliente síncrono de sendgrid (un request por hilo, sin pool)
+con el transporte asíncrono con pool de conexiones. Los hilos imitan los
+hilos de notificación que lanzan las rutas. Con --concurrency igual a
+--threads se compara el costo por envío; con el valor por defecto (8) se
+ve el techo que impone el semáforo.
+
+Ejecutar con: python scripts/bench_email_transport.py [--emails 500] [--threads 32] [--latency-ms 50]
+"""
+
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+# Agregar el directorio src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from sendgrid import SendGridAPIClient
+from sendgrid.helpers.mail import Mail, Email, To, Content
+from services.fake_providers import fake_sendgrid
+from services.email_transport import AsyncEmailTransport
+
+
+def build_message(i):
+    return Mail(
+        from_email=Email('soporte@greenhproject.com', 'Green House Project - Soporte'),
+        to_emails=To(f'cliente{i}@example.com'),
+        subject=f'Ticket {i}',
+        html_content=Content('text/html', f'<p>Ticket {i}</p>')
+    )
+
+
+def run(label, send, emails, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        statuses = list(pool.map(send, range(emails)))
+    elapsed = time.perf_counter() - start
+    ok = sum(1 for status in statuses if status == 202)
+    print(f"{label:<28}{elapsed:>8.2f} s{emails / elapsed:>10.1f} emails/s{ok:>8}/{emails} OK")
+
+
+def serve(latency_ms, queue):
+    """El simulado corre en otro proceso para no competir por el GIL"""
+    server = fake_sendgrid(latency_ms=latency_ms)
+    queue.put(server.base_url)
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del transporte de email')
+    parser.add_argument('--emails', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--latency-ms', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=8, help='Cupo del transporte asíncrono')
+    args = parser.parse_args()
+
+    queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(args.latency_ms, queue), daemon=True)
+    server.start()
+    base_url = queue.get()
+    print(f"SendGrid simulado en {base_url} (latencia {args.latency_ms} ms)\n")
+
+    client = SendGridAPIClient('fake-key', host=base_url)
+    run('SendGridAPIClient (sync)', lambda i: client.send(build_message(i)).status_code,
+        args.emails, args.threads)
+
+    transport = AsyncEmailTransport(
+        'fake-key', api_url=f'{base_url}/v3/mail/send', max_concurrency=args.concurrency
+    )
+    run(f'AsyncEmailTransport (x{args.concurrency})',
+        lambda i: transport.send(build_message(i).get()).status_code,
+        args.emails, args.threads)
+
+    transport.close()
+    server.terminate()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Benchmarks de endpoints sobre datos sintéticos, con baseline y detección de regresiones.
+
+Corre la app en proceso (test_client, sin red) contra una base generada con
+scripts/synthetic_data.py y mide:
+
+- list_tickets: por rol, con filtros, búsqueda de texto y una página profunda;
+- get_enhanced_admin_stats (requiere PostgreSQL: usa extract('epoch'));
+- get_performance_metrics (GET /api/users/me/performance);
+- create_ticket (OpenSolar simulado, PROVIDER_MODE=fake sin latencia);
+- fix_timestamps (antes de cada ronda se vuelven a vaciar los timestamps
+  que corrige, fuera de la medición).
+
+--save guarda los resultados como baseline JSON; --compare los compara con
+uno guardado y falla (exit 1) si la mediana de algún caso empeoró más de
+--threshold (y más de --min-delta-ms, para no fallar por ruido en casos de
+1-2 ms). Comparar solo baselines del mismo tamaño, motor y máquina.
+
+Si la base está vacía se generan los datos (--tickets, --seed); se reutiliza
+en las corridas siguientes. Por defecto un SQLite en el directorio temporal.
+Cada corrida agrega los tickets de create_ticket (project_id BENCH...): para
+un baseline nuevo conviene partir de una base recién generada.
+
+Ejecutar con: python scripts/bench_endpoints.py [--tickets 10000] [--save baseline.json | --compare baseline.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+def configure_env(args):
+    """Variables que lee app.py al importarse: deben quedar antes del import"""
+    default_db = os.path.join(tempfile.gettempdir(), f'ghp_bench_{args.tickets}_{args.seed}.db')
+    os.environ.setdefault('DATABASE_URL', f'sqlite:///{default_db}')
+    os.environ.setdefault('PROVIDER_MODE', 'fake')
+    os.environ.setdefault('FAKE_PROVIDER_LATENCY_MS', '0')
+    os.environ.setdefault('QUERY_AUDIT', 'off')
+
+
+class Bench:
+    def __init__(self, backend, rounds, warmup):
+        from load_harness import TokenFactory
+        self.backend = backend
+        self.client = backend.app.test_client()
+        self.tokens = TokenFactory(backend.app.config['JWT_SECRET_KEY'])
+        self.rounds = rounds
+        self.warmup = warmup
+        self.results = {}
+
+    def request(self, method, path, user_id, body=None):
+        response = self.client.open(
+            path, method=method, json=body,
+            headers={'Authorization': f'Bearer {self.tokens.token(user_id)}'}
+        )
+        if response.status_code >= 400:
+            raise RuntimeError(f'{method} {path} -> {response.status_code}: {response.get_data(as_text=True)[:200]}')
+        return response
+
+    def run(self, name, fn, rounds=None, setup=None):
+        """Mide fn() `rounds` veces después de `warmup` rondas; setup() corre antes de cada una sin medirse"""
+        rounds = rounds or self.rounds
+        samples = []
+        try:
+            for n in range(self.warmup + rounds):
+                if setup:
+                    setup()
+                start = time.perf_counter()
+                fn(n)
+                elapsed = time.perf_counter() - start
+                if n >= self.warmup:
+                    samples.append(elapsed)
+        except Exception as e:
+            print(f"  ✗ {name:<34}{type(e).__name__}: {str(e)[:90]}")
+            self.results[name] = {'error': f'{type(e).__name__}: {e}'}
+            return
+
+        ordered = sorted(samples)
+        result = {
+            'rounds': len(samples),
+            'median_ms': statistics.median(samples) * 1000,
+            'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+            'min_ms': ordered[0] * 1000,
+            'mean_ms': statistics.fmean(samples) * 1000
+        }
+        self.results[name] = result
+        print(f"  ✓ {name:<34}{result['median_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['min_ms']:>10.2f}"
+              f"{result['rounds']:>8}")
+
+
+def sample_ids(db):
+    """Usuarios y tickets representativos de la base (la más cargada de cada rol)"""
+    from sqlalchemy import func, select
+    from models import User, Ticket, TicketStatus, UserRole
+
+    def busiest(column):
+        return db.execute(
+            select(column, func.count()).where(column.isnot(None)).group_by(column).order_by(func.count().desc()).limit(1)
+        ).first()
+
+    admin_id = db.scalar(select(User.user_id).where(User.role == UserRole.ADMIN).order_by(User.user_id).limit(1))
+    engineer_id, _ = busiest(Ticket.assigned_to)
+    client_id, _ = busiest(Ticket.client_id)
+    # Sin los que agrega create_ticket en corridas anteriores
+    total = db.scalar(select(func.count()).select_from(Ticket).where(Ticket.project_id.notlike('BENCH%')))
+    done = [TicketStatus.RESOLVED, TicketStatus.CLOSED]
+    # Lo que corrige fix_timestamps, para restaurarlo antes de cada ronda
+    missing_assigned = list(db.scalars(select(Ticket.ticket_id).where(
+        Ticket.assigned_to.isnot(None), Ticket.assigned_at.is_(None))))
+    missing_resolved = list(db.scalars(select(Ticket.ticket_id).where(
+        Ticket.status.in_(done), Ticket.resolved_at.is_(None))))
+    return {
+        'admin': admin_id, 'engineer': engineer_id, 'client': client_id, 'total': total,
+        'missing_assigned': missing_assigned, 'missing_resolved': missing_resolved
+    }
+
+
+def reset_timestamps(engine, ids):
+    from sqlalchemy import update
+    from models import Ticket
+    with engine.begin() as conn:
+        for column, ticket_ids in (('assigned_at', ids['missing_assigned']), ('resolved_at', ids['missing_resolved'])):
+            for start in range(0, len(ticket_ids), 500):
+                conn.execute(update(Ticket).where(Ticket.ticket_id.in_(ticket_ids[start:start + 500]))
+                             .values({column: None}))
+
+
+def run_cases(bench, ids, args):
+    from flask import g
+    from routes.dashboard_enhanced import get_enhanced_admin_stats
+
+    admin, engineer, client = ids['admin'], ids['engineer'], ids['client']
+    deep_page = max(1, ids['total'] // 20 - 1)
+    run_id = datetime.utcnow().strftime('%H%M%S')
+
+    print(f"  {'caso':<36}{'med ms':>10}{'p95 ms':>10}{'min ms':>10}{'rondas':>8}")
+    list_cases = (
+        ('list_tickets[admin]', '/api/tickets/?per_page=20', admin),
+        ('list_tickets[admin,filtros]', '/api/tickets/?status=in_progress&priority=high&order_by=updated_at', admin),
+        ('list_tickets[admin,busqueda]', '/api/tickets/?search=aislamiento', admin),
+        ('list_tickets[admin,pagina_profunda]', f'/api/tickets/?page={deep_page}', admin),
+        ('list_tickets[engineer]', '/api/tickets/', engineer),
+        ('list_tickets[client]', '/api/tickets/', client),
+    )
+    for name, path, user_id in list_cases:
+        bench.run(name, lambda n, path=path, user_id=user_id: bench.request('GET', path, user_id))
+
+    def admin_stats(n):
+        with bench.backend.app.app_context():
+            g.db = bench.backend.Session()
+            try:
+                get_enhanced_admin_stats()
+            finally:
+                bench.backend.Session.remove()
+    bench.run('get_enhanced_admin_stats', admin_stats)
+
+    bench.run('get_performance_metrics', lambda n: bench.request('GET', '/api/users/me/performance', engineer))
+
+    bench.run('create_ticket', lambda n: bench.request('POST', '/api/tickets/', admin, {
+        'project_id': f'BENCH{run_id}{n:05d}',
+        'category': 'inverter',
+        'priority': 'medium',
+        'title': f'Benchmark {n}',
+        'description': 'Ticket generado por scripts/bench_endpoints.py',
+        'assigned_to': engineer
+    }))
+
+    bench.run('fix_timestamps', lambda n: bench.request('POST', '/api/admin/fix-timestamps', admin),
+              rounds=args.slow_rounds, setup=lambda: reset_timestamps(bench.backend.engine, ids))
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """Casos que empeoraron; imprime la tabla contra el baseline"""
+    regressions = []
+    print(f"\n  {'caso':<36}{'base ms':>10}{'ahora ms':>10}{'cambio':>9}")
+    for name, current in results.items():
+        before = baseline['cases'].get(name)
+        if 'error' in current:
+            print(f"  ✗ {name:<34}{'error':>20}")
+            continue
+        if before is None or 'median_ms' not in before:
+            print(f"    {name:<34}{'-':>10}{current['median_ms']:>10.2f}{'nuevo':>9}")
+            continue
+        change = current['median_ms'] / before['median_ms'] - 1
+        regressed = change > threshold and current['median_ms'] - before['median_ms'] > min_delta_ms
+        if regressed:
+            regressions.append(name)
+        print(f"  {'✗' if regressed else '✓'} {name:<34}{before['median_ms']:>10.2f}{current['median_ms']:>10.2f}"
+              f"{change:>+9.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks de endpoints con baseline')
+    parser.add_argument('--tickets', type=int, default=10_000, help='Tamaño de los datos si hay que generarlos')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--rounds', type=int, default=30)
+    parser.add_argument('--slow-rounds', type=int, default=3, help='Rondas de fix_timestamps (recorre todos los tickets)')
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--save', help='Guardar los resultados como baseline JSON')
+    parser.add_argument('--compare', help='Baseline JSON con el cual comparar')
+    parser.add_argument('--threshold', type=float, default=0.20, help='Empeoramiento tolerado de la mediana')
+    parser.add_argument('--min-delta-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    configure_env(args)
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    import migrate
+    from synthetic_data import SyntheticData, is_empty
+
+    setup_engine = create_engine(os.environ['DATABASE_URL'])
+    migrate.run(setup_engine)
+    if is_empty(setup_engine):
+        print(f"Generando {args.tickets:,} tickets (semilla {args.seed})...")
+        SyntheticData(args.tickets, args.seed).generate(setup_engine)
+    with Session(setup_engine) as db:
+        ids = sample_ids(db)
+    setup_engine.dispose()
+
+    import app as backend
+    dialect = backend.engine.dialect.name
+    print(f"\n{ids['total']:,} tickets ({dialect}), {args.rounds} rondas + {args.warmup} de calentamiento\n")
+    bench = Bench(backend, args.rounds, args.warmup)
+    run_cases(bench, ids, args)
+
+    report = {
+        'meta': {
+            'tickets': ids['total'],
+            'seed': args.seed,
+            'dialect': dialect,
+            'python': platform.python_version(),
+            'machine': platform.node(),
+            'created_at': datetime.utcnow().isoformat()
+        },
+        'cases': bench.results
+    }
+    failed = [name for name, result in bench.results.items() if 'error' in result]
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Baseline guardado en {args.save}")
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        meta = baseline['meta']
+        if (meta['tickets'], meta['dialect']) != (ids['total'], dialect):
+            print(f"\n⚠ Baseline con {meta['tickets']:,} tickets en {meta['dialect']}: "
+                  f"la comparación no es equivalente")
+        regressions = compare(bench.results, baseline, args.threshold, args.min_delta_ms)
+
+    if failed:
+        print(f"\n✗ Casos con error: {', '.join(failed)}")
+    if regressions:
+        print(f"\n✗ Regresiones de más de {args.threshold:.0%}: {', '.join(regressions)}")
+    if failed or regressions:
+        return 1
+    if args.compare:
+        print(f"\n✅ Sin regresiones (umbral {args.threshold:.0%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
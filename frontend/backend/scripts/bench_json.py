@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Benchmark de serialización y compresión de una página de tickets.
+
+Arma una página como la de GET /api/tickets/ (to_dict(include_relations=True)
+con cliente, ingeniero y el blob opensolar_data) y compara:
+
+- tiempo de jsonify con DefaultJSONProvider (json de la stdlib) y con
+  OrjsonProvider (services/json_provider.py);
+- bytes en el cable sin comprimir, con gzip y con brotli (si está
+  instalado), y el tiempo de comprimir (services/compression.py).
+
+No necesita base de datos.
+
+Ejecutar con: python scripts/bench_json.py [--tickets 100] [--iterations 200]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from flask import Flask, jsonify
+from flask.json.provider import DefaultJSONProvider
+from services.json_provider import OrjsonProvider, orjson
+from services.compression import Compressor, brotli
+
+STATUSES = ('new', 'assigned', 'in_progress', 'waiting', 'resolved', 'closed')
+PRIORITIES = ('low', 'medium', 'high', 'critical')
+CATEGORIES = ('electrical', 'panels', 'inverter', 'monitoring', 'other')
+
+
+def fake_user(n, role):
+    return {
+        'user_id': f'USR-{n:08d}',
+        'email': f'{role}{n}@example.com',
+        'full_name': f'Usuario {role.title()} {n}',
+        'phone': f'+57300{n:07d}',
+        'role': role,
+        'is_active': True,
+        'created_at': (datetime(2024, 1, 1) + timedelta(days=n % 300)).isoformat()
+    }
+
+
+def fake_opensolar(n):
+    """Blob de OpenSolar como se guarda en el ticket (proyecto, sistema, componentes)"""
+    return {
+        'project_id': str(8_000_000 + n),
+        'project_name': f'Instalación residencial {n}',
+        'client_name': f'Cliente {n}',
+        'client_email': f'cliente{n}@example.com',
+        'client_phone': f'+57310{n:07d}',
+        'address': f'Calle {n % 200} # {n % 90}-{n % 70}, Bogotá',
+        'system_size_kw': round(3 + (n % 40) * 0.45, 2),
+        'panels': [
+            {'model': 'JA Solar JAM72S30', 'watts': 545, 'quantity': 8 + n % 10, 'orientation': 'sur', 'tilt': 15}
+            for _ in range(3)
+        ],
+        'inverters': [{'model': 'Fronius Primo 5.0', 'serial': f'FR{n:010d}', 'phases': 1}],
+        'batteries': [],
+        'installation_date': (datetime(2023, 6, 1) + timedelta(days=n)).date().isoformat(),
+        'notes': 'Sistema conectado a red con medición bidireccional. ' * 4
+    }
+
+
+def fake_ticket(n, engineer):
+    created = datetime(2025, 1, 1) + timedelta(hours=n * 7)
+    client = fake_user(10_000 + n, 'client')
+    return {
+        'ticket_id': f'GHP-{8_000_000 + n}-{n % 9 + 1:03d}',
+        'project_id': str(8_000_000 + n),
+        'title': f'Inversor con alarma de aislamiento {n}',
+        'description': 'El inversor muestra error de aislamiento por las mañanas con humedad. ' * 3,
+        'category': random.choice(CATEGORIES),
+        'priority': random.choice(PRIORITIES),
+        'status': random.choice(STATUSES),
+        'client_id': client['user_id'],
+        'assigned_to': engineer['user_id'],
+        'created_at': created.isoformat(),
+        'updated_at': (created + timedelta(hours=3)).isoformat(),
+        'assigned_at': (created + timedelta(minutes=40)).isoformat(),
+        'resolved_at': None,
+        'sla_response_deadline': (created + timedelta(hours=4)).isoformat(),
+        'sla_resolution_deadline': (created + timedelta(hours=24)).isoformat(),
+        'sla_response_met': True,
+        'sla_resolution_met': None,
+        'rating': None,
+        'rating_comment': None,
+        'opensolar_data': fake_opensolar(n),
+        'client': client,
+        'engineer': engineer,
+        'attachments_count': n % 4
+    }
+
+
+def fake_page(size):
+    random.seed(42)
+    engineers = [fake_user(n, 'engineer') for n in range(5)]
+    return {
+        'tickets': [fake_ticket(n, engineers[n % len(engineers)]) for n in range(size)],
+        'pagination': {'page': 1, 'per_page': size, 'total': size * 12, 'pages': 12}
+    }
+
+
+def time_jsonify(provider_cls, page, iterations):
+    app = Flask(__name__)
+    app.json = provider_cls(app)
+    samples = []
+    with app.app_context():
+        body = jsonify(page).get_data()
+        for _ in range(iterations):
+            start = time.perf_counter()
+            jsonify(page)
+            samples.append(time.perf_counter() - start)
+    return body, samples
+
+
+def time_compress(compressor, body, encoding, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        compressed = compressor.compress(body, encoding)
+        samples.append(time.perf_counter() - start)
+    return compressed, samples
+
+
+def ms(samples):
+    return f"{statistics.median(samples) * 1000:8.2f} ms (p95 {sorted(samples)[int(len(samples) * 0.95) - 1] * 1000:.2f})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serialización y compresión de una página de tickets')
+    parser.add_argument('--tickets', type=int, default=100)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    page = fake_page(args.tickets)
+    print(f"Página de {args.tickets} tickets, {args.iterations} iteraciones (mediana)\n")
+
+    print("Serialización (jsonify):")
+    default_body, default_samples = time_jsonify(DefaultJSONProvider, page, args.iterations)
+    print(f"  {'json (stdlib)':<16}{ms(default_samples)}  {len(default_body):>9,} bytes")
+    body = default_body
+    if orjson is not None:
+        orjson_body, orjson_samples = time_jsonify(OrjsonProvider, page, args.iterations)
+        speedup = statistics.median(default_samples) / statistics.median(orjson_samples)
+        print(f"  {'orjson':<16}{ms(orjson_samples)}  {len(orjson_body):>9,} bytes  ({speedup:.1f}x)")
+        body = orjson_body
+    else:
+        print("  orjson no instalado")
+
+    print("\nEn el cable:")
+    compressor = Compressor()
+    print(f"  {'sin comprimir':<16}{'':>27}  {len(body):>9,} bytes")
+    for encoding in compressor.encodings():
+        compressed, samples = time_compress(compressor, body, encoding, args.iterations)
+        print(f"  {encoding:<16}{ms(samples)}  {len(compressed):>9,} bytes  "
+              f"({len(compressed) / len(body) * 100:.1f}%)")
+    if brotli is None:
+        print("  br: módulo brotli no instalado")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
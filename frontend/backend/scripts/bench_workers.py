@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark de clases de worker de gunicorn: sync vs gthread vs gevent.
+
+Arranca gunicorn con gunicorn.conf.py una vez por clase (mismo número de
+workers), le aplica la misma carga durante --duration segundos y compara
+throughput y latencias. La carga mezcla lecturas de la API (Postgres) con
+altas de tickets (OpenSolar, SendGrid y Twilio); con PROVIDER_MODE=fake y
+scripts/fake_providers.py corriendo, la latencia de los proveedores es la
+que se configure allí.
+
+Ejecutar con: python scripts/bench_workers.py --admin-id USR-... --engineer-id USR-... [--classes sync,gthread,gevent] [--duration 30] [--concurrency 32]
+"""
+
+import os
+import sys
+import time
+import uuid
+import random
+import socket
+import argparse
+import threading
+import subprocess
+from collections import defaultdict
+
+import requests
+
+from load_harness import TokenFactory, percentile
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(app, worker_class, workers, port):
+    env = dict(os.environ, GUNICORN_WORKER_CLASS=worker_class, WEB_CONCURRENCY=str(workers), PORT=str(port))
+    process = subprocess.Popen(
+        ['gunicorn', app, '-c', 'gunicorn.conf.py', '--access-logfile', '/dev/null'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if requests.get(f'{base_url}/api/health', timeout=1).ok:
+                return process, base_url
+        except requests.RequestException:
+            pass
+        if process.poll() is not None:
+            break
+        time.sleep(0.5)
+    process.kill()
+    raise RuntimeError(f'gunicorn ({worker_class}) no arrancó')
+
+
+def run_load(base_url, tokens, args):
+    """Mezcla: 70% listado, 20% detalle, 10% alta de ticket"""
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    project = f'BENCH{uuid.uuid4().hex[:6].upper()}'
+    deadline = time.time() + args.duration
+
+    def worker(n):
+        http = requests.Session()
+        headers = {'Authorization': f'Bearer {tokens.token(args.admin_id)}'}
+        known = []
+        i = 0
+        while time.time() < deadline:
+            roll = random.random()
+            if roll < 0.1 or not known:
+                name, method, path = 'create', 'POST', '/api/tickets/'
+                body = {
+                    'project_id': f'{project}{n:03d}', 'category': 'electrical', 'priority': 'medium',
+                    'title': f'Benchmark {n}-{i}', 'description': 'scripts/bench_workers.py',
+                    'assigned_to': args.engineer_id
+                }
+            elif roll < 0.3:
+                name, method, path, body = 'get', 'GET', f'/api/tickets/{random.choice(known)}', None
+            else:
+                name, method, path, body = 'list', 'GET', '/api/tickets/?per_page=20', None
+            i += 1
+
+            start = time.perf_counter()
+            try:
+                response = http.request(method, base_url + path, json=body, headers=headers, timeout=60)
+                ok = response.status_code < 400
+            except requests.RequestException:
+                response, ok = None, False
+            elapsed = time.perf_counter() - start
+
+            with lock:
+                latencies[name].append(elapsed)
+                if not ok:
+                    errors[name] += 1
+            if ok and name == 'create':
+                known.append(response.json()['ticket']['ticket_id'])
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de clases de worker de gunicorn')
+    parser.add_argument('--app', default='wsgi:app')
+    parser.add_argument('--admin-id', required=True)
+    parser.add_argument('--engineer-id', required=True)
+    parser.add_argument('--classes', default='sync,gthread,gevent')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--duration', type=int, default=30)
+    parser.add_argument('--concurrency', type=int, default=32)
+    args = parser.parse_args()
+
+    tokens = TokenFactory(os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production'))
+    print(f"{args.workers} workers, {args.concurrency} clientes, {args.duration} s por clase\n")
+    print(f"{'Clase':<10}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errores':>9}")
+
+    for worker_class in args.classes.split(','):
+        process, base_url = start_gunicorn(args.app, worker_class, args.workers, free_port())
+        try:
+            latencies, errors, elapsed = run_load(base_url, tokens, args)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+        values = [v for series in latencies.values() for v in series]
+        print(f"{worker_class:<10}{len(values) / elapsed:>9.1f}{percentile(values, 0.5) * 1000:>9.0f}"
+              f"{percentile(values, 0.95) * 1000:>9.0f}{percentile(values, 0.99) * 1000:>9.0f}"
+              f"{sum(errors.values()):>9}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
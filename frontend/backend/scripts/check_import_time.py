@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Presupuesto de tiempo de importación de la app (python -X importtime).
+
+Importa app.py en un proceso nuevo y falla (exit 1) si:
+- la importación supera --budget-ms, o
+- se cargó alguno de los SDK que deben cargarse solo en el primer uso
+  (ver services/registry.py): sendgrid, cloudinary, aiohttp, o
+- el registro ya construyó las plantillas de email (Environment de jinja2,
+  services/email_templates.py). jinja2 en sí no sirve de indicador: Flask
+  siempre lo importa.
+
+Pensado para correr en CI junto a scripts/email_templates.py snapshots.
+
+Ejecutar con: python scripts/check_import_time.py [--budget-ms 1500] [--top 15]
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# Se cargan en el primer envío/subida, nunca al importar la app
+LAZY_MODULES = ('sendgrid', 'cloudinary', 'aiohttp')
+# Servicios del registro que no deben quedar construidos tras el import
+LAZY_SERVICES = ('email_templates',)
+
+
+def parse_importtime(stderr):
+    """Líneas 'import time: self | cumulative | módulo' -> [(módulo, self µs, acumulado µs, nivel)]"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        level = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), level))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Presupuesto de importación de app.py')
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('IMPORT_TIME_BUDGET_MS', '1500')))
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', 'sqlite://')  # Importar no toca la base de datos
+    # Tras importar, el proceso imprime el estado del registro (construido o no)
+    code = (f'import {args.module}, json; from services.registry import registry; '
+            f'print(json.dumps(registry.status()))')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=SRC_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        print(result.stderr[-3000:])
+        print(f"✗ import {args.module} falló")
+        return 1
+
+    rows = parse_importtime(result.stderr)
+    total_ms = next(cumulative for name, _, cumulative, _ in reversed(rows) if name == args.module) / 1000
+
+    print(f"{'Módulo':<48}{'acumulado ms':>14}")
+    top_level = sorted((r for r in rows if r[3] <= 1), key=lambda r: r[2], reverse=True)
+    for name, _, cumulative, _ in top_level[:args.top]:
+        print(f"{name:<48}{cumulative / 1000:>14.1f}")
+
+    failures = []
+    loaded = sorted({name.split('.')[0] for name, *_ in rows} & set(LAZY_MODULES))
+    if loaded:
+        failures.append(f"se importan al arrancar: {', '.join(loaded)} (deben cargarse en el primer uso)")
+    built = json.loads(result.stdout.strip().splitlines()[-1])
+    eager = [name for name in LAZY_SERVICES if built.get(name)]
+    if eager:
+        failures.append(f"se construyen al arrancar: {', '.join(eager)} (deben construirse en el primer uso)")
+    if total_ms > args.budget_ms:
+        failures.append(f"import {args.module} tarda {total_ms:.0f} ms (presupuesto {args.budget_ms:.0f} ms)")
+
+    print(f"\nimport {args.module}: {total_ms:.0f} ms (presupuesto {args.budget_ms:.0f} ms)")
+    for failure in failures:
+        print(f"✗ {failure}")
+    if not failures:
+        print("✅ Dentro del presupuesto")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Verifica presupuestos de queries y N+1 contra un backend con QUERY_AUDIT.
+
+Levantar el backend con QUERY_AUDIT=warn (o strict) y recorrer rutas GET
+con un usuario de cada rol. Para cada respuesta lee X-Query-Count,
+X-Query-Budget y X-Query-Audit (ver services/query_audit.py) y falla
+(exit 1) si alguna ruta excedió su @query_budget o repitió una misma query
+más de QUERY_AUDIT_THRESHOLD veces. El detalle (sentencia y línea de
+origen) queda en el log del backend con el prefijo [QUERY_AUDIT].
+
+Ejecutar con: python scripts/check_query_budgets.py --user-id USR-... [--user-id USR-...] [--ticket-id GHP-...]
+"""
+
+import os
+import sys
+import argparse
+
+import requests
+
+from load_harness import TokenFactory
+
+# {ticket_id} se reemplaza por --ticket-id; sin él esas rutas se omiten
+PATHS = (
+    '/api/users/me',
+    '/api/users/me/notification-preferences',
+    '/api/users/me/performance',
+    '/api/tickets/?per_page=20',
+    '/api/dashboard/stats',
+    '/api/tickets/{ticket_id}',
+    '/api/tickets/{ticket_id}/history',
+    '/api/attachments/ticket/{ticket_id}',
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Presupuestos de queries por ruta')
+    parser.add_argument('--base-url', default=os.getenv('API_URL', 'http://127.0.0.1:5000'))
+    parser.add_argument('--user-id', action='append', required=True, help='Repetible: un usuario por rol')
+    parser.add_argument('--ticket-id')
+    parser.add_argument('--path', action='append', help='Rutas adicionales')
+    args = parser.parse_args()
+
+    tokens = TokenFactory(os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production'))
+    paths = [p for p in PATHS + tuple(args.path or ()) if args.ticket_id or '{ticket_id}' not in p]
+    http = requests.Session()
+    failures = 0
+    audited = False
+
+    print(f"{'Usuario':<16}{'Ruta':<44}{'HTTP':>6}{'queries':>9}{'budget':>8}  auditoría")
+    for user_id in args.user_id:
+        headers = {'Authorization': f'Bearer {tokens.token(user_id)}'}
+        for path in paths:
+            path = path.format(ticket_id=args.ticket_id)
+            response = http.get(args.base_url.rstrip('/') + path, headers=headers, timeout=60)
+            count = response.headers.get('X-Query-Count')
+            audited = audited or count is not None
+            issues = response.headers.get('X-Query-Audit', '')
+            if issues:
+                failures += 1
+            print(f"{user_id[:15]:<16}{path[:43]:<44}{response.status_code:>6}{count or '-':>9}"
+                  f"{response.headers.get('X-Query-Budget', '-'):>8}  {'✗ ' + issues if issues else '✓'}")
+
+    if not audited:
+        print("\n✗ El backend no devuelve X-Query-Count: arrancarlo con QUERY_AUDIT=warn")
+        return 1
+    if failures:
+        print(f"\n✗ {failures} respuestas con problemas (detalle en el log del backend, [QUERY_AUDIT])")
+        return 1
+    print("\n✅ Todas las rutas dentro de presupuesto y sin N+1")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Herramientas para las plantillas de email.
+
+  snapshots  Renderiza cada notificación con datos fijos y compara contra
+             scripts/email_snapshots/ (--update para regenerarlos).
+             Sale con código 1 si alguna difiere.
+  bench      Mide el tiempo de render por notificación.
+
+Ejecutar con: python scripts/email_templates.py snapshots [--update]
+              python scripts/email_templates.py bench [--iterations 2000]
+"""
+
+import os
+import sys
+import time
+import argparse
+import difflib
+
+# Agregar el directorio src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from services.email_templates import EmailTemplateEngine
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'email_snapshots')
+
+# URLs fijas para que los snapshots no dependan del entorno
+os.environ['FRONTEND_URL'] = 'https://soporte-frontend-ghp.vercel.app'
+os.environ['BACKEND_URL'] = 'https://soporte-backend-ghp.up.railway.app'
+
+# Un contexto por notificación; incluye HTML en campos del usuario
+# para que el snapshot deje ver el auto-escape
+FIXTURES = {
+    'ticket_created': {
+        'ticket_id': '8177994-001',
+        'ticket_title': 'Inversor no enciende',
+        'client_name': 'María Pérez',
+        'priority': 'high',
+        'category': 'electrical',
+        'description': 'El inversor muestra <b>error 42</b> & no arranca <script>alert(1)</script>'
+    },
+    'assignment': {
+        'ticket_id': '8177994-001',
+        'ticket_title': 'Inversor no enciende',
+        'engineer_name': 'Carlos Gómez',
+        'client_name': 'María Pérez',
+        'priority': 'critical',
+        'category': 'electrical'
+    },
+    'status_change': {
+        'ticket_id': '8177994-001',
+        'ticket_title': 'Inversor no enciende',
+        'client_name': 'María Pérez',
+        'changed_by': 'Carlos Gómez',
+        'old_status': 'Asignado',
+        'new_status': 'En Progreso'
+    },
+    'password_reset': {
+        'to_email': 'maria@example.com',
+        'user_name': 'María Pérez',
+        'reset_url': 'https://soporte-frontend-ghp.vercel.app/reset-password?token=abc123&email=maria@example.com'
+    },
+    'rating_request': {
+        'ticket_id': '8177994-001',
+        'ticket_title': 'Inversor no enciende',
+        'client_name': 'María Pérez',
+        'engineer_name': 'Carlos Gómez',
+        'rating_labels': ((1, 'Muy Malo'), (2, 'Malo'), (3, 'Regular'), (4, 'Bueno'), (5, 'Excelente'))
+    },
+    'comment': {
+        'ticket_id': '8177994-001',
+        'ticket_title': 'Inversor no enciende',
+        'commenter_name': 'Carlos Gómez',
+        'comment_content': 'Revisé el <i>breaker</i>; vuelvo mañana "temprano"',
+        'recipient_name': 'María Pérez',
+        'comment_type': 'Público'
+    },
+    'digest': {
+        'user_name': 'María Pérez',
+        'tickets': [
+            {
+                'ticket_id': '8177994-001',
+                'ticket_title': 'Inversor no enciende',
+                'events': [
+                    {'time': '09:15', 'description': 'Ticket asignado'},
+                    {'time': '10:02', 'description': 'Estado: Asignado → En Progreso'}
+                ]
+            },
+            {
+                'ticket_id': '8177994-002',
+                'ticket_title': 'Panel <roto> & sucio',
+                'events': [{'time': '16:40', 'description': 'Nuevo comentario'}]
+            }
+        ]
+    },
+}
+
+
+def snapshots(engine, update):
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    failures = 0
+
+    for name, (html, text) in engine.render_all(FIXTURES).items():
+        for ext, rendered in (('html', html), ('txt', text)):
+            path = os.path.join(SNAPSHOT_DIR, f'{name}.{ext}')
+            if update or not os.path.exists(path):
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(rendered)
+                print(f"  ✓ {name}.{ext} escrito")
+                continue
+
+            with open(path, encoding='utf-8') as f:
+                expected = f.read()
+            if rendered == expected:
+                print(f"  ✓ {name}.{ext}")
+            else:
+                failures += 1
+                print(f"  ✗ {name}.{ext} difiere del snapshot:")
+                sys.stdout.writelines(difflib.unified_diff(
+                    expected.splitlines(keepends=True), rendered.splitlines(keepends=True),
+                    fromfile=f'snapshot/{name}.{ext}', tofile=f'render/{name}.{ext}'
+                ))
+
+    if failures:
+        print(f"\n❌ {failures} snapshots difieren (usar --update si el cambio es intencional)")
+        return 1
+    print("\n✅ Snapshots OK")
+    return 0
+
+
+def bench(engine, iterations):
+    start = time.perf_counter()
+    EmailTemplateEngine()
+    print(f"Compilación de todas las plantillas: {(time.perf_counter() - start) * 1000:.1f} ms\n")
+
+    print(f"{'Notificación':<18}{'µs/render':>12}")
+    for name, context in FIXTURES.items():
+        engine.render(name, **context)  # warm-up
+        start = time.perf_counter()
+        for _ in range(iterations):
+            engine.render(name, **context)
+        per_render = (time.perf_counter() - start) / iterations * 1_000_000
+        print(f"{name:<18}{per_render:>12.1f}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Snapshots y benchmark de plantillas de email')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    snapshot_parser = subparsers.add_parser('snapshots')
+    snapshot_parser.add_argument('--update', action='store_true', help='Regenerar los snapshots')
+    bench_parser = subparsers.add_parser('bench')
+    bench_parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    engine = EmailTemplateEngine()
+    if args.command == 'snapshots':
+        return snapshots(engine, args.update)
+    return bench(engine, args.iterations)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
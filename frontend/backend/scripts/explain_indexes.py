@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Verifica con EXPLAIN que las consultas calientes usan los índices de la
+migración 005 (query_shape_indexes en src/migrate.py).
+
+Cada caso reproduce la consulta de una ruta con los mismos filtros y orden
+y falla (exit 1) si el plan no usa el índice esperado. Con pocas filas el
+planner prefiere un seq scan y el resultado no dice nada: correr contra una
+base con 100k+ tickets (--seed 120000 los genera en una base vacía con
+scripts/synthetic_data.py).
+
+Funciona con PostgreSQL (EXPLAIN (FORMAT JSON)) y SQLite (EXPLAIN QUERY PLAN).
+¡No usar --seed contra producción!
+
+Ejecutar con: DATABASE_URL=postgresql://.../ghp_bench python scripts/explain_indexes.py [--seed 120000] [--analyze]
+"""
+
+import os
+import sys
+import json
+import argparse
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+from models import Ticket, TicketHistory, TicketStatus
+from synthetic_data import SyntheticData, is_empty
+import migrate
+
+ACTIVE = [TicketStatus.NEW, TicketStatus.ASSIGNED, TicketStatus.IN_PROGRESS, TicketStatus.WAITING]
+MIN_ROWS = 100_000
+
+
+def get_database_url():
+    """Obtiene la URL de la base de datos desde las variables de entorno"""
+    return os.environ.get('DATABASE_URL', 'sqlite:///soporte.db')
+
+
+# ----------------------------------------------------------------------
+# Casos: (nombre, ruta, consulta, índice esperado)
+# ----------------------------------------------------------------------
+def build_cases(db):
+    engineer_ids = list(db.scalars(select(Ticket.assigned_to).where(Ticket.assigned_to.isnot(None)).distinct().limit(10)))
+    client_id = db.scalar(select(Ticket.client_id).limit(1))
+    project_id = db.scalar(select(Ticket.project_id).limit(1))
+    ticket_id = db.scalar(select(Ticket.ticket_id).where(Ticket.assigned_to.isnot(None)).limit(1))
+    now = datetime.utcnow()
+
+    return [
+        ('carga por ingeniero', 'get_available_engineer',
+         select(Ticket.assigned_to, func.count(Ticket.ticket_id))
+         .where(Ticket.assigned_to.in_(engineer_ids), Ticket.status.in_(ACTIVE))
+         .group_by(Ticket.assigned_to),
+         'idx_tickets_assignee_status'),
+        ('listado del cliente', 'GET /api/tickets/ (cliente)',
+         select(Ticket).where(Ticket.client_id == client_id).order_by(Ticket.created_at.desc()).limit(20),
+         'idx_tickets_client_created'),
+        ('numeración por proyecto', 'POST /api/tickets/',
+         select(func.count()).select_from(Ticket).where(Ticket.project_id == project_id),
+         'idx_tickets_project'),
+        ('tickets vencidos', 'get_enhanced_admin_stats',
+         select(func.count()).select_from(Ticket)
+         .where(Ticket.status.in_(ACTIVE), Ticket.sla_resolution_deadline < now),
+         'idx_tickets_status_deadline'),
+        ('calificaciones recientes', 'GET /api/users/me/performance',
+         select(Ticket).where(Ticket.assigned_to == engineer_ids[0], Ticket.rating.isnot(None))
+         .order_by(Ticket.updated_at.desc()).limit(10),
+         'idx_tickets_rated_by_assignee'),
+        ('historial', 'GET /api/tickets/<id>/history',
+         select(TicketHistory).where(TicketHistory.ticket_id == ticket_id).order_by(TicketHistory.created_at.desc()),
+         'idx_history_ticket_created'),
+        ('primer evento de una acción', 'POST /api/admin/fix-timestamps',
+         select(TicketHistory).where(TicketHistory.ticket_id == ticket_id, TicketHistory.action == 'ticket_assigned')
+         .order_by(TicketHistory.created_at.asc()).limit(1),
+         'idx_history_ticket_action'),
+    ]
+
+
+def plan(conn, statement, analyze):
+    """(índices usados, plan en texto, ms de ejecución o None)"""
+    sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True}))
+    if conn.dialect.name == 'postgresql':
+        options = 'ANALYZE, BUFFERS, FORMAT JSON' if analyze else 'FORMAT JSON'
+        raw = conn.exec_driver_sql(f'EXPLAIN ({options}) {sql}').scalar()
+        root = (raw if isinstance(raw, list) else json.loads(raw))[0]
+        indexes, lines = set(), []
+
+        def walk(node, depth=0):
+            if 'Index Name' in node:
+                indexes.add(node['Index Name'])
+            lines.append(f"{'  ' * depth}{node['Node Type']} {node.get('Index Name', node.get('Relation Name', ''))}".rstrip())
+            for child in node.get('Plans', []):
+                walk(child, depth + 1)
+
+        walk(root['Plan'])
+        return indexes, lines, root.get('Execution Time')
+
+    rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}').fetchall()
+    lines = [row[-1] for row in rows]
+    indexes = {word for line in lines for word in line.replace('(', ' ').split() if word.startswith('idx_')}
+    elapsed = None
+    if analyze:
+        start = time.perf_counter()
+        conn.exec_driver_sql(sql).fetchall()
+        elapsed = (time.perf_counter() - start) * 1000
+    return indexes, lines, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EXPLAIN de las consultas calientes')
+    parser.add_argument('--seed', type=int, default=0, help='Generar N tickets antes (base vacía)')
+    parser.add_argument('--analyze', action='store_true', help='Ejecutar las consultas y medir tiempo')
+    parser.add_argument('--verbose', action='store_true', help='Mostrar el plan completo')
+    args = parser.parse_args()
+
+    engine = create_engine(get_database_url())
+    migrate.run(engine)
+
+    if args.seed:
+        if not is_empty(engine):
+            print("✗ --seed necesita una base sin tickets")
+            return 1
+        print(f"Generando {args.seed:,} tickets...")
+        SyntheticData(args.seed).generate(engine)
+
+    failures = 0
+    with Session(engine) as db:
+        total = db.scalar(select(func.count()).select_from(Ticket))
+        print(f"\n{total:,} tickets ({engine.dialect.name})")
+        if total < MIN_ROWS:
+            print(f"⚠ Menos de {MIN_ROWS:,} tickets: el planner puede preferir seq scan (usar --seed)")
+
+        conn = db.connection()
+        for name, route, statement, expected in build_cases(db):
+            indexes, lines, elapsed = plan(conn, statement, args.analyze)
+            ok = expected in indexes
+            failures += not ok
+            timing = f"  {elapsed:.2f} ms" if elapsed is not None else ''
+            print(f"{'✓' if ok else '✗'} {name:<30}{route:<34}{expected}{timing}")
+            if args.verbose or not ok:
+                for line in lines:
+                    print(f"      {line}")
+
+    if failures:
+        print(f"\n✗ {failures} consultas no usan el índice esperado")
+        return 1
+    print("\n✅ Todas las consultas usan su índice")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Servidor local que imita SendGrid, Twilio y Cloudinary para pruebas de carga.
+
+Arrancar el backend con:
+  PROVIDER_MODE=fake FAKE_PROVIDERS_URL=http://127.0.0.1:8025
+OpenSolar se simula dentro del backend (FAKE_PROVIDER_LATENCY_MS,
+FAKE_PROVIDER_ERROR_RATE, FAKE_PROVIDER_RATE_LIMIT).
+
+Los contadores de llamadas se consultan en GET /__counts.
+
+Ejecutar con: python scripts/fake_providers.py [--port 8025] [--latency-ms 80] [--error-rate 0.01] [--rate-limit 100]
+"""
+
+import os
+import sys
+import argparse
+
+# Agregar el directorio src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from services.fake_providers import fake_server
+
+def main():
+    parser = argparse.ArgumentParser(description='SendGrid, Twilio y Cloudinary simulados')
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--latency-ms', type=int, default=80)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fracción de requests que responden 500')
+    parser.add_argument('--rate-limit', type=int, help='Requests por segundo antes de responder 429')
+    args = parser.parse_args()
+
+    server = fake_server(
+        latency_ms=args.latency_ms,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        port=args.port
+    )
+    print(f"✓ Proveedores simulados en {server.base_url} "
+          f"(latencia {args.latency_ms} ms, errores {args.error_rate:.0%}, límite {args.rate_limit or '-'} req/s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("\nLlamadas recibidas:")
+        for key, count in sorted(server.counts.items()):
+            print(f"  {key:<50}{count:>8}")
+
+if __name__ == '__main__':
+    main()
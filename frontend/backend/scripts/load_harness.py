@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga del ciclo de vida de un ticket con proveedores simulados.
+
+Cada ciclo: el admin crea el ticket (consulta OpenSolar y notifica por
+WhatsApp/email), el ingeniero lo pasa a en progreso y lo resuelve, y el
+cliente lo califica. Cada ciclo usa un project_id propio para no chocar con
+la numeración de tickets por proyecto.
+
+Preparación:
+  python scripts/fake_providers.py --latency-ms 80 &
+  PROVIDER_MODE=fake FAKE_PROVIDERS_URL=http://127.0.0.1:8025 ./startup.sh
+
+Al final se informa el throughput, p50/p95 por endpoint, la saturación
+estimada de los workers (ley de Little: req/s x latencia media / capacidad)
+y las llamadas salientes a cada proveedor.
+
+Ejecutar con: python scripts/load_harness.py --admin-id USR-... --engineer-id USR-... [--lifecycles 200] [--concurrency 16]
+"""
+
+import os
+import sys
+import time
+import uuid
+import argparse
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+
+
+class TokenFactory:
+    """Firma tokens con el mismo JWT_SECRET_KEY que el backend"""
+
+    def __init__(self, secret):
+        self.app = Flask(__name__)
+        self.app.config['JWT_SECRET_KEY'] = secret
+        JWTManager(self.app)
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def token(self, user_id):
+        with self._lock:
+            if user_id not in self._cache:
+                with self.app.app_context():
+                    self._cache[user_id] = create_access_token(identity=user_id)
+            return self._cache[user_id]
+
+
+class Harness:
+    def __init__(self, base_url, tokens, admin_id, engineer_id):
+        self.base_url = base_url.rstrip('/')
+        self.tokens = tokens
+        self.admin_id = admin_id
+        self.engineer_id = engineer_id
+        self.run_id = uuid.uuid4().hex[:6].upper()
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def http(self):
+        # Una sesión (keep-alive) por hilo
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def call(self, name, method, path, user_id, body=None):
+        start = time.perf_counter()
+        try:
+            response = self.http.request(
+                method, f'{self.base_url}/api/tickets{path}', json=body, timeout=30,
+                headers={'Authorization': f'Bearer {self.tokens.token(user_id)}'}
+            )
+            status = response.status_code
+        except requests.RequestException as e:
+            response, status = None, type(e).__name__
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.latencies[name].append(elapsed)
+            if response is None or status >= 400:
+                self.errors[f'{name} {status}'] += 1
+        if response is None or status >= 400:
+            return None
+        return response.json()
+
+    def lifecycle(self, n):
+        created = self.call('create', 'POST', '/', self.admin_id, {
+            'project_id': f'LOAD{self.run_id}{n:05d}',
+            'category': 'electrical',
+            'priority': 'medium',
+            'title': f'Prueba de carga {n}',
+            'description': 'Ticket generado por scripts/load_harness.py',
+            'assigned_to': self.engineer_id
+        })
+        if not created:
+            return False
+        ticket = created['ticket']
+        ticket_id = ticket['ticket_id']
+        client_id = ticket['client_id']
+
+        steps = (
+            ('get', 'GET', f'/{ticket_id}', client_id, None),
+            ('status', 'POST', f'/{ticket_id}/status', self.engineer_id, {'status': 'in_progress'}),
+            ('resolve', 'POST', f'/{ticket_id}/resolve', self.engineer_id,
+             {'resolution_notes': 'Resuelto en prueba de carga'}),
+            ('rate', 'POST', f'/{ticket_id}/rate', client_id, {'rating': 5, 'comment': 'Prueba de carga'})
+        )
+        for step in steps:
+            if self.call(*step) is None:
+                return False
+        return True
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def fake_counts(url):
+    """Contadores del servidor de proveedores simulados (SendGrid, Twilio, Cloudinary)"""
+    try:
+        return Counter(requests.get(f'{url}/__counts', timeout=5).json())
+    except requests.RequestException:
+        return None
+
+
+def in_process_counts(base_url, samples):
+    """
+    Llamadas simuladas dentro del backend (OpenSolar) y colas de salida, por worker
+    Cada request cae en un worker cualquiera: se muestrea varias veces y se
+    suma el último valor de cada pid.
+    """
+    per_pid = {}
+    for _ in range(samples):
+        try:
+            data = requests.get(f'{base_url}/api/debug/providers', timeout=5).json()
+        except (requests.RequestException, ValueError):
+            return None
+        per_pid[data['pid']] = data
+    totals = Counter()
+    outbox = Counter()
+    whatsapp = Counter()
+    for data in per_pid.values():
+        totals.update(data.get('in_process', {}))
+        outbox.update(data.get('email_outbox', {}).get('stats', {}))
+        whatsapp.update(data.get('whatsapp', {}).get('stats', {}))
+    return len(per_pid), totals, outbox, whatsapp
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga del ciclo de vida de tickets')
+    parser.add_argument('--base-url', default=os.getenv('API_URL', 'http://127.0.0.1:5000'))
+    parser.add_argument('--fake-url', default=os.getenv('FAKE_PROVIDERS_URL', 'http://127.0.0.1:8025'))
+    parser.add_argument('--admin-id', required=True, help='user_id de un administrador')
+    parser.add_argument('--engineer-id', required=True, help='user_id del ingeniero asignado')
+    parser.add_argument('--lifecycles', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--capacity', type=int, default=int(os.getenv('WEB_CONCURRENCY', '4')),
+                        help='Requests simultáneos que atiende el backend (workers x hilos)')
+    args = parser.parse_args()
+
+    tokens = TokenFactory(os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production'))
+    harness = Harness(args.base_url, tokens, args.admin_id, args.engineer_id)
+    before = fake_counts(args.fake_url)
+
+    print(f"Ciclos: {args.lifecycles}  concurrencia: {args.concurrency}  backend: {args.base_url}\n")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        completed = sum(pool.map(harness.lifecycle, range(args.lifecycles)))
+    elapsed = time.perf_counter() - start
+
+    total_requests = sum(len(values) for values in harness.latencies.values())
+    busy = sum(sum(values) for values in harness.latencies.values())
+    rps = total_requests / elapsed
+    print(f"{'Endpoint':<12}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for name, values in harness.latencies.items():
+        print(f"{name:<12}{len(values):>7}{percentile(values, 0.5) * 1000:>10.1f}"
+              f"{percentile(values, 0.95) * 1000:>10.1f}{max(values) * 1000:>10.1f}")
+
+    print(f"\nCiclos completos: {completed}/{args.lifecycles} en {elapsed:.1f} s "
+          f"({completed / elapsed:.1f} ciclos/s, {rps:.1f} req/s)")
+    # Ley de Little: requests en curso = llegada x tiempo en el sistema
+    in_flight = busy / elapsed
+    print(f"Requests en curso (promedio): {in_flight:.1f} de {args.capacity} "
+          f"→ saturación estimada {in_flight / args.capacity:.0%}")
+
+    if harness.errors:
+        print("\nErrores:")
+        for key, count in harness.errors.most_common():
+            print(f"  {key:<40}{count:>6}")
+
+    print("\nLlamadas salientes")
+    after = fake_counts(args.fake_url)
+    if before is not None and after is not None:
+        for key, count in sorted((after - before).items()):
+            print(f"  {key:<48}{count:>8}")
+    else:
+        print(f"  (sin acceso a {args.fake_url}/__counts)")
+
+    sampled = in_process_counts(args.base_url, samples=max(8, args.capacity * 4))
+    if sampled is None:
+        print("  (sin /api/debug/providers: ¿PROVIDER_MODE=fake?)")
+    else:
+        workers, totals, outbox, whatsapp = sampled
+        for key, count in sorted(totals.items()):
+            print(f"  {key:<48}{count:>8}")
+        print(f"  Cola de email ({workers} workers vistos, acumulado): {dict(outbox)}")
+        print(f"  Cola de WhatsApp ({workers} workers vistos, acumulado): {dict(whatsapp)}")
+
+    return 0 if completed == args.lifecycles else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Perfil de carga mixto: el tráfico real de la app a concurrencia creciente.
+
+Cada usuario virtual elige en cada iteración un perfil según --mix y hace
+una acción con su pausa de "lectura" (--think-ms, exponencial):
+
+  client     lista sus tickets, abre uno o crea uno en un proyecto propio
+  engineer   consulta su lista (polling), abre un ticket, cambia el estado
+             de uno de los suyos (in_progress <-> waiting)
+  admin      carga el dashboard y la lista completa
+  public     clic en el enlace de calificación rápida del email (rate-quick)
+
+Arranca gunicorn (gunicorn.conf.py) con PROVIDER_MODE=fake y el servidor de
+proveedores simulados en este mismo proceso, contra la base de DATABASE_URL
+(generarla con scripts/synthetic_data.py; los usuarios y tickets se toman de
+ahí). Con --base-url usa un backend ya levantado.
+
+Por nivel de concurrencia informa throughput, p50/p95/p99 y tasa de error
+por endpoint, y la saturación del pool de la base leída de /api/metrics
+(conexiones en uso vs. tamaño del pool, overflow y espera por conexión),
+para dimensionar workers, hilos y pools.
+
+Ejecutar con: DATABASE_URL=... python scripts/load_profile.py [--levels 4,8,16,32,64] [--duration 30] [--workers 2] [--worker-class gthread]
+"""
+
+import os
+import sys
+import json
+import time
+import re
+import random
+import argparse
+import threading
+from collections import Counter, defaultdict
+
+import requests
+
+from load_harness import TokenFactory, percentile
+from bench_workers import free_port, start_gunicorn
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+DEFAULT_MIX = 'client=45,engineer=35,admin=8,public=12'
+LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+# ----------------------------------------------------------------------
+# Datos de la base: quién participa y sobre qué tickets
+# ----------------------------------------------------------------------
+def load_population(database_url, clients, engineers):
+    from sqlalchemy import create_engine, func, select
+    from sqlalchemy.orm import Session
+    from models import User, Ticket, TicketStatus, UserRole
+
+    engine = create_engine(database_url)
+    with Session(engine) as db:
+        def busiest(column, role, limit):
+            return list(db.scalars(
+                select(column).join(User, User.user_id == column).where(User.role == role)
+                .group_by(column).order_by(func.count().desc()).limit(limit)
+            ))
+
+        admins = list(db.scalars(select(User.user_id).where(User.role == UserRole.ADMIN, User.is_active == True)))
+        client_ids = busiest(Ticket.client_id, UserRole.CLIENT, clients)
+        engineer_ids = busiest(Ticket.assigned_to, UserRole.ENGINEER, engineers)
+
+        projects = dict(db.execute(select(User.user_id, User.opensolar_project_ids).where(User.user_id.in_(client_ids))).all())
+        own_tickets = defaultdict(list)
+        for client_id, ticket_id in db.execute(
+                select(Ticket.client_id, Ticket.ticket_id).where(Ticket.client_id.in_(client_ids))):
+            own_tickets[client_id].append(ticket_id)
+        assigned = defaultdict(list)
+        for engineer_id, ticket_id in db.execute(
+                select(Ticket.assigned_to, Ticket.ticket_id).where(
+                    Ticket.assigned_to.in_(engineer_ids),
+                    Ticket.status.in_([TicketStatus.IN_PROGRESS, TicketStatus.WAITING]))):
+            assigned[engineer_id].append(ticket_id)
+        # Resueltos sin calificar: los que reciben el email de calificación
+        to_rate = list(db.scalars(
+            select(Ticket.ticket_id).where(Ticket.status.in_([TicketStatus.RESOLVED, TicketStatus.CLOSED]),
+                                           Ticket.rating.is_(None))
+            .order_by(Ticket.resolved_at.desc()).limit(5000)
+        ))
+    engine.dispose()
+
+    if not (admins and client_ids and engineer_ids):
+        raise RuntimeError('La base no tiene admins, clientes e ingenieros con tickets (ver scripts/synthetic_data.py)')
+    return {
+        'admins': admins,
+        'clients': [(c, projects.get(c) or [], own_tickets[c]) for c in client_ids],
+        'engineers': [(e, assigned[e]) for e in engineer_ids],
+        'to_rate': to_rate
+    }
+
+
+# ----------------------------------------------------------------------
+# Carga
+# ----------------------------------------------------------------------
+class Workload:
+    def __init__(self, base_url, tokens, population, mix, think_ms):
+        self.base_url = base_url
+        self.tokens = tokens
+        self.population = population
+        self.profiles = list(mix)
+        self.weights = list(mix.values())
+        self.think = think_ms / 1000
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self._lock = threading.Lock()
+
+    def reset(self):
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+
+    def call(self, http, name, method, path, user_id=None, body=None):
+        headers = {'Authorization': f'Bearer {self.tokens.token(user_id)}'} if user_id else {}
+        start = time.perf_counter()
+        try:
+            # rate-quick redirige al frontend: no seguir la redirección
+            response = http.request(method, self.base_url + path, json=body, headers=headers,
+                                    timeout=60, allow_redirects=False)
+            status = response.status_code
+        except requests.RequestException as e:
+            response, status = None, type(e).__name__
+        elapsed = time.perf_counter() - start
+        failed = response is None or status >= 400
+        with self._lock:
+            self.latencies[name].append(elapsed)
+            if failed:
+                self.errors[(name, status)] += 1
+        return None if failed else response
+
+    def client(self, http, rng, n):
+        client_id, projects, tickets = rng.choice(self.population['clients'])
+        roll = rng.random()
+        if roll < 0.6 or not tickets:
+            self.call(http, 'client:list', 'GET', '/api/tickets/?per_page=20', client_id)
+        elif roll < 0.9 or not projects:
+            self.call(http, 'client:detail', 'GET', f'/api/tickets/{rng.choice(tickets)}', client_id)
+        else:
+            self.call(http, 'client:create', 'POST', '/api/tickets/', client_id, {
+                'project_id': rng.choice(projects),
+                'category': 'inverter',
+                'priority': rng.choice(('low', 'medium', 'medium', 'high')),
+                'title': f'Perfil de carga {n}',
+                'description': 'Ticket generado por scripts/load_profile.py'
+            })
+
+    def engineer(self, http, rng, n):
+        engineer_id, tickets = rng.choice(self.population['engineers'])
+        roll = rng.random()
+        if roll < 0.7 or not tickets:
+            self.call(http, 'engineer:poll', 'GET', '/api/tickets/?per_page=20&order_by=updated_at', engineer_id)
+        elif roll < 0.8:
+            self.call(http, 'engineer:detail', 'GET', f'/api/tickets/{rng.choice(tickets)}', engineer_id)
+        else:
+            self.call(http, 'engineer:status', 'POST', f'/api/tickets/{rng.choice(tickets)}/status', engineer_id,
+                      {'status': rng.choice(('in_progress', 'waiting')), 'notes': 'load_profile'})
+
+    def admin(self, http, rng, n):
+        admin_id = rng.choice(self.population['admins'])
+        if rng.random() < 0.6:
+            self.call(http, 'admin:dashboard', 'GET', '/api/dashboard/stats', admin_id)
+        else:
+            self.call(http, 'admin:list', 'GET', '/api/tickets/?per_page=50', admin_id)
+
+    def public(self, http, rng, n):
+        if not self.population['to_rate']:
+            return
+        ticket_id = rng.choice(self.population['to_rate'])
+        self.call(http, 'public:rate_quick', 'GET', f'/api/tickets/{ticket_id}/rate-quick/{rng.choice((4, 5, 5))}')
+
+    def user(self, n, deadline, seed):
+        rng = random.Random(seed * 10_000 + n)
+        http = requests.Session()
+        i = 0
+        while time.time() < deadline:
+            getattr(self, rng.choices(self.profiles, self.weights)[0])(http, rng, f'{n}-{i}')
+            i += 1
+            if self.think:
+                time.sleep(rng.expovariate(1 / self.think))
+
+    def run(self, users, duration, seed):
+        deadline = time.time() + duration
+        threads = [threading.Thread(target=self.user, args=(n, deadline, seed)) for n in range(users)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+
+# ----------------------------------------------------------------------
+# /api/metrics
+# ----------------------------------------------------------------------
+def parse_prometheus(text):
+    """{(nombre, ((label, valor), ...)): número}"""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        series, value = line.rsplit(' ', 1)
+        name, _, raw = series.partition('{')
+        labels = tuple(sorted(LABEL.findall(raw)))
+        samples[(name, labels)] = float(value)
+    return samples
+
+
+def scrape(base_url):
+    try:
+        return parse_prometheus(requests.get(f'{base_url}/api/metrics', timeout=5).text)
+    except (requests.RequestException, ValueError):
+        return None
+
+
+def by_engine(samples, name):
+    totals = defaultdict(float)
+    for (metric, labels), value in samples.items():
+        if metric == name:
+            totals[dict(labels).get('engine', 'primary')] += value
+    return totals
+
+
+class PoolSampler:
+    """Muestrea los gauges del pool durante un nivel (los workers los vuelcan cada METRICS_FLUSH_SECONDS)"""
+
+    def __init__(self, base_url, interval=1.0):
+        self.base_url = base_url
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            samples = scrape(self.base_url)
+            if samples is not None:
+                self.samples.append(samples)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self, before, after):
+        """Por engine: uso máximo/medio del pool, overflow máximo y esperas por conexión en el nivel"""
+        engines = {}
+        for samples in self.samples:
+            size = by_engine(samples, 'ghp_db_pool_size')
+            checked_out = by_engine(samples, 'ghp_db_pool_checked_out')
+            overflow = by_engine(samples, 'ghp_db_pool_overflow')
+            for engine, total in size.items():
+                state = engines.setdefault(engine, {'size': 0, 'in_use': [], 'overflow': 0})
+                state['size'] = max(state['size'], total)
+                state['in_use'].append(checked_out.get(engine, 0))
+                state['overflow'] = max(state['overflow'], overflow.get(engine, 0))
+
+        if before is not None and after is not None:
+            for engine in set(by_engine(after, 'ghp_db_pool_wait_seconds_count')):
+                def delta(name, extra=()):
+                    key = tuple(sorted((('engine', engine),) + extra))
+                    return after.get((name, key), 0) - before.get((name, key), 0)
+                waits = delta('ghp_db_pool_wait_seconds_count')
+                state = engines.setdefault(engine, {'size': 0, 'in_use': [], 'overflow': 0})
+                state['waits'] = waits
+                state['wait_mean_ms'] = delta('ghp_db_pool_wait_seconds_sum') / waits * 1000 if waits else 0.0
+                fast = delta('ghp_db_pool_wait_seconds_bucket', (('le', '0.01'),))
+                state['slow_waits'] = waits - fast
+        return engines
+
+
+# ----------------------------------------------------------------------
+# Reporte
+# ----------------------------------------------------------------------
+def report_level(users, elapsed, workload, pool):
+    values = [v for series in workload.latencies.values() for v in series]
+    errors = sum(workload.errors.values())
+    total = len(values)
+    if not total:
+        print(f"\n=== {users} usuarios: sin requests ===")
+        return {'users': users, 'rps': 0, 'p50_ms': None, 'p95_ms': None, 'p99_ms': None,
+                'error_rate': None, 'endpoints': {}, 'pool': {}}
+    print(f"\n=== {users} usuarios: {total / elapsed:.1f} req/s, "
+          f"p50 {percentile(values, 0.5) * 1000:.0f} ms, p95 {percentile(values, 0.95) * 1000:.0f} ms, "
+          f"p99 {percentile(values, 0.99) * 1000:.0f} ms, errores {errors / total:.2%} ===")
+
+    endpoints = {}
+    print(f"  {'Endpoint':<22}{'n':>7}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'error':>8}")
+    for name in sorted(workload.latencies):
+        series = workload.latencies[name]
+        failed = sum(count for (endpoint, _), count in workload.errors.items() if endpoint == name)
+        endpoints[name] = {
+            'requests': len(series),
+            'rps': len(series) / elapsed,
+            'p50_ms': percentile(series, 0.5) * 1000,
+            'p95_ms': percentile(series, 0.95) * 1000,
+            'p99_ms': percentile(series, 0.99) * 1000,
+            'error_rate': failed / len(series)
+        }
+        e = endpoints[name]
+        print(f"  {name:<22}{e['requests']:>7}{e['rps']:>8.1f}{e['p50_ms']:>9.0f}{e['p95_ms']:>9.0f}"
+              f"{e['p99_ms']:>9.0f}{e['error_rate']:>8.1%}")
+
+    if workload.errors:
+        print("  Errores: " + ', '.join(f'{name} {status} x{count}'
+                                        for (name, status), count in workload.errors.most_common(6)))
+
+    if not pool:
+        print("  Pool: sin datos de /api/metrics")
+    for engine, state in sorted(pool.items()):
+        in_use = state['in_use'] or [0]
+        size = state['size'] or 1
+        print(f"  Pool {engine}: en uso máx {max(in_use):.0f} / prom {sum(in_use) / len(in_use):.1f} de "
+              f"{state['size']:.0f} ({max(in_use) / size:.0%}), overflow máx {state['overflow']:.0f}, "
+              f"esperas {state.get('waits', 0):.0f} (>10 ms: {state.get('slow_waits', 0):.0f}, "
+              f"media {state.get('wait_mean_ms', 0):.1f} ms)")
+
+    return {
+        'users': users,
+        'rps': total / elapsed,
+        'p50_ms': percentile(values, 0.5) * 1000,
+        'p95_ms': percentile(values, 0.95) * 1000,
+        'p99_ms': percentile(values, 0.99) * 1000,
+        'error_rate': errors / total,
+        'endpoints': endpoints,
+        'pool': {engine: {**state, 'in_use_max': max(state['in_use'] or [0])}
+                 for engine, state in pool.items()}
+    }
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, weight = part.split('=')
+        if name not in ('client', 'engineer', 'admin', 'public'):
+            raise argparse.ArgumentTypeError(f'Perfil desconocido: {name}')
+        mix[name] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Perfil de carga mixto a concurrencia creciente')
+    parser.add_argument('--base-url', help='Backend ya levantado (si no, se arranca gunicorn)')
+    parser.add_argument('--app', default='wsgi:app')
+    parser.add_argument('--worker-class', default=os.getenv('GUNICORN_WORKER_CLASS', 'gthread'))
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--levels', default='4,8,16,32,64', help='Usuarios simultáneos por nivel')
+    parser.add_argument('--duration', type=int, default=30, help='Segundos por nivel')
+    parser.add_argument('--think-ms', type=float, default=200, help='Pausa media entre acciones de un usuario')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument('--latency-ms', type=int, default=80, help='Latencia de los proveedores simulados')
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--engineers', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--max-error-rate', type=float, default=0.05, help='Detenerse si un nivel supera esta tasa')
+    parser.add_argument('--json', help='Guardar los resultados en este archivo')
+    args = parser.parse_args()
+
+    database_url = os.getenv('DATABASE_URL', 'sqlite:///soporte.db')
+    population = load_population(database_url, args.clients, args.engineers)
+    tokens = TokenFactory(os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production'))
+    levels = [int(level) for level in args.levels.split(',')]
+
+    process = fake = None
+    base_url = args.base_url
+    if base_url is None:
+        from services.fake_providers import fake_server
+        fake = fake_server(latency_ms=args.latency_ms)
+        fake.start()
+        # start_gunicorn hereda este entorno
+        os.environ.update(PROVIDER_MODE='fake', FAKE_PROVIDERS_URL=fake.base_url,
+                          FAKE_PROVIDER_LATENCY_MS=str(args.latency_ms), METRICS_FLUSH_SECONDS='1',
+                          DATABASE_URL=database_url)
+        process, base_url = start_gunicorn(args.app, args.worker_class, args.workers, free_port())
+    base_url = base_url.rstrip('/')
+
+    print(f"Backend {base_url} ({args.workers} workers {args.worker_class}), mezcla "
+          f"{', '.join(f'{k} {v:g}' for k, v in args.mix.items())}, pausa {args.think_ms:g} ms, "
+          f"{args.duration} s por nivel")
+    print(f"{len(population['clients'])} clientes, {len(population['engineers'])} ingenieros, "
+          f"{len(population['admins'])} admins, {len(population['to_rate'])} tickets por calificar")
+
+    workload = Workload(base_url, tokens, population, args.mix, args.think_ms)
+    results = []
+    try:
+        for users in levels:
+            workload.reset()
+            before = scrape(base_url)
+            with PoolSampler(base_url) as sampler:
+                elapsed = workload.run(users, args.duration, args.seed)
+            time.sleep(1.5)  # último volcado de métricas de los workers
+            result = report_level(users, elapsed, workload, sampler.summary(before, scrape(base_url)))
+            results.append(result)
+            if result['error_rate'] and result['error_rate'] > args.max_error_rate:
+                print(f"\n✗ Error {result['error_rate']:.1%} > {args.max_error_rate:.0%}: se detiene la rampa")
+                break
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        if fake is not None:
+            fake.stop()
+
+    print(f"\n{'Usuarios':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'error':>8}  pool primario (máx en uso)")
+    for result in results:
+        pool = result['pool'].get('primary', {})
+        print(f"{result['users']:>8}{result['rps']:>9.1f}{result['p50_ms'] or 0:>9.0f}{result['p95_ms'] or 0:>9.0f}"
+              f"{result['p99_ms'] or 0:>9.0f}{result['error_rate'] or 0:>8.1%}  "
+              f"{pool.get('in_use_max', 0):.0f}/{pool.get('size', 0):.0f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'workers': args.workers, 'worker_class': args.worker_class, 'mix': args.mix,
+                       'think_ms': args.think_ms, 'levels': results}, f, indent=2)
+        print(f"\n✓ Resultados en {args.json}")
+    return 0 if results and (results[-1]['error_rate'] or 0) <= args.max_error_rate else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
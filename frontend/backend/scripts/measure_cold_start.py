@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Mide el arranque en frío de un worker: tiempo de `import app` en un
+proceso nuevo y las sentencias SQL que hace al importar (DDL y consultas
+al catálogo), que es lo que paga cada worker de gunicorn al arrancar.
+
+Con --compare <rev> mide también esa revisión (en un git worktree
+temporal) para ver el antes y el después, p. ej. --compare HEAD~1.
+
+Ejecutar con: python scripts/measure_cold_start.py [--runs 5] [--compare <rev>]
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Corre en el proceso hijo, con src/ como directorio de trabajo
+PROBE = r'''
+import json, sys, time
+sys.path.insert(0, '.')
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+counts = {'total': 0, 'ddl': 0, 'catalog': 0}
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def count(conn, cursor, statement, parameters, context, executemany):
+    sql = statement.lstrip().upper()
+    counts['total'] += 1
+    if sql.startswith(('CREATE', 'ALTER', 'DROP')):
+        counts['ddl'] += 1
+    if any(name in sql for name in ('INFORMATION_SCHEMA', 'PG_CATALOG', 'SQLITE_MASTER', 'PRAGMA')):
+        counts['catalog'] += 1
+
+start = time.perf_counter()
+import app
+counts['seconds'] = time.perf_counter() - start
+print('COLD_START ' + json.dumps(counts))
+'''
+
+
+def get_database_url():
+    """Obtiene la URL de la base de datos desde las variables de entorno"""
+    return os.environ.get('DATABASE_URL', 'postgresql://localhost/soporte_ghp')
+
+
+def measure(backend_dir, runs):
+    env = dict(os.environ, DATABASE_URL=get_database_url())
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-c', PROBE], cwd=os.path.join(backend_dir, 'src'),
+            env=env, capture_output=True, text=True
+        )
+        line = next((l for l in result.stdout.splitlines() if l.startswith('COLD_START ')), None)
+        if line is None:
+            print(result.stdout[-2000:])
+            print(result.stderr[-2000:])
+            raise RuntimeError(f'import app falló en {backend_dir}')
+        samples.append(json.loads(line[len('COLD_START '):]))
+    return samples
+
+
+def report(label, samples):
+    seconds = [s['seconds'] for s in samples]
+    last = samples[-1]
+    print(f"{label:<24}{statistics.median(seconds) * 1000:>10.0f} ms (min {min(seconds) * 1000:.0f}, "
+          f"max {max(seconds) * 1000:.0f})   SQL {last['total']:>3}  DDL {last['ddl']:>3}  catálogo {last['catalog']:>3}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Arranque en frío de un worker')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--compare', metavar='REV', help='Revisión de git a medir también (antes)')
+    args = parser.parse_args()
+
+    print(f"Base de datos: {get_database_url()}  ({args.runs} arranques por revisión)\n")
+
+    if args.compare:
+        repo = subprocess.run(['git', 'rev-parse', '--show-toplevel'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+        worktree = tempfile.mkdtemp(prefix='ghp-cold-start-')
+        subprocess.run(['git', 'worktree', 'add', '--detach', worktree, args.compare],
+                       cwd=repo, check=True, capture_output=True)
+        try:
+            backend = os.path.join(worktree, os.path.relpath(BACKEND_DIR, repo))
+            report(args.compare, measure(backend, args.runs))
+        finally:
+            subprocess.run(['git', 'worktree', 'remove', '--force', worktree], cwd=repo, capture_output=True)
+
+    report('actual', measure(BACKEND_DIR, args.runs))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
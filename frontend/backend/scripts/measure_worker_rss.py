@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Memoria por worker de gunicorn con y sin --preload.
+
+Arranca gunicorn con gunicorn.conf.py una vez por modo (GUNICORN_PRELOAD
+false/true), espera a /api/health, calienta cada worker con --warmup
+requests y lee /proc/<pid>/smaps_rollup del master y de cada worker:
+
+- RSS: memoria residente (cuenta varias veces las páginas compartidas)
+- PSS: RSS con las páginas compartidas repartidas entre procesos
+- Shared / Private: páginas compartidas (copy-on-write) y propias
+
+Con preload el PSS total de los workers debe bajar y Shared subir.
+También informa cuánto tarda el arranque hasta el primer /api/health.
+
+Solo Linux. Ejecutar con: python scripts/measure_worker_rss.py [--workers 4] [--warmup 50] [--modes false,true]
+"""
+
+import os
+import sys
+import time
+import socket
+import argparse
+import subprocess
+
+import requests
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def read_memory(pid):
+    """Campos de smaps_rollup en KB: rss, pss, shared, private"""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'shared': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+        'private': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    }
+
+
+def child_pids(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(child) for child in f.read().split()]
+
+
+def start_gunicorn(app, preload, workers, port):
+    env = dict(os.environ, GUNICORN_PRELOAD=preload, WEB_CONCURRENCY=str(workers), PORT=str(port))
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        ['gunicorn', app, '-c', 'gunicorn.conf.py', '--access-logfile', '/dev/null'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if requests.get(f'{base_url}/api/health', timeout=1).ok:
+                return process, base_url, time.perf_counter() - started
+        except requests.RequestException:
+            pass
+        if process.poll() is not None:
+            break
+        time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f'gunicorn (preload={preload}) no arrancó')
+
+
+def measure(args, preload):
+    process, base_url, boot = start_gunicorn(args.app, preload, args.workers, free_port())
+    try:
+        # Esperar a que estén todos los workers y que cada uno atienda algo
+        deadline = time.time() + 30
+        while len(child_pids(process.pid)) < args.workers and time.time() < deadline:
+            time.sleep(0.2)
+        http = requests.Session()
+        for _ in range(args.warmup * args.workers):
+            http.get(f'{base_url}/api/health', timeout=10)
+        time.sleep(1)
+        master = read_memory(process.pid)
+        workers = [read_memory(pid) for pid in child_pids(process.pid)]
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return boot, master, workers
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RSS/PSS por worker con y sin --preload')
+    parser.add_argument('--app', default='wsgi:app')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--warmup', type=int, default=50, help='Requests por worker antes de medir')
+    parser.add_argument('--modes', default='false,true', help='Valores de GUNICORN_PRELOAD a comparar')
+    args = parser.parse_args()
+
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        print("✗ Se necesita Linux con /proc/<pid>/smaps_rollup")
+        return 1
+
+    print(f"{args.workers} workers, {args.warmup} requests de calentamiento por worker (MB)\n")
+    print(f"{'preload':<9}{'arranque s':>11}{'master RSS':>12}{'RSS/worker':>12}"
+          f"{'PSS/worker':>12}{'shared':>9}{'private':>9}{'PSS total':>11}")
+
+    for preload in args.modes.split(','):
+        boot, master, workers = measure(args, preload)
+        n = len(workers) or 1
+
+        def avg(key):
+            return sum(w[key] for w in workers) / n / 1024
+
+        total_pss = (master['pss'] + sum(w['pss'] for w in workers)) / 1024
+        print(f"{preload:<9}{boot:>11.2f}{master['rss'] / 1024:>12.1f}{avg('rss'):>12.1f}"
+              f"{avg('pss'):>12.1f}{avg('shared'):>9.1f}{avg('private'):>9.1f}{total_pss:>11.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
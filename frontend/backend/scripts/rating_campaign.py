@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Script para solicitar calificación de los tickets resueltos/cerrados
+que aún no la tienen. Se puede repetir: los tickets ya solicitados
+quedan marcados en tickets.rating_requested_at.
+
+Ejecutar con: python scripts/rating_campaign.py [--dry-run] [--limit 200] [--per-client 1]
+"""
+
+import os
+import sys
+import argparse
+
+# Agregar el directorio src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from services.email_service_sendgrid import email_service
+from services.rating_campaign import rating_campaign, EmailDisabled
+
+def get_database_url():
+    """Obtiene la URL de la base de datos desde las variables de entorno"""
+    return os.environ.get('DATABASE_URL', 'postgresql://localhost/soporte_ghp')
+
+def main():
+    parser = argparse.ArgumentParser(description='Campaña de solicitudes de calificación')
+    parser.add_argument('--dry-run', action='store_true', help='Solo contar, sin enviar ni marcar')
+    parser.add_argument('--limit', type=int, help='Máximo de tickets en esta ejecución')
+    parser.add_argument('--per-client', type=int, default=1, help='Máximo de solicitudes por cliente')
+    args = parser.parse_args()
+
+    print("Conectando a la base de datos...")
+    engine = create_engine(get_database_url())
+    Session = sessionmaker(bind=engine)
+    email_service.outbox.configure(Session)
+
+    session = Session()
+    try:
+        result = rating_campaign.run(
+            session, dry_run=args.dry_run, limit=args.limit, per_client=args.per_client
+        )
+    except EmailDisabled as e:
+        print(f"✗ {e} (usar --dry-run para solo contar)")
+        return 1
+    finally:
+        session.close()
+
+    if result is None:
+        print("⚠ Otra campaña está en curso, se omite")
+        return 1
+
+    # Los emails salen por la cola; esperar antes de terminar el proceso
+    if not args.dry_run and not email_service.outbox.drain(timeout=600):
+        print("⚠ La cola de emails no terminó a tiempo")
+        return 1
+
+    print(f"\n✅ Seleccionados: {result['selected']}, enviados: {result['sent']}, "
+          f"fallidos: {result['failed']}, pospuestos: {result['deferred']}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Script para reenviar los emails que quedaron en email_dead_letters.
+Los vuelve a encolar con el límite de tasa y los reintentos normales,
+y espera a que la cola se vacíe antes de salir.
+
+Ejecutar con: python scripts/replay_email_dead_letters.py [--ids 12 15] [--limit 100]
+"""
+
+import os
+import sys
+import argparse
+
+# Agregar el directorio src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from services.email_service_sendgrid import email_service
+
+def get_database_url():
+    """Obtiene la URL de la base de datos desde las variables de entorno"""
+    return os.environ.get('DATABASE_URL', 'postgresql://localhost/soporte_ghp')
+
+def main():
+    parser = argparse.ArgumentParser(description='Reenvío de dead letters de email')
+    parser.add_argument('--ids', type=int, nargs='+', help='Solo estos dead letters')
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--timeout', type=int, default=300, help='Segundos máximos de espera')
+    args = parser.parse_args()
+
+    if not email_service.transport:
+        print("❌ SENDGRID_API_KEY no configurada")
+        return 1
+
+    print("Conectando a la base de datos...")
+    engine = create_engine(get_database_url())
+    email_service.outbox.configure(sessionmaker(bind=engine))
+
+    replayed = email_service.outbox.replay(ids=args.ids, limit=args.limit)
+    print(f"🔄 {replayed} emails reencolados")
+
+    if not email_service.outbox.drain(timeout=args.timeout):
+        print("⚠ La cola no terminó a tiempo; lo pendiente se pierde al salir")
+        return 1
+
+    status = email_service.outbox.get_status()
+    print(f"\n✅ Enviados: {status['stats'].get('sent', 0)}, "
+          f"de nuevo en dead letters: {status['stats'].get('dead_lettered', 0)}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Script para ejecutar a mano el recolector de archivos de Cloudinary.
+Procesa los borrados pendientes y, con --reconcile, busca huérfanos
+bajo soporte-ghp/ que ya no referencia ningún adjunto.
+
+Ejecutar con: python scripts/storage_gc.py [--reconcile]
+"""
+
+import os
+import sys
+import argparse
+
+# Agregar el directorio src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from services.storage_gc import storage_gc
+
+def get_database_url():
+    """Obtiene la URL de la base de datos desde las variables de entorno"""
+    return os.environ.get('DATABASE_URL', 'postgresql://localhost/soporte_ghp')
+
+def main():
+    parser = argparse.ArgumentParser(description='Recolector de archivos de Cloudinary')
+    parser.add_argument('--reconcile', action='store_true',
+                        help='Encolar también los archivos huérfanos antes de borrar')
+    args = parser.parse_args()
+
+    print("Conectando a la base de datos...")
+    engine = create_engine(get_database_url())
+    storage_gc.configure(sessionmaker(bind=engine))
+
+    if args.reconcile:
+        orphans = storage_gc.reconcile()
+        if orphans is None:
+            print("⚠ Otra reconciliación está en curso, se omite")
+
+    # Vaciar la cola: cada pasada procesa hasta 1000 archivos
+    while True:
+        result = storage_gc.process_pending()
+        if result['deleted'] == 0:
+            break
+
+    status = storage_gc.get_status()
+    print(f"\n✅ Pendientes: {status['pending']}, fallidos: {status['failed']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Prueba de estrés de concurrencia para workers gthread/gevent.
+
+Contra un backend ya corriendo (idealmente con PROVIDER_MODE=fake):
+
+1. Crea --creates tickets a la vez en el MISMO proyecto: todos deben
+   crearse y con ticket_id distintos (numeración por proyecto).
+2. Lee esos tickets desde muchos hilos a la vez y verifica que cada
+   respuesta sea del ticket pedido (sesiones/g de un request que se filtren
+   a otro).
+3. Cambia el estado de todos a la vez y verifica el estado final.
+
+Falla (exit 1) ante cualquier 5xx, id duplicado o respuesta cruzada.
+
+Ejecutar con: python scripts/stress_concurrency.py --admin-id USR-... --engineer-id USR-... [--creates 40] [--concurrency 32]
+"""
+
+import os
+import sys
+import uuid
+import argparse
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from load_harness import TokenFactory
+
+
+class Stress:
+    def __init__(self, base_url, tokens):
+        self.base_url = base_url.rstrip('/')
+        self.tokens = tokens
+        self.errors = Counter()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def http(self):
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def call(self, label, method, path, user_id, body=None):
+        try:
+            response = self.http.request(
+                method, f'{self.base_url}{path}', json=body, timeout=60,
+                headers={'Authorization': f'Bearer {self.tokens.token(user_id)}'}
+            )
+        except requests.RequestException as e:
+            self.fail(f'{label}: {type(e).__name__}')
+            return None
+        if response.status_code >= 400:
+            self.fail(f'{label}: HTTP {response.status_code}')
+            return None
+        return response.json()
+
+    def fail(self, key):
+        with self._lock:
+            self.errors[key] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Estrés de concurrencia')
+    parser.add_argument('--base-url', default=os.getenv('API_URL', 'http://127.0.0.1:5000'))
+    parser.add_argument('--admin-id', required=True)
+    parser.add_argument('--engineer-id', required=True)
+    parser.add_argument('--creates', type=int, default=40)
+    parser.add_argument('--reads', type=int, default=20, help='Lecturas por ticket')
+    parser.add_argument('--concurrency', type=int, default=32)
+    args = parser.parse_args()
+
+    tokens = TokenFactory(os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production'))
+    stress = Stress(args.base_url, tokens)
+    project_id = f'STRESS{uuid.uuid4().hex[:6].upper()}'
+    pool = ThreadPoolExecutor(max_workers=args.concurrency)
+
+    # 1. Altas simultáneas en el mismo proyecto
+    def create(n):
+        result = stress.call('create', 'POST', '/api/tickets/', args.admin_id, {
+            'project_id': project_id,
+            'category': 'electrical',
+            'priority': 'medium',
+            'title': f'Estrés {n}',
+            'description': 'Ticket generado por scripts/stress_concurrency.py',
+            'assigned_to': args.engineer_id
+        })
+        return result['ticket']['ticket_id'] if result else None
+
+    ticket_ids = [t for t in pool.map(create, range(args.creates)) if t]
+    duplicated = [t for t, count in Counter(ticket_ids).items() if count > 1]
+    print(f"1. Altas en {project_id}: {len(ticket_ids)}/{args.creates}, ids duplicados: {len(duplicated)}")
+    for ticket_id in duplicated:
+        stress.fail(f'ticket_id duplicado {ticket_id}')
+
+    # 2. Lecturas cruzadas: cada respuesta debe ser del ticket pedido
+    def read(ticket_id):
+        result = stress.call('get', 'GET', f'/api/tickets/{ticket_id}', args.admin_id)
+        if result is not None:
+            returned = result['ticket']['ticket_id']
+            if returned != ticket_id:
+                stress.fail('respuesta de otro ticket')
+
+    reads = [t for t in ticket_ids for _ in range(args.reads)]
+    list(pool.map(read, reads))
+    print(f"2. Lecturas concurrentes: {len(reads)}")
+
+    # 3. Cambios de estado simultáneos
+    def change(ticket_id):
+        stress.call('status', 'POST', f'/api/tickets/{ticket_id}/status', args.engineer_id,
+                    {'status': 'in_progress'})
+        result = stress.call('get', 'GET', f'/api/tickets/{ticket_id}', args.admin_id)
+        if result is not None and result['ticket']['status'] != 'in_progress':
+            stress.fail('estado final incorrecto')
+
+    list(pool.map(change, ticket_ids))
+    print(f"3. Cambios de estado concurrentes: {len(ticket_ids)}")
+    pool.shutdown()
+
+    if stress.errors:
+        print("\n✗ Errores:")
+        for key, count in stress.errors.most_common():
+            print(f"  {key:<40}{count:>6}")
+        return 1
+    print("\n✅ Sin errores de concurrencia")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Generador determinístico de datos sintéticos para pruebas de rendimiento.
+
+Con la misma semilla y el mismo tamaño genera exactamente las mismas filas:
+- usuarios por rol (admins, ingenieros con carga desigual, clientes);
+- proyectos de OpenSolar por cliente (1-3) con tickets numerados como en
+  create_ticket ('<project_id>-001', '-002', ...);
+- tickets con distribuciones de estado (según antigüedad), prioridad,
+  categoría, SLA por prioridad y calificaciones en los resueltos;
+- historial (creado, asignado, cambios de estado) y metadata de adjuntos.
+
+Un ~3% de los tickets queda sin assigned_at / resolved_at, como los datos
+viejos que corrige POST /api/admin/fix-timestamps.
+
+Las fechas se calculan hacia atrás desde --anchor (por defecto una fecha
+fija, para que los datos no cambien de un día a otro). Inserta con el bulk
+insert del ORM en lotes, así que 1M de tickets no se cargan en memoria.
+Lo usan scripts/explain_indexes.py y scripts/bench_endpoints.py.
+¡No correr contra producción!
+
+Ejecutar con: DATABASE_URL=postgresql://.../ghp_bench python scripts/synthetic_data.py --tickets 100000 [--seed 42]
+"""
+
+import os
+import sys
+import random
+import argparse
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.orm import Session
+from models import User, Ticket, TicketHistory, Attachment, TicketStatus, TicketPriority, UserRole
+import migrate
+
+ANCHOR = datetime(2025, 7, 1)
+BATCH = 5000
+
+PRIORITIES = ((TicketPriority.LOW, 25), (TicketPriority.MEDIUM, 45),
+              (TicketPriority.HIGH, 22), (TicketPriority.CRITICAL, 8))
+OPEN_STATUSES = ((TicketStatus.NEW, 20), (TicketStatus.ASSIGNED, 30),
+                 (TicketStatus.IN_PROGRESS, 35), (TicketStatus.WAITING, 15))
+CATEGORIES = (('inverter', 35), ('panels', 25), ('electrical', 20), ('monitoring', 15), ('other', 5))
+RATINGS = ((5, 55), (4, 25), (3, 10), (2, 5), (1, 5))
+# Mismas horas que get_sla_config en routes/tickets.py: (respuesta, resolución)
+SLA_HOURS = {'critical': (1, 4), 'high': (4, 24), 'medium': (8, 72), 'low': (24, 168)}
+
+TITLES = (
+    'Inversor con alarma de aislamiento', 'Producción menor a la esperada', 'Panel con punto caliente',
+    'Monitoreo sin datos desde ayer', 'Breaker del sistema se dispara', 'Medidor bidireccional no reporta',
+    'Inversor apagado por sobretensión', 'Cableado DC con daño visible', 'Solicitud de limpieza de paneles',
+)
+ATTACHMENTS = (
+    ('foto_inversor.jpg', 'image/jpeg', 40), ('foto_panel.jpg', 'image/jpeg', 30),
+    ('captura_monitoreo.png', 'image/png', 15), ('factura.pdf', 'application/pdf', 10),
+    ('video_breaker.mp4', 'video/mp4', 5),
+)
+
+
+def get_database_url():
+    """Obtiene la URL de la base de datos desde las variables de entorno"""
+    return os.environ.get('DATABASE_URL', 'sqlite:///soporte.db')
+
+
+def pick(rng, weighted):
+    return rng.choices([value for value, _ in weighted], [weight for _, weight in weighted])[0]
+
+
+class SyntheticData:
+    """Genera e inserta un conjunto de datos; `ids` resume lo generado para los benchmarks"""
+
+    def __init__(self, tickets, seed=42, anchor=ANCHOR, days=365):
+        self.tickets = tickets
+        self.rng = random.Random(seed)
+        self.anchor = anchor
+        self.days = days
+        self.ids = {}
+
+    # ------------------------------------------------------------------
+    # Usuarios y proyectos
+    # ------------------------------------------------------------------
+    def users(self):
+        admins = [f'USR-SYNADM{n:06d}' for n in range(3)]
+        engineers = [f'USR-SYNENG{n:06d}' for n in range(min(150, max(5, self.tickets // 1500)))]
+        clients = [f'USR-SYNCLI{n:06d}' for n in range(max(20, self.tickets // 6))]
+        # Cada cliente tiene 1-3 proyectos; los project_id son numéricos como en OpenSolar
+        projects = {}
+        next_project = 9_000_000
+        for client_id in clients:
+            owned = [str(next_project + k) for k in range(pick(self.rng, ((1, 75), (2, 20), (3, 5))))]
+            next_project += len(owned)
+            projects[client_id] = owned
+
+        rows = []
+        for role, ids in ((UserRole.ADMIN, admins), (UserRole.ENGINEER, engineers), (UserRole.CLIENT, clients)):
+            for n, user_id in enumerate(ids):
+                rows.append({
+                    'user_id': user_id,
+                    'email': f'{role.value}{n}@synthetic.ghp.local',
+                    'password_hash': 'synthetic-no-login',
+                    'full_name': f'{role.value.title()} Sintético {n}',
+                    'phone': f'+57300{n:07d}',
+                    'role': role,
+                    'is_active': True,
+                    'opensolar_project_ids': projects.get(user_id, []),
+                    'created_at': self.anchor - timedelta(days=self.days + 30 - n % 30)
+                })
+        self.ids.update(admins=admins, engineers=engineers, clients=clients)
+        return rows, projects
+
+    # ------------------------------------------------------------------
+    # Tickets con historial y adjuntos
+    # ------------------------------------------------------------------
+    def ticket(self, n, client_id, project_id, number, engineer_weights):
+        rng = self.rng
+        # Más tickets recientes que viejos (la base de clientes crece)
+        age = timedelta(days=self.days * (1 - rng.random() ** 0.7), seconds=rng.randint(0, 86399))
+        created = self.anchor - age
+        priority = pick(rng, PRIORITIES)
+        response_hours, resolution_hours = SLA_HOURS[priority.value]
+
+        # Los viejos están casi todos resueltos o cerrados
+        if rng.random() < min(0.97, age.days / 20):
+            status = TicketStatus.CLOSED if age.days > 10 and rng.random() < 0.7 else TicketStatus.RESOLVED
+        else:
+            status = pick(rng, OPEN_STATUSES)
+
+        assigned_to = assigned_at = resolved_at = None
+        if status != TicketStatus.NEW:
+            assigned_to = rng.choices(self.ids['engineers'], engineer_weights)[0]
+            assigned_at = min(self.anchor, created + timedelta(hours=rng.expovariate(1 / (response_hours * 0.6))))
+        if status in (TicketStatus.RESOLVED, TicketStatus.CLOSED):
+            resolved_at = min(self.anchor, assigned_at + timedelta(hours=rng.expovariate(1 / (resolution_hours * 0.5))))
+        updated = min(self.anchor, resolved_at or assigned_at or created)
+        if status == TicketStatus.CLOSED:
+            updated = min(self.anchor, updated + timedelta(days=rng.randint(1, 7)))
+
+        rating = None
+        if resolved_at and rng.random() < 0.55:
+            rating = pick(rng, RATINGS)
+
+        ticket_id = f'{project_id}-{number:03d}'
+        title = rng.choice(TITLES)
+        row = {
+            'ticket_id': ticket_id,
+            'project_id': project_id,
+            'client_id': client_id,
+            'created_by_id': client_id if rng.random() < 0.4 else rng.choice(self.ids['admins']),
+            'assigned_to': assigned_to,
+            'category': pick(rng, CATEGORIES),
+            'priority': priority,
+            'status': status,
+            'title': f'{title} #{n}',
+            'description': f'{title}. Reportado por el cliente del proyecto {project_id}. ' * rng.randint(1, 4),
+            'created_at': created,
+            'updated_at': updated,
+            'assigned_at': assigned_at,
+            'resolved_at': resolved_at,
+            'sla_response_deadline': created + timedelta(hours=response_hours),
+            'sla_resolution_deadline': created + timedelta(hours=resolution_hours),
+            'sla_response_met': assigned_at <= created + timedelta(hours=response_hours) if assigned_at else None,
+            'sla_resolution_met': resolved_at <= created + timedelta(hours=resolution_hours) if resolved_at else None,
+            'rating': rating,
+            'rating_comment': 'Buena atención' if rating and rating >= 4 and rng.random() < 0.3 else None,
+            'opensolar_data': {
+                'project_id': project_id,
+                'project_name': f'Instalación {project_id}',
+                'client_email': f'client{client_id[-6:].lstrip("0") or "0"}@synthetic.ghp.local',
+                'system_size_kw': round(3 + rng.random() * 15, 2)
+            }
+        }
+
+        history = [{'ticket_id': ticket_id, 'user_id': row['created_by_id'], 'action': 'ticket_created',
+                    'created_at': created}]
+        if assigned_to:
+            history.append({'ticket_id': ticket_id, 'user_id': self.ids['admins'][0], 'action': 'ticket_assigned',
+                            'new_value': assigned_to, 'created_at': assigned_at})
+            if status != TicketStatus.ASSIGNED:
+                history.append({'ticket_id': ticket_id, 'user_id': assigned_to, 'action': 'status_change',
+                                'old_value': 'assigned', 'new_value': 'in_progress',
+                                'created_at': assigned_at + (updated - assigned_at) / 3})
+        if resolved_at:
+            history.append({'ticket_id': ticket_id, 'user_id': assigned_to, 'action': 'status_change',
+                            'old_value': 'in_progress', 'new_value': 'resolved', 'created_at': resolved_at})
+
+        # Datos viejos: sin timestamp (la mitad conserva el historial para recuperarlo)
+        if rng.random() < 0.03:
+            row['assigned_at'] = None
+            row['resolved_at'] = None
+            if rng.random() < 0.5:
+                history = history[:1]
+
+        attachments = []
+        for k in range(pick(rng, ((0, 60), (1, 25), (2, 10), (3, 5)))):
+            file_name, mime_type, _ = ATTACHMENTS[rng.choices(range(len(ATTACHMENTS)),
+                                                              [a[2] for a in ATTACHMENTS])[0]]
+            attachments.append({
+                'attachment_id': f'ATT-{created:%Y%m%d}-{n:07d}{k}',
+                'ticket_id': ticket_id,
+                'uploaded_by': client_id,
+                'file_type': Attachment.determine_file_type(mime_type),
+                'file_name': file_name,
+                'file_size': rng.randint(40_000, 8_000_000),
+                'file_url': f'https://res.cloudinary.com/ghp-synthetic/image/upload/{ticket_id}/{k}_{file_name}',
+                'mime_type': mime_type,
+                'uploaded_at': created + timedelta(minutes=rng.randint(1, 120))
+            })
+        return row, history, attachments
+
+    def generate(self, engine, progress=True):
+        """Inserta todo en `engine` (se espera una base vacía); devuelve self.ids"""
+        started = time.perf_counter()
+        user_rows, projects = self.users()
+        # Carga desigual entre ingenieros (Zipf)
+        engineer_weights = [1 / (k + 1) ** 0.8 for k in range(len(self.ids['engineers']))]
+        counters = {}
+        clients = self.ids['clients']
+        totals = {'tickets': 0, 'history': 0, 'attachments': 0}
+
+        with Session(engine) as db:
+            db.execute(insert(User), user_rows)
+            tickets, history, attachments = [], [], []
+            for n in range(self.tickets):
+                # Pocos clientes concentran muchos tickets
+                client_id = clients[min(len(clients) - 1, int(len(clients) * self.rng.random() ** 1.6))]
+                project_id = self.rng.choice(projects[client_id])
+                counters[project_id] = counters.get(project_id, 0) + 1
+                row, events, files = self.ticket(n, client_id, project_id, counters[project_id], engineer_weights)
+                tickets.append(row)
+                history.extend(events)
+                attachments.extend(files)
+
+                if len(tickets) == BATCH or n == self.tickets - 1:
+                    db.execute(insert(Ticket), tickets)
+                    db.execute(insert(TicketHistory), history)
+                    if attachments:
+                        db.execute(insert(Attachment), attachments)
+                    totals['tickets'] += len(tickets)
+                    totals['history'] += len(history)
+                    totals['attachments'] += len(attachments)
+                    tickets, history, attachments = [], [], []
+                    if progress:
+                        print(f"  {n + 1:,} / {self.tickets:,} tickets", end='\r')
+            db.commit()
+
+        # Estadísticas del planner al día antes de medir
+        with engine.begin() as conn:
+            conn.exec_driver_sql('ANALYZE')
+
+        if progress:
+            print(f"\n✓ {len(user_rows):,} usuarios, {len(counters):,} proyectos, {totals['tickets']:,} tickets, "
+                  f"{totals['history']:,} eventos, {totals['attachments']:,} adjuntos "
+                  f"en {time.perf_counter() - started:.1f} s")
+        return self.ids
+
+
+def is_empty(engine):
+    with Session(engine) as db:
+        return db.scalar(select(func.count()).select_from(Ticket)) == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Datos sintéticos determinísticos')
+    parser.add_argument('--tickets', type=int, default=10_000, help='10k a 1M')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--anchor', type=datetime.fromisoformat, default=ANCHOR,
+                        help='Fecha "actual" de los datos (ISO, por defecto fija)')
+    parser.add_argument('--days', type=int, default=365, help='Antigüedad máxima de los tickets')
+    args = parser.parse_args()
+
+    engine = create_engine(get_database_url())
+    migrate.run(engine)
+    if not is_empty(engine):
+        print("✗ La base ya tiene tickets: usar una base vacía para que los datos sean reproducibles")
+        return 1
+
+    print(f"Generando {args.tickets:,} tickets (semilla {args.seed}, ancla {args.anchor:%Y-%m-%d})...")
+    SyntheticData(args.tickets, args.seed, args.anchor, args.days).generate(engine)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
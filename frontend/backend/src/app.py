@@ -4,16 +4,13 @@ Green House Project
 """
 
 import os
-from flask import Flask, jsonify
+from flask import Flask, jsonify, g
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, scoped_session
 from datetime import timedelta
 
-# Importar modelos
-from models import Base
-
 # Importar rutas
 from routes.auth import auth_bp
 from routes.tickets import tickets_bp
@@ -29,213 +26,278 @@ from routes.projects import projects_bp
 from routes.rating import rating_bp
 from routes.admin_tools import admin_tools_bp
 
-# Crear aplicación Flask
-app = Flask(__name__)
-app.url_map.strict_slashes = False  # Evitar redirects por barras finales
-
-# Configuración
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
-app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
-app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)
-app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
+# Servicios en segundo plano
+from services.storage_gc import storage_gc
+from services.email_service_sendgrid import email_service as sendgrid_email_service
+from services.notification_coalescer import notification_coalescer
+from services.metrics import metrics, TimedQueuePool
+from services.query_audit import query_audit
+from services.json_provider import provider_class
+from services.compression import compressor
+from services.db_routing import RoutingSession, db_router
+from services.registry import registry
 
 # Database configuration
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///soporte.db')
-app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
+# Réplica opcional para las lecturas de requests GET (services/db_routing.py)
+DATABASE_READ_URL = os.getenv('DATABASE_READ_URL')
+
 
-# CORS configuration
-CORS(app, 
-     resources={r"/api/*": {"origins": "*"}},
-     supports_credentials=False,
-     allow_headers=["Content-Type", "Authorization"],
-     methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
-     expose_headers=["Content-Type", "Authorization"])
+def build_engine(url, name, pool_size, max_overflow):
+    """Engine con pool medido; name es el label engine de /api/metrics"""
+    return create_engine(
+        url, 
+        echo=True if os.getenv('DEBUG') == 'true' else False,
+        pool_pre_ping=True,  # Verifica conexiones antes de usarlas
+        pool_recycle=3600,   # Recicla conexiones cada hora
+        poolclass=TimedQueuePool,  # QueuePool que mide la espera por conexión (/api/metrics)
+        pool_logging_name=name,
+        pool_size=pool_size,          # Tamaño del pool de conexiones
+        max_overflow=max_overflow,    # Máximo de conexiones adicionales
+        pool_timeout=float(os.getenv('DB_POOL_TIMEOUT', '30'))   # Espera máxima por una conexión libre
+    )
 
-# JWT configuration
-jwt = JWTManager(app)
 
 # Database setup
-engine = create_engine(
-    DATABASE_URL, 
-    echo=True if os.getenv('DEBUG') == 'true' else False,
-    pool_pre_ping=True,  # Verifica conexiones antes de usarlas
-    pool_recycle=3600,   # Recicla conexiones cada hora
-    pool_size=5,         # Tamaño del pool de conexiones
-    max_overflow=10      # Máximo de conexiones adicionales
+# El pool es por proceso: con workers gthread/gevent debe cubrir los requests
+# simultáneos de un worker (GUNICORN_THREADS / GEVENT_CONNECTIONS, ver
+# gunicorn.conf.py). Total en Postgres: workers x (pool_size + max_overflow)
+engine = build_engine(
+    DATABASE_URL, 'primary',
+    int(os.getenv('DB_POOL_SIZE', '5')), int(os.getenv('DB_MAX_OVERFLOW', '10'))
+)
+read_engine = build_engine(
+    DATABASE_READ_URL, 'replica',
+    int(os.getenv('DB_READ_POOL_SIZE', os.getenv('DB_POOL_SIZE', '5'))),
+    int(os.getenv('DB_READ_MAX_OVERFLOW', os.getenv('DB_MAX_OVERFLOW', '10')))
+) if DATABASE_READ_URL else None
+
+# Una sesión por contexto de la app (un request): no depende de threading.local,
+# que con --preload y gevent se crearía antes del monkey patch y sería
+# compartido por todos los greenlets del worker. RoutingSession manda los
+# SELECT de requests de solo lectura a la réplica, si hay
+Session = scoped_session(
+    sessionmaker(bind=engine, class_=RoutingSession),
+    scopefunc=lambda: id(g._get_current_object())
 )
-Session = scoped_session(sessionmaker(bind=engine))
-
-# Crear tablas si no existen
-Base.metadata.create_all(engine)
-
-# Run Python-based migrations inline
-print("🔄 Running Python migrations...")
-try:
-    from sqlalchemy import text
-    with engine.connect() as conn:
-        # Check if created_by_id column exists
-        result = conn.execute(text("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'tickets' 
-            AND column_name = 'created_by_id'
-        """))
-        
-        if result.fetchone():
-            print("✓ Column created_by_id already exists")
-        else:
-            print("🔄 Adding created_by_id column...")
-            
-            # Add column as nullable
-            conn.execute(text("ALTER TABLE tickets ADD COLUMN created_by_id VARCHAR(50)"))
-            conn.commit()
-            print("✓ Column added")
-            
-            # Populate with client_id
-            conn.execute(text("UPDATE tickets SET created_by_id = client_id WHERE created_by_id IS NULL"))
-            conn.commit()
-            print("✓ Existing tickets updated")
-            
-            # Make NOT NULL
-            conn.execute(text("ALTER TABLE tickets ALTER COLUMN created_by_id SET NOT NULL"))
-            conn.commit()
-            print("✓ Column set to NOT NULL")
-            
-            # Add foreign key
-            conn.execute(text("ALTER TABLE tickets ADD CONSTRAINT fk_tickets_created_by FOREIGN KEY (created_by_id) REFERENCES users(user_id)"))
-            conn.commit()
-            print("✓ Foreign key added")
-            
-            # Add index
-            conn.execute(text("CREATE INDEX idx_tickets_created_by ON tickets(created_by_id)"))
-            conn.commit()
-            print("✓ Index created")
-            
-            print("✅ Migration completed: created_by_id field added")
-except Exception as e:
-    print(f"⚠ Migration warning: {e}")
-    # Don't fail startup if migration fails
-
-# Dependency injection para sesión de base de datos
-@app.before_request
-def before_request():
-    from flask import g
-    g.db = Session()
-
-@app.teardown_request
-def teardown_request(exception=None):
-    from flask import g
-    db = g.pop('db', None)
-    if db is not None:
-        db.close()
-
-# Registrar blueprints
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(tickets_bp, url_prefix='/api/tickets')
-app.register_blueprint(comments_bp, url_prefix='/api/comments')
-app.register_blueprint(attachments_bp, url_prefix='/api/attachments')
-app.register_blueprint(users_bp, url_prefix='/api/users')
-app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
-app.register_blueprint(notifications_bp, url_prefix='/api/notifications')
-app.register_blueprint(audit_bp, url_prefix='/api/audit')
-app.register_blueprint(backup_bp, url_prefix='/api/backup')
-app.register_blueprint(settings_bp, url_prefix='/api')
-app.register_blueprint(projects_bp, url_prefix='/api/projects')
-app.register_blueprint(rating_bp)  # No prefix - uses full path from blueprint
-app.register_blueprint(admin_tools_bp, url_prefix='/api/admin')
-
-# Error handlers
-@app.errorhandler(404)
-def not_found(error):
-    return jsonify({'error': 'Recurso no encontrado'}), 404
-
-@app.errorhandler(500)
-def internal_error(error):
-    return jsonify({'error': 'Error interno del servidor'}), 500
-
-@app.errorhandler(413)
-def request_entity_too_large(error):
-    return jsonify({'error': 'Archivo demasiado grande. Máximo 50MB'}), 413
-
-# JWT error handlers
-@jwt.expired_token_loader
-def expired_token_callback(jwt_header, jwt_payload):
-    return jsonify({
-        'error': 'Token expirado',
-        'message': 'El token de autenticación ha expirado'
-    }), 401
-
-@jwt.invalid_token_loader
-def invalid_token_callback(error):
-    return jsonify({
-        'error': 'Token inválido',
-        'message': 'El token de autenticación es inválido'
-    }), 401
-
-@jwt.unauthorized_loader
-def missing_token_callback(error):
-    return jsonify({
-        'error': 'Token requerido',
-        'message': 'Se requiere autenticación para acceder a este recurso'
-    }), 401
-
-# Health check endpoint
-@app.route('/api/health', methods=['GET'])
-def health_check():
-    """Endpoint de verificación de salud del servicio"""
-    return jsonify({
-        'status': 'healthy',
-        'service': 'Green House Project - Sistema de Soporte',
-        'version': '1.5.0-qr-history'
-    })
-
-# Root endpoint
-@app.route('/', methods=['GET'])
-def root():
-    """Endpoint raíz con información del API"""
-    return jsonify({
-        'name': 'Green House Project - Sistema de Soporte Post-Venta',
-        'version': '1.0.0',
-        'description': 'API REST para gestión de tickets de soporte',
-        'endpoints': {
-            'auth': '/api/auth',
-            'tickets': '/api/tickets',
-            'comments': '/api/comments',
-            'attachments': '/api/attachments',
-            'users': '/api/users',
-            'dashboard': '/api/dashboard',
-            'notifications': '/api/notifications',
-            'audit': '/api/audit',
-            'health': '/api/health'
+metrics.instrument_engine(engine, 'primary')
+if read_engine is not None:
+    metrics.instrument_engine(read_engine, 'replica')
+db_router.configure(read_engine)
+storage_gc.configure(sessionmaker(bind=engine))
+# Al construir el servicio (primer email), no al importar: ver services/registry.py
+registry.on_build('email_service', lambda service: service.outbox.configure(sessionmaker(bind=engine)))
+notification_coalescer.configure(sessionmaker(bind=engine))
+
+# El esquema lo aplica src/migrate.py una vez por deploy (startup.sh):
+# importar la app no hace DDL ni consultas al catálogo
+
+
+def reset_after_fork():
+    """
+    Hook post_fork de gunicorn (gunicorn.conf.py)
+    Con --preload el worker hereda el pool del master: se descarta sin cerrar
+    las conexiones (siguen siendo del padre) y el worker abre las suyas.
+    Los hilos de fondo (cola de emails, WhatsApp, GC...) ya se arrancan por pid.
+    """
+    engine.dispose(close=False)
+    if read_engine is not None:
+        read_engine.dispose(close=False)
+
+
+def create_app():
+    """
+    Construye la app Flask
+    El engine y la sesión son del módulo (uno por proceso); con --preload el
+    master llama a create_app() una vez y los workers comparten esa memoria
+    por copy-on-write hasta que reset_after_fork() rehace el pool.
+    """
+    # Crear aplicación Flask
+    app = Flask(__name__)
+    app.url_map.strict_slashes = False  # Evitar redirects por barras finales
+    # jsonify con orjson (services/json_provider.py; JSON_PROVIDER=default lo desactiva)
+    app.json_provider_class = provider_class()
+    app.json = app.json_provider_class(app)
+
+    # Configuración
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
+    app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
+    app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)
+    app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
+
+    # Database configuration
+    app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
+
+    # CORS configuration
+    CORS(app, 
+         resources={r"/api/*": {"origins": "*"}},
+         supports_credentials=False,
+         allow_headers=["Content-Type", "Authorization"],
+         methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
+         expose_headers=["Content-Type", "Authorization"])
+
+    # JWT configuration
+    jwt = JWTManager(app)
+
+    # gzip/brotli según Accept-Encoding; registrado primero: corre último en after_request
+    compressor.init_app(app)
+
+    # Métricas por request (/api/metrics): antes que el resto de los hooks
+    metrics.init_app(app)
+    # Detector de N+1 / presupuesto de queries (QUERY_AUDIT, solo desarrollo y CI)
+    query_audit.init_app(app, *[e for e in (engine, read_engine) if e is not None])
+    # Read-your-writes: marca a quien escribió para leer del primario un rato
+    db_router.init_app(app)
+
+    # Dependency injection para sesión de base de datos
+    @app.before_request
+    def before_request():
+        g.db = Session()
+        db_router.route(g.db)
+        # Hilos de fondo: se arrancan en el propio worker (una vez por proceso)
+        storage_gc.start()
+        notification_coalescer.start()
+
+    @app.teardown_request
+    def teardown_request(exception=None):
+        g.pop('db', None)
+        # Cierra la sesión del hilo y la quita del registro: el próximo request
+        # atendido por este hilo/greenlet empieza con una sesión nueva
+        Session.remove()
+
+    # Registrar blueprints
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(tickets_bp, url_prefix='/api/tickets')
+    app.register_blueprint(comments_bp, url_prefix='/api/comments')
+    app.register_blueprint(attachments_bp, url_prefix='/api/attachments')
+    app.register_blueprint(users_bp, url_prefix='/api/users')
+    app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
+    app.register_blueprint(notifications_bp, url_prefix='/api/notifications')
+    app.register_blueprint(audit_bp, url_prefix='/api/audit')
+    app.register_blueprint(backup_bp, url_prefix='/api/backup')
+    app.register_blueprint(settings_bp, url_prefix='/api')
+    app.register_blueprint(projects_bp, url_prefix='/api/projects')
+    app.register_blueprint(rating_bp)  # No prefix - uses full path from blueprint
+    app.register_blueprint(admin_tools_bp, url_prefix='/api/admin')
+
+    # Error handlers
+    @app.errorhandler(404)
+    def not_found(error):
+        return jsonify({'error': 'Recurso no encontrado'}), 404
+
+    @app.errorhandler(500)
+    def internal_error(error):
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+    @app.errorhandler(413)
+    def request_entity_too_large(error):
+        return jsonify({'error': 'Archivo demasiado grande. Máximo 50MB'}), 413
+
+    # JWT error handlers
+    @jwt.expired_token_loader
+    def expired_token_callback(jwt_header, jwt_payload):
+        return jsonify({
+            'error': 'Token expirado',
+            'message': 'El token de autenticación ha expirado'
+        }), 401
+
+    @jwt.invalid_token_loader
+    def invalid_token_callback(error):
+        return jsonify({
+            'error': 'Token inválido',
+            'message': 'El token de autenticación es inválido'
+        }), 401
+
+    @jwt.unauthorized_loader
+    def missing_token_callback(error):
+        return jsonify({
+            'error': 'Token requerido',
+            'message': 'Se requiere autenticación para acceder a este recurso'
+        }), 401
+
+    # Health check endpoint
+    @app.route('/api/health', methods=['GET'])
+    def health_check():
+        """Endpoint de verificación de salud del servicio"""
+        return jsonify({
+            'status': 'healthy',
+            'service': 'Green House Project - Sistema de Soporte',
+            'version': '1.5.0-qr-history'
+        })
+
+    # Root endpoint
+    @app.route('/', methods=['GET'])
+    def root():
+        """Endpoint raíz con información del API"""
+        return jsonify({
+            'name': 'Green House Project - Sistema de Soporte Post-Venta',
+            'version': '1.0.0',
+            'description': 'API REST para gestión de tickets de soporte',
+            'endpoints': {
+                'auth': '/api/auth',
+                'tickets': '/api/tickets',
+                'comments': '/api/comments',
+                'attachments': '/api/attachments',
+                'users': '/api/users',
+                'dashboard': '/api/dashboard',
+                'notifications': '/api/notifications',
+                'audit': '/api/audit',
+                'health': '/api/health'
+            }
+        })
+
+    # Debug endpoint for notification config
+    @app.route('/api/debug/notifications', methods=['GET'])
+    def debug_notifications():
+        """Endpoint para verificar configuración de notificaciones"""
+        import os
+        from services.email_service import email_service
+    
+        return {
+            'email': {
+                'enabled': email_service.enabled,
+                'smtp_host': email_service.smtp_host,
+                'smtp_port': email_service.smtp_port,
+                'smtp_user': email_service.smtp_user,
+                'from_email': email_service.from_email,
+                'from_name': email_service.from_name,
+                'env_EMAIL_ENABLED': os.getenv('EMAIL_ENABLED', 'NOT SET'),
+                'env_SMTP_USER': os.getenv('SMTP_USER', 'NOT SET')
+            },
+            'whatsapp': {
+                'twilio_configured': bool(os.getenv('TWILIO_ACCOUNT_SID') and os.getenv('TWILIO_AUTH_TOKEN')),
+                'twilio_from': os.getenv('TWILIO_WHATSAPP_FROM', 'NOT SET')
+            }
         }
-    })
-
-# Debug endpoint for notification config
-@app.route('/api/debug/notifications', methods=['GET'])
-def debug_notifications():
-    """Endpoint para verificar configuración de notificaciones"""
-    import os
-    from services.email_service import email_service
+
+    # Debug endpoint for fake providers (PROVIDER_MODE=fake)
+    @app.route('/api/debug/providers', methods=['GET'])
+    def debug_providers():
+        """Llamadas a proveedores simulados hechas por este worker"""
+        from services.fake_providers import is_fake_mode, FakeProvider
+        from services.whatsapp_dispatcher import whatsapp_dispatcher
+    
+        if not is_fake_mode():
+            return jsonify({'error': 'Solo disponible con PROVIDER_MODE=fake'}), 404
     
-    return {
-        'email': {
-            'enabled': email_service.enabled,
-            'smtp_host': email_service.smtp_host,
-            'smtp_port': email_service.smtp_port,
-            'smtp_user': email_service.smtp_user,
-            'from_email': email_service.from_email,
-            'from_name': email_service.from_name,
-            'env_EMAIL_ENABLED': os.getenv('EMAIL_ENABLED', 'NOT SET'),
-            'env_SMTP_USER': os.getenv('SMTP_USER', 'NOT SET')
-        },
-        'whatsapp': {
-            'twilio_configured': bool(os.getenv('TWILIO_ACCOUNT_SID') and os.getenv('TWILIO_AUTH_TOKEN')),
-            'twilio_from': os.getenv('TWILIO_WHATSAPP_FROM', 'NOT SET')
+        return {
+            'pid': os.getpid(),
+            'in_process': FakeProvider.snapshot(),
+            'email_outbox': sendgrid_email_service.outbox.get_status(),
+            'whatsapp': whatsapp_dispatcher.get_status()
         }
-    }
+
+    return app
+
+
+app = create_app()
 
 if __name__ == '__main__':
+    # En desarrollo no pasa por startup.sh: migrar antes de servir
+    import migrate
+    migrate.run(engine)
+    
     port = int(os.getenv('PORT', 5000))
     debug = os.getenv('DEBUG', 'false').lower() == 'true'
     app.run(host='0.0.0.0', port=port, debug=debug)
@@ -0,0 +1,204 @@
+"""
+Migraciones versionadas del esquema
+Green House Project - Sistema de Soporte
+
+Se ejecutan una vez por deploy desde startup.sh, antes de arrancar
+gunicorn; los workers ya no hacen DDL ni consultas al catálogo al importar
+app.py. Cada migración corre en su propia transacción junto con su fila en
+schema_version, así que una migración fallida no queda a medias ni
+marcada. Un advisory lock de PostgreSQL evita que dos deploys simultáneos
+migren a la vez: el segundo espera y luego no encuentra nada pendiente.
+
+Para agregar una migración: escribir la función y sumarla al final de
+MIGRATIONS con el siguiente número. Nunca cambiar una ya publicada.
+
+Ejecutar con: python src/migrate.py [--status]
+"""
+
+import os
+import sys
+import argparse
+from datetime import datetime
+
+from sqlalchemy import Table, Column, Integer, String, DateTime, MetaData, create_engine, inspect, select, text
+
+
+# Tabla propia (fuera de Base) para que create_all no la toque
+schema_version = Table(
+    'schema_version', MetaData(),
+    Column('version', Integer, primary_key=True),
+    Column('name', String(255), nullable=False),
+    Column('applied_at', DateTime, nullable=False, default=datetime.utcnow)
+)
+
+# Clave para pg_advisory_lock: un runner a la vez
+LOCK_KEY = 0x6768705f6d67  # 'ghp_mg'
+
+
+def _column_exists(conn, table, column):
+    return column in {c['name'] for c in inspect(conn).get_columns(table)}
+
+
+def create_tables(conn):
+    """Esquema base: modelos de models.py y tablas declaradas en los servicios"""
+    from models import Base
+    # Importar los servicios registra sus tablas en Base.metadata
+    import services.cloudinary_storage      # storage_blobs, storage_deletions
+    import services.email_outbox            # email_dead_letters
+    import services.notification_coalescer  # notification_events, notification_preferences
+    Base.metadata.create_all(conn)  # checkfirst: solo crea las que faltan
+
+
+def tickets_created_by_id(conn):
+    """tickets.created_by_id (antes se agregaba al importar app.py)"""
+    if _column_exists(conn, 'tickets', 'created_by_id'):
+        return
+    conn.execute(text("ALTER TABLE tickets ADD COLUMN created_by_id VARCHAR(50)"))
+    conn.execute(text("UPDATE tickets SET created_by_id = client_id WHERE created_by_id IS NULL"))
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text("ALTER TABLE tickets ALTER COLUMN created_by_id SET NOT NULL"))
+        conn.execute(text(
+            "ALTER TABLE tickets ADD CONSTRAINT fk_tickets_created_by "
+            "FOREIGN KEY (created_by_id) REFERENCES users(user_id)"
+        ))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_tickets_created_by ON tickets (created_by_id)"))
+
+
+def tickets_rating_requested_at(conn):
+    """tickets.rating_requested_at para la campaña de calificaciones"""
+    if not _column_exists(conn, 'tickets', 'rating_requested_at'):
+        conn.execute(text("ALTER TABLE tickets ADD COLUMN rating_requested_at TIMESTAMP"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_tickets_rating_pending ON tickets (ticket_id) "
+        "WHERE rating IS NULL AND rating_requested_at IS NULL"
+    ))
+
+
+def tickets_version(conn):
+    """tickets.version: sube con cada escritura del ticket (ETags, services/ticket_versions.py)"""
+    if not _column_exists(conn, 'tickets', 'version'):
+        conn.execute(text("ALTER TABLE tickets ADD COLUMN version INTEGER NOT NULL DEFAULT 0"))
+
+
+def query_shape_indexes(conn):
+    """
+    Índices compuestos/parciales según los filtros reales de las rutas
+    (ver scripts/explain_indexes.py, que verifica el plan de cada una)
+    """
+    from models import TicketHistory
+    history = TicketHistory.__table__.name
+    indexes = [
+        # Carga por ingeniero (auto-asignación, dashboard): assigned_to IN (...) AND status IN (...)
+        "CREATE INDEX IF NOT EXISTS idx_tickets_assignee_status ON tickets (assigned_to, status)",
+        # Listado del cliente: client_id = ? ORDER BY created_at DESC
+        "CREATE INDEX IF NOT EXISTS idx_tickets_client_created ON tickets (client_id, created_at)",
+        # Numeración de tickets por proyecto y filtro project_id
+        "CREATE INDEX IF NOT EXISTS idx_tickets_project ON tickets (project_id)",
+        # Vencidos / por vencer: status IN (...) AND sla_resolution_deadline < ?
+        "CREATE INDEX IF NOT EXISTS idx_tickets_status_deadline ON tickets (status, sla_resolution_deadline)",
+        # Desempeño: calificados del ingeniero, recientes primero
+        "CREATE INDEX IF NOT EXISTS idx_tickets_rated_by_assignee ON tickets (assigned_to, updated_at) "
+        "WHERE rating IS NOT NULL",
+        # Historial del ticket ordenado por fecha
+        f"CREATE INDEX IF NOT EXISTS idx_history_ticket_created ON {history} (ticket_id, created_at)",
+        # fix-timestamps: primer evento de una acción del ticket
+        f"CREATE INDEX IF NOT EXISTS idx_history_ticket_action ON {history} (ticket_id, action, created_at)",
+    ]
+    for statement in indexes:
+        conn.execute(text(statement))
+    if conn.dialect.name == 'postgresql':
+        # Estadísticas al día para que el planner considere los índices nuevos
+        conn.execute(text(f"ANALYZE tickets, {history}"))
+
+
+def storage_blobs_public_id(conn):
+    """storage_blobs.public_id: el id exacto que devolvió Cloudinary (los raw llevan extensión)"""
+    if not _column_exists(conn, 'storage_blobs', 'public_id'):
+        conn.execute(text("ALTER TABLE storage_blobs ADD COLUMN public_id VARCHAR(500)"))
+
+
+MIGRATIONS = [
+    (1, 'create_tables', create_tables),
+    (2, 'tickets_created_by_id', tickets_created_by_id),
+    (3, 'tickets_rating_requested_at', tickets_rating_requested_at),
+    (4, 'tickets_version', tickets_version),
+    (5, 'query_shape_indexes', query_shape_indexes),
+    (6, 'storage_blobs_public_id', storage_blobs_public_id),
+]
+
+
+def applied_versions(conn):
+    if not inspect(conn).has_table('schema_version'):
+        return set()
+    return set(conn.execute(select(schema_version.c.version)).scalars())
+
+
+def pending_migrations(engine):
+    with engine.connect() as conn:
+        applied = applied_versions(conn)
+    return [m for m in MIGRATIONS if m[0] not in applied]
+
+
+def run(engine):
+    """
+    Aplica las migraciones pendientes en orden
+    Returns: lista de (versión, nombre) aplicadas en esta ejecución
+    """
+    lock = engine.connect()
+    try:
+        if engine.dialect.name == 'postgresql':
+            # Bloqueante: si otro deploy está migrando, esperar a que termine
+            lock.execute(text("SELECT pg_advisory_lock(:key)"), {'key': LOCK_KEY})
+            lock.commit()
+
+        with engine.begin() as conn:
+            schema_version.create(conn, checkfirst=True)
+
+        applied = []
+        for version, name, migration in pending_migrations(engine):
+            print(f"🔄 Migración {version:03d} {name}...")
+            with engine.begin() as conn:
+                migration(conn)
+                conn.execute(schema_version.insert().values(
+                    version=version, name=name, applied_at=datetime.utcnow()
+                ))
+            print(f"✓ Migración {version:03d} aplicada")
+            applied.append((version, name))
+
+        # Repetible: startup.sh borra audit_logs antes de migrar; antes la
+        # recreaba el create_all que corría al importar app.py
+        if 1 not in {version for version, _ in applied}:
+            with engine.begin() as conn:
+                create_tables(conn)
+        return applied
+    finally:
+        if engine.dialect.name == 'postgresql':
+            lock.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': LOCK_KEY})
+        lock.close()
+
+
+def get_database_url():
+    """Obtiene la URL de la base de datos desde las variables de entorno"""
+    return os.environ.get('DATABASE_URL', 'sqlite:///soporte.db')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migraciones del esquema')
+    parser.add_argument('--status', action='store_true', help='Solo listar las migraciones pendientes')
+    args = parser.parse_args()
+
+    engine = create_engine(get_database_url())
+    if args.status:
+        pending = pending_migrations(engine)
+        for version, name, _ in pending:
+            print(f"  pendiente {version:03d} {name}")
+        print(f"{len(pending)} migraciones pendientes de {len(MIGRATIONS)}")
+        return 0
+
+    applied = run(engine)
+    print(f"✅ Esquema al día ({len(applied)} migraciones aplicadas)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
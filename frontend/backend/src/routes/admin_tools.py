@@ -3,9 +3,13 @@ Admin Tools - Herramientas administrativas
 Green House Project - Sistema de Soporte
 """
 
-from flask import Blueprint, jsonify, g
+from flask import Blueprint, jsonify, request, g
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import User, Ticket, TicketHistory, TicketStatus
+from services.storage_gc import storage_gc
+from services.email_service_sendgrid import email_service
+from services.email_outbox import EmailDeadLetter
+from services.rating_campaign import rating_campaign, EmailDisabled
 from datetime import timedelta
 
 admin_tools_bp = Blueprint('admin_tools', __name__)
@@ -125,3 +129,124 @@ def recalculate_sla(current_user):
     except Exception as e:
         g.db.rollback()
         return jsonify({'error': 'Error al recalcular SLA', 'details': str(e)}), 500
+
+
+@admin_tools_bp.route('/storage-gc', methods=['GET'])
+@admin_required
+def storage_gc_status(current_user):
+    """
+    Estado de la cola de borrado de archivos en Cloudinary.
+    """
+    try:
+        return jsonify(storage_gc.get_status()), 200
+    except Exception as e:
+        return jsonify({'error': 'Error al consultar la cola de borrado', 'details': str(e)}), 500
+
+
+@admin_tools_bp.route('/storage-gc/run', methods=['POST'])
+@admin_required
+def storage_gc_run(current_user):
+    """
+    Procesa ya los borrados pendientes, sin esperar al hilo de fondo.
+    """
+    try:
+        result = storage_gc.process_pending()
+        return jsonify({
+            'message': f"Se borraron {result['deleted']} archivos",
+            **result
+        }), 200
+    except Exception as e:
+        return jsonify({'error': 'Error al procesar borrados', 'details': str(e)}), 500
+
+
+@admin_tools_bp.route('/storage-gc/reconcile', methods=['POST'])
+@admin_required
+def storage_gc_reconcile(current_user):
+    """
+    Busca archivos huérfanos en Cloudinary y los encola para borrado.
+    """
+    try:
+        orphans = storage_gc.reconcile()
+        if orphans is None:
+            return jsonify({'error': 'Ya hay una reconciliación en curso'}), 409
+        return jsonify({
+            'message': f'Se encolaron {orphans} archivos huérfanos',
+            'orphans': orphans
+        }), 200
+    except Exception as e:
+        return jsonify({'error': 'Error al reconciliar almacenamiento', 'details': str(e)}), 500
+
+
+@admin_tools_bp.route('/email-outbox', methods=['GET'])
+@admin_required
+def email_outbox_status(current_user):
+    """
+    Estado de la cola de salida de emails de este worker y dead letters pendientes.
+    """
+    try:
+        return jsonify(email_service.outbox.get_status()), 200
+    except Exception as e:
+        return jsonify({'error': 'Error al consultar la cola de emails', 'details': str(e)}), 500
+
+
+@admin_tools_bp.route('/email-dead-letters', methods=['GET'])
+@admin_required
+def list_email_dead_letters(current_user):
+    """
+    Lista los emails que no se pudieron enviar y aún no se reenviaron.
+    """
+    try:
+        dead_letters = g.db.query(EmailDeadLetter).filter(
+            EmailDeadLetter.replayed_at.is_(None)
+        ).order_by(EmailDeadLetter.created_at.desc()).limit(100).all()
+        return jsonify({
+            'dead_letters': [dead_letter.to_dict() for dead_letter in dead_letters],
+            'total': len(dead_letters)
+        }), 200
+    except Exception as e:
+        return jsonify({'error': 'Error al listar dead letters', 'details': str(e)}), 500
+
+
+@admin_tools_bp.route('/email-dead-letters/replay', methods=['POST'])
+@admin_required
+def replay_email_dead_letters(current_user):
+    """
+    Reenvía dead letters. Body opcional: {"ids": [1, 2]}; sin ids, reenvía hasta 100.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        replayed = email_service.outbox.replay(ids=data.get('ids'))
+        return jsonify({
+            'message': f'Se reencolaron {replayed} emails',
+            'replayed': replayed
+        }), 200
+    except Exception as e:
+        return jsonify({'error': 'Error al reenviar emails', 'details': str(e)}), 500
+
+
+@admin_tools_bp.route('/rating-campaign', methods=['POST'])
+@admin_required
+def run_rating_campaign(current_user):
+    """
+    Solicita calificación de los tickets resueltos/cerrados que no la tienen.
+    Body opcional: {"dry_run": true, "limit": 200, "per_client": 1}
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        result = rating_campaign.run(
+            g.db,
+            dry_run=bool(data.get('dry_run', False)),
+            limit=data.get('limit'),
+            per_client=int(data.get('per_client', 1))
+        )
+        if result is None:
+            return jsonify({'error': 'Ya hay una campaña de calificación en curso'}), 409
+        return jsonify({
+            'message': f"Se solicitaron {result['sent']} calificaciones",
+            **result
+        }), 200
+    except EmailDisabled as e:
+        return jsonify({'error': 'Los emails están deshabilitados', 'details': str(e)}), 503
+    except Exception as e:
+        g.db.rollback()
+        return jsonify({'error': 'Error en la campaña de calificación', 'details': str(e)}), 500
@@ -4,16 +4,30 @@ Green House Project - Sistema de Soporte
 Usando Cloudinary para almacenamiento persistente
 """
 
-from flask import Blueprint, request, jsonify, redirect, g
+from flask import Blueprint, request, jsonify, g
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.utils import secure_filename
 from models import Attachment, Ticket, User, FileType
 from services.cloudinary_storage import cloudinary_storage
+from services.query_audit import query_budget
+from services.http_cache import (
+    make_etag, is_not_modified, set_validators, not_modified_response, cached_redirect
+)
+from sqlalchemy import func
+from concurrent.futures import ThreadPoolExecutor
 import uuid
 from datetime import datetime
 
 attachments_bp = Blueprint('attachments', __name__)
 
+# Batch uploads
+MAX_BATCH_FILES = 20
+UPLOAD_CONCURRENCY = 4
+
+# Cache for the Cloudinary redirects: the target URL of an attachment never changes
+VIEW_CACHE_CONTROL = 'public, max-age=86400'
+DOWNLOAD_CACHE_CONTROL = 'private, max-age=3600'
+
 
 @attachments_bp.route('/upload', methods=['POST'])
 @jwt_required()
@@ -52,33 +66,13 @@ def upload_attachment():
         
         # Save file using Cloudinary storage service
         cloudinary_url, file_size, error = cloudinary_storage.save_file(
-            file, original_filename, ticket_id
+            file, original_filename, ticket_id, db=g.db
         )
         
         if error:
             return jsonify({'error': error}), 400
         
-        # Get MIME type
-        mime_type = cloudinary_storage.get_mime_type(original_filename)
-        
-        # Determine file type enum
-        file_type_enum = Attachment.determine_file_type(mime_type)
-        
-        # Create attachment record
-        attachment_id = f"ATT-{datetime.utcnow().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
-        
-        # The file_url is now the Cloudinary URL directly
-        attachment = Attachment(
-            attachment_id=attachment_id,
-            ticket_id=ticket_id,
-            uploaded_by=user.user_id,
-            file_type=file_type_enum,
-            file_name=original_filename,
-            file_size=file_size,
-            file_url=cloudinary_url,  # Direct Cloudinary URL
-            mime_type=mime_type
-        )
-        
+        attachment = build_attachment(ticket_id, user.user_id, original_filename, file_size, cloudinary_url)
         g.db.add(attachment)
         
         # Update ticket's updated_at
@@ -97,8 +91,170 @@ def upload_attachment():
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
 
 
+@attachments_bp.route('/upload-batch', methods=['POST'])
+@jwt_required()
+def upload_attachments_batch():
+    """
+    Upload several files to a ticket in one request
+    All files are validated first, then uploaded to Cloudinary concurrently.
+    Every successful file gets its Attachment row in a single commit; failed
+    files are reported individually and don't abort the rest of the batch.
+    
+    Form data: ticket_id, files (repeated)
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        user = g.db.query(User).filter_by(user_id=current_user_id).first()
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        ticket_id = request.form.get('ticket_id')
+        if not ticket_id:
+            return jsonify({'error': 'ticket_id is required'}), 400
+        
+        ticket = g.db.query(Ticket).filter_by(ticket_id=ticket_id).first()
+        if not ticket:
+            return jsonify({'error': 'Ticket not found'}), 404
+        
+        if user.role.value == 'client' and ticket.client_id != user.user_id:
+            return jsonify({'error': 'Access denied'}), 403
+        
+        files = [f for f in request.files.getlist('files') if f and f.filename]
+        if not files:
+            return jsonify({'error': 'No files provided'}), 400
+        if len(files) > MAX_BATCH_FILES:
+            return jsonify({'error': f'Too many files. Maximum is {MAX_BATCH_FILES} per batch'}), 400
+        
+        # 1. Validate everything before any byte goes upstream
+        items = []
+        for file in files:
+            original_filename = secure_filename(file.filename)
+            file_size, content_hash, error = cloudinary_storage.inspect_file(file, original_filename)
+            items.append({
+                'file': file,
+                'file_name': original_filename,
+                'file_size': file_size,
+                'content_hash': content_hash,
+                'resource_type': cloudinary_storage.get_resource_type(original_filename),
+                'storage_path': None,
+                'error': error
+            })
+        valid = [item for item in items if not item['error']]
+        
+        # 2. Reuse content that is already stored; upload each new hash once
+        stored = {}      # content_hash -> storage_path
+        uploaders = {}   # content_hash -> item that uploads it
+        for item in valid:
+            content_hash = item['content_hash']
+            if content_hash in stored or content_hash in uploaders:
+                continue
+            blob = cloudinary_storage.acquire_blob(g.db, content_hash)
+            if blob is not None:
+                stored[content_hash] = blob.storage_path
+                item['storage_path'] = blob.storage_path
+            else:
+                uploaders[content_hash] = item
+        
+        # 3. Upload new content concurrently (network only, no DB access in the pool)
+        def upload(item):
+            return cloudinary_storage.upload(
+                item['file'], item['file_name'], ticket_id, item['resource_type'],
+                content_hash=item['content_hash']
+            )
+        
+        if uploaders:
+            with ThreadPoolExecutor(max_workers=min(UPLOAD_CONCURRENCY, len(uploaders))) as pool:
+                futures = {content_hash: pool.submit(upload, item) for content_hash, item in uploaders.items()}
+            for content_hash, future in futures.items():
+                item = uploaders[content_hash]
+                try:
+                    storage_path, public_id = future.result()
+                    storage_path = cloudinary_storage.register_blob(
+                        g.db, content_hash, storage_path, public_id, item['resource_type'], item['file_size']
+                    )
+                    stored[content_hash] = storage_path
+                    item['storage_path'] = storage_path
+                except Exception as e:
+                    print(f"✗ Error uploading to Cloudinary: {e}")
+                    item['error'] = f"Error saving file: {str(e)}"
+        
+        # 4. Duplicates inside the batch take one more reference on the shared blob
+        for item in valid:
+            content_hash = item['content_hash']
+            if item['storage_path'] or item['error']:
+                continue
+            if content_hash in stored:
+                cloudinary_storage.acquire_blob(g.db, content_hash)
+                item['storage_path'] = stored[content_hash]
+            else:
+                item['error'] = uploaders[content_hash]['error']
+        
+        # 5. One commit for every attachment row
+        uploaded = 0
+        for item in items:
+            if item['error']:
+                continue
+            item['attachment'] = build_attachment(
+                ticket_id, user.user_id, item['file_name'], item['file_size'], item['storage_path']
+            )
+            g.db.add(item['attachment'])
+            uploaded += 1
+        
+        if uploaded:
+            ticket.updated_at = datetime.utcnow()
+        g.db.commit()
+        
+        # Per-file results, in the order the files were sent
+        results = []
+        for item in items:
+            if item['error']:
+                results.append({'file_name': item['file_name'], 'success': False, 'error': item['error']})
+            else:
+                results.append({
+                    'file_name': item['file_name'],
+                    'success': True,
+                    'attachment': item['attachment'].to_dict(include_uploader=True)
+                })
+        
+        return jsonify({
+            'message': f'{uploaded} of {len(items)} files uploaded',
+            'uploaded': uploaded,
+            'failed': len(items) - uploaded,
+            'results': results
+        }), 201 if uploaded else 400
+        
+    except Exception as e:
+        g.db.rollback()
+        print(f"Error uploading attachments batch: {e}")
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+
+def build_attachment(ticket_id, user_id, original_filename, file_size, cloudinary_url):
+    """Create the Attachment row for a stored file (not added to the session)"""
+    # MIME type and file type enum, from the precomputed lookup table
+    mime_type = cloudinary_storage.get_mime_type(original_filename)
+    file_type_enum = cloudinary_storage.get_file_type(original_filename)
+    
+    # Create attachment record
+    attachment_id = f"ATT-{datetime.utcnow().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
+    
+    # The file_url is now the Cloudinary URL directly
+    return Attachment(
+        attachment_id=attachment_id,
+        ticket_id=ticket_id,
+        uploaded_by=user_id,
+        file_type=file_type_enum,
+        file_name=original_filename,
+        file_size=file_size,
+        file_url=cloudinary_url,  # Direct Cloudinary URL
+        mime_type=mime_type
+    )
+
+
 @attachments_bp.route('/ticket/<ticket_id>', methods=['GET'])
 @jwt_required()
+@query_budget(5)
 def get_ticket_attachments(ticket_id):
     """Get all attachments for a ticket"""
     try:
@@ -117,15 +273,32 @@ def get_ticket_attachments(ticket_id):
         if user.role.value == 'client' and ticket.client_id != user.user_id:
             return jsonify({'error': 'Access denied'}), 403
         
+        # Cheap validator: the list only changes when rows are added or removed.
+        # ETag only: max(uploaded_at) alone does not change when an older file
+        # is deleted, so a Last-Modified / If-Modified-Since 304 would be stale
+        total, last_uploaded = g.db.query(
+            func.count(Attachment.attachment_id), func.max(Attachment.uploaded_at)
+        ).filter(Attachment.ticket_id == ticket_id).one()
+        etag = make_etag('attachments', ticket_id, total, last_uploaded.isoformat() if last_uploaded else None)
+        
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+        
         # Get attachments
         attachments = g.db.query(Attachment).filter_by(ticket_id=ticket_id).order_by(
             Attachment.uploaded_at.desc()
         ).all()
         
-        return jsonify({
+        # Uploaders in one query: include_uploader then reads them from the
+        # identity map (weak references, so keep the list alive until jsonify)
+        uploader_ids = {att.uploaded_by for att in attachments if att.uploaded_by}
+        loaded_uploaders = g.db.query(User).filter(User.user_id.in_(uploader_ids)).all() if uploader_ids else []
+        
+        response = jsonify({
             'attachments': [att.to_dict(include_uploader=True) for att in attachments],
             'total': len(attachments)
-        }), 200
+        })
+        return set_validators(response, etag), 200
         
     except Exception as e:
         print(f"Error getting attachments: {e}")
@@ -143,14 +316,16 @@ def view_attachment(storage_path):
         # Check if this is a Cloudinary URL stored in the path
         # or if we need to look up the attachment
         
-        # First, try to find the attachment by the storage path
+        # First, try to find the attachment by the storage path. Deduplicated
+        # blobs are shared by several rows, all with the same file_url: any of
+        # them redirects to the same file, the order only makes it stable
         attachment = g.db.query(Attachment).filter(
             Attachment.file_url.contains(storage_path)
-        ).first()
+        ).order_by(Attachment.uploaded_at.asc()).first()
         
         if attachment and 'cloudinary.com' in attachment.file_url:
-            # Redirect to Cloudinary URL
-            return redirect(attachment.file_url)
+            # Redirect to Cloudinary URL; browsers reuse it without hitting us again
+            return cached_redirect(attachment.file_url, VIEW_CACHE_CONTROL)
         
         # Legacy local file - no longer available
         return jsonify({
@@ -177,10 +352,18 @@ def download_attachment(storage_path):
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        # Find attachment by storage path
-        attachment = g.db.query(Attachment).filter(
-            Attachment.file_url.contains(storage_path)
-        ).first()
+        # Find attachment by storage path. A deduplicated blob is shared by
+        # attachments of several tickets: look only among the user's tickets
+        query = g.db.query(Attachment).filter(Attachment.file_url.contains(storage_path))
+        accessible = query
+        if user.role.value == 'client':
+            accessible = query.join(Ticket, Ticket.ticket_id == Attachment.ticket_id).filter(
+                Ticket.client_id == user.user_id
+            )
+        attachment = accessible.order_by(Attachment.uploaded_at.asc()).first()
+        
+        if not attachment and query.first() is not None:
+            return jsonify({'error': 'Access denied'}), 403
         
         if not attachment:
             # Try to extract ticket_id from storage_path for legacy files
@@ -208,7 +391,7 @@ def download_attachment(storage_path):
                 download_url += '&fl_attachment=true'
             else:
                 download_url += '?fl_attachment=true'
-            return redirect(download_url)
+            return cached_redirect(download_url, DOWNLOAD_CACHE_CONTROL)
         
         # Legacy local file
         return jsonify({
@@ -241,11 +424,12 @@ def delete_attachment(attachment_id):
         if user.role.value != 'admin' and attachment.uploaded_by != user.user_id:
             return jsonify({'error': 'Access denied'}), 403
         
-        # Delete file from Cloudinary if it's a Cloudinary URL
+        # Release the Cloudinary file; once no other attachment shares it,
+        # the storage GC deletes it in the background
         if 'cloudinary.com' in attachment.file_url:
-            success, error = cloudinary_storage.delete_file(attachment.file_url)
-            if not success:
-                print(f"Warning: Could not delete file from Cloudinary: {error}")
+            scheduled, error = cloudinary_storage.release_file(g.db, attachment.file_url)
+            if error:
+                print(f"Warning: Could not schedule Cloudinary deletion: {error}")
         
         # Delete from database
         g.db.delete(attachment)
@@ -8,6 +8,10 @@ from models import User, Ticket, TicketStatus, TicketPriority, UserRole
 from sqlalchemy import func, case, and_, or_
 from datetime import datetime, timedelta
 
+# Queries que hace get_enhanced_admin_stats (todas de forma fija, sin N+1).
+# La ruta que la llama las suma a las suyas en su @query_budget.
+ENHANCED_ADMIN_STATS_QUERIES = 20
+
 
 def get_enhanced_admin_stats():
     """
@@ -83,49 +87,42 @@ def get_enhanced_admin_stats():
         User.is_active == True
     ).all()
     
-    engineer_stats = []
-    for engineer in engineers:
-        # Tickets asignados activos
-        active_tickets = g.db.query(Ticket).filter(
-            Ticket.assigned_to == engineer.user_id,
-            Ticket.status.in_([TicketStatus.ASSIGNED, TicketStatus.IN_PROGRESS, TicketStatus.WAITING])
-        ).count()
-        
-        # Tickets resueltos
-        resolved_tickets = g.db.query(Ticket).filter(
-            Ticket.assigned_to == engineer.user_id,
-            Ticket.status.in_([TicketStatus.RESOLVED, TicketStatus.CLOSED])
-        ).count()
-        
-        # Calificación promedio
-        engineer_rating = g.db.query(func.avg(Ticket.rating)).filter(
-            Ticket.assigned_to == engineer.user_id,
-            Ticket.rating.isnot(None)
-        ).scalar()
-        
-        # Tiempo promedio de resolución
-        engineer_avg_resolution = g.db.query(
-            func.avg(
+    # Una sola query agregada por ingeniero (antes eran 6 por ingeniero)
+    closed_statuses = [TicketStatus.RESOLVED, TicketStatus.CLOSED]
+    per_engineer = {
+        row.assigned_to: row
+        for row in g.db.query(
+            Ticket.assigned_to,
+            func.sum(case(
+                (Ticket.status.in_([TicketStatus.ASSIGNED, TicketStatus.IN_PROGRESS, TicketStatus.WAITING]), 1),
+                else_=0
+            )).label('active_tickets'),
+            func.sum(case((Ticket.status.in_(closed_statuses), 1), else_=0)).label('closed_tickets'),
+            func.sum(case(
+                (and_(Ticket.status.in_(closed_statuses), Ticket.sla_resolution_met == True), 1),
+                else_=0
+            )).label('sla_met'),
+            # avg ignora NULL: sin calificación / sin resolver no cuentan
+            func.avg(Ticket.rating).label('avg_rating'),
+            (func.avg(
                 func.extract('epoch', Ticket.resolved_at) - func.extract('epoch', Ticket.created_at)
-            ) / 3600
+            ) / 3600).label('avg_resolution_hours')
         ).filter(
-            Ticket.assigned_to == engineer.user_id,
-            Ticket.resolved_at.isnot(None)
-        ).scalar() or 0
-        
-        # Tasa de cumplimiento SLA
-        engineer_total_closed = g.db.query(Ticket).filter(
-            Ticket.assigned_to == engineer.user_id,
-            Ticket.status.in_([TicketStatus.RESOLVED, TicketStatus.CLOSED])
-        ).count()
-        
-        engineer_sla_met = g.db.query(Ticket).filter(
-            Ticket.assigned_to == engineer.user_id,
-            Ticket.status.in_([TicketStatus.RESOLVED, TicketStatus.CLOSED]),
-            Ticket.sla_resolution_met == True
-        ).count()
+            Ticket.assigned_to.in_([engineer.user_id for engineer in engineers])
+        ).group_by(Ticket.assigned_to).all()
+    }
+    
+    engineer_stats = []
+    for engineer in engineers:
+        row = per_engineer.get(engineer.user_id)
+        active_tickets = int(row.active_tickets or 0) if row else 0
+        # Tickets resueltos (resueltos + cerrados)
+        resolved_tickets = int(row.closed_tickets or 0) if row else 0
+        engineer_sla_met = int(row.sla_met or 0) if row else 0
+        engineer_rating = row.avg_rating if row else None
+        engineer_avg_resolution = (row.avg_resolution_hours if row else None) or 0
         
-        engineer_sla_rate = (engineer_sla_met / engineer_total_closed * 100) if engineer_total_closed > 0 else 0
+        engineer_sla_rate = (engineer_sla_met / resolved_tickets * 100) if resolved_tickets > 0 else 0
         
         engineer_stats.append({
             'engineer_id': engineer.user_id,
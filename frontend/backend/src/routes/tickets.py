@@ -5,18 +5,42 @@ Green House Project - Sistema de Soporte
 
 from flask import Blueprint, request, jsonify, g
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import User, Ticket, TicketPriority, TicketStatus, TicketHistory, Notification, UserRole
-from services.opensolar_service import OpenSolarService
-from services.notification_service import NotificationService
+from models import User, Ticket, TicketPriority, TicketStatus, TicketHistory, Notification, UserRole, Attachment
+from services.fake_providers import opensolar_service as create_opensolar_service
 from services.email_service_sendgrid import email_service
+from services.cloudinary_storage import cloudinary_storage
+from services.notification_coalescer import notification_coalescer
+from services.registry import lazy_service
+from services.whatsapp_dispatcher import whatsapp_dispatcher
+from services.metrics import metrics
+from services.http_cache import is_not_modified, set_validators, not_modified_response
+from services import ticket_versions
+from services.db_routing import use_primary
 from services.audit import AuditService, get_request_info
+from services.query_audit import query_budget
 from uuid import uuid4
 from datetime import datetime
 from sqlalchemy import or_, and_, func
+from sqlalchemy.exc import IntegrityError
 
 tickets_bp = Blueprint('tickets', __name__)
-opensolar_service = OpenSolarService()
-notification_service = NotificationService()
+TICKET_ID_ATTEMPTS = 5  # Reintentos si otro request tomó el mismo número
+TICKET_ID_CONSTRAINTS = ('tickets_pkey', 'tickets_ticket_id_key')
+opensolar_service = lazy_service('opensolar_service', create_opensolar_service)
+
+
+def is_ticket_id_conflict(error):
+    """
+    True si el IntegrityError es por un ticket_id repetido (PK de tickets).
+    Cualquier otra violación (FK de cliente/ingeniero, NOT NULL...) no se
+    arregla con otro número y debe propagarse.
+    """
+    diag = getattr(error.orig, 'diag', None)
+    constraint = getattr(diag, 'constraint_name', None)
+    if constraint:  # PostgreSQL (psycopg2/psycopg)
+        return constraint in TICKET_ID_CONSTRAINTS
+    # SQLite: "UNIQUE constraint failed: tickets.ticket_id"
+    return 'tickets.ticket_id' in str(error.orig)
 
 
 def get_available_engineer():
@@ -34,20 +58,38 @@ def get_available_engineer():
     if not engineers:
         return None
     
-    # Contar tickets activos por ingeniero (no cerrados ni resueltos)
-    engineer_loads = []
-    for engineer in engineers:
-        active_tickets = g.db.query(Ticket).filter(
-            Ticket.assigned_to == engineer.user_id,
+    # Contar tickets activos por ingeniero (no cerrados ni resueltos), en una sola query
+    engineer_loads = dict(
+        g.db.query(Ticket.assigned_to, func.count(Ticket.ticket_id))
+        .filter(
+            Ticket.assigned_to.in_([engineer.user_id for engineer in engineers]),
             Ticket.status.in_([TicketStatus.NEW, TicketStatus.ASSIGNED, TicketStatus.IN_PROGRESS, TicketStatus.WAITING])
-        ).count()
-        engineer_loads.append((engineer, active_tickets))
-    
-    # Ordenar por carga (menos tickets primero)
-    engineer_loads.sort(key=lambda x: x[1])
+        )
+        .group_by(Ticket.assigned_to)
+        .all()
+    )
     
-    # Retornar el ingeniero con menos carga
-    return engineer_loads[0][0] if engineer_loads else None
+    # Retornar el ingeniero con menos carga (en empate, el primero)
+    return min(engineers, key=lambda engineer: engineer_loads.get(engineer.user_id, 0))
+
+
+def preload_ticket_users(tickets):
+    """
+    Carga en una sola query los usuarios que to_dict(include_relations=True)
+    embebe (cliente, creador, ingeniero). Quedan en el identity map de la
+    sesión, así las relaciones many-to-one los resuelven sin otra query.
+    El identity map guarda referencias débiles: el llamador debe conservar
+    la lista devuelta mientras serializa.
+    """
+    user_ids = {
+        user_id
+        for ticket in tickets
+        for user_id in (ticket.client_id, ticket.created_by_id, ticket.assigned_to)
+        if user_id
+    }
+    if not user_ids:
+        return []
+    return g.db.query(User).filter(User.user_id.in_(user_ids)).all()
 
 
 @tickets_bp.route('/', methods=['POST'])
@@ -92,9 +134,8 @@ def create_ticket():
         # Si admin/ingeniero crea el ticket, buscar/crear cliente desde OpenSolar
         if user.role.value in ['admin', 'engineer']:
             try:
-                from services.opensolar_service import OpenSolarService
-                opensolar = OpenSolarService()
-                opensolar_data = opensolar.get_project_data(data['project_id'])
+                with metrics.outbound('opensolar'):
+                    opensolar_data = opensolar_service.get_project_data(data['project_id'])
                 
                 if opensolar_data and opensolar_data.get('client_email') and opensolar_data['client_email'] != 'N/A':
                     client_email = opensolar_data['client_email'].strip().lower()
@@ -117,8 +158,8 @@ def create_ticket():
                             user_id=f"USR-{uuid4().hex[:12].upper()}",
                             email=client_email,
                             password_hash=secrets.token_urlsafe(32),  # Password temporal
-                            full_name=opensolar_data.get('client_name', 'Cliente').strip(),
-                            phone=opensolar_data.get('client_phone', '').strip() or None,
+                            full_name=(opensolar_data.get('client_name') or 'Cliente').strip(),
+                            phone=(opensolar_data.get('client_phone') or '').strip() or None,
                             role=UserRole.CLIENT,
                             opensolar_project_ids=[data['project_id']]
                         )
@@ -184,7 +225,18 @@ def create_ticket():
         sla_config = get_sla_config(ticket.priority.value)
         ticket.calculate_sla_deadlines(sla_config)
         
-        g.db.add(ticket)
+        # Con workers de hilos/gevent dos requests del mismo proyecto pueden
+        # contar lo mismo: si el ticket_id ya existe se prueba el siguiente
+        for attempt in range(TICKET_ID_ATTEMPTS):
+            try:
+                with g.db.begin_nested():
+                    g.db.add(ticket)
+                break
+            except IntegrityError as e:
+                if not is_ticket_id_conflict(e) or attempt == TICKET_ID_ATTEMPTS - 1:
+                    raise
+                project_ticket_count += 1
+                ticket.ticket_id = f"{data['project_id']}-{str(project_ticket_count + 1).zfill(3)}"
         
         # Crear entrada en historial
         history = TicketHistory.create_entry(
@@ -215,9 +267,6 @@ def create_ticket():
         # )
         print(f'⚠ Audit logging disabled (table dropped)')
         
-        # Enviar notificaciones en thread separado (no bloqueante)
-        # Extraer datos antes del thread para evitar problemas con SQLAlchemy session
-        
         # Obtener datos del CLIENTE REAL del ticket (no del creador)
         actual_client = g.db.query(User).filter(User.user_id == ticket_client_id).first()
         client_name = actual_client.full_name if actual_client else 'Cliente'
@@ -233,85 +282,41 @@ def create_ticket():
                 engineer_phone = engineer.phone
                 engineer_name = engineer.full_name
         
-        notification_data = {
-            'ticket_id': ticket.ticket_id,
-            'ticket_title': ticket.title,
-            'client_name': client_name,
-            'client_email': client_email,
-            'client_phone': client_phone,
-            'priority': ticket.priority if isinstance(ticket.priority, str) else ticket.priority.value,
-            'category': ticket.category,
-            'description': ticket.description,
-            'assigned_to_id': ticket.assigned_to,
-            'project_id': ticket.project_id,
-            'engineer_phone': engineer_phone,
-            'engineer_name': engineer_name
-        }
-        
-        def send_notifications_async(data):
-            try:
-                # Enviar email al cliente
-                email_service.send_ticket_created_notification(
-                    ticket_id=data['ticket_id'],
-                    ticket_title=data['ticket_title'],
-                    client_name=data['client_name'],
-                    client_email=data['client_email'],
-                    priority=data['priority'],
-                    category=data['category'],
-                    description=data['description']
-                )
-                print(f"[EMAIL] Notificación enviada para ticket {data['ticket_id']}")
-                
-                # Enviar WhatsApp al ingeniero si está asignado y es prioridad alta/crítica
-                from services.notification_service import NotificationService
-                notification_service = NotificationService()
-                
-                if data.get('engineer_phone') and data['priority'] in ['high', 'critical']:
-                    # WhatsApp al ingeniero
-                    notification_service.send_whatsapp(
-                        to=data['engineer_phone'],
-                        message=f"""🔔 *Nuevo ticket asignado*
-
-📋 Ticket: {data['ticket_id']}
-📝 Título: {data['ticket_title']}
-⚡ Prioridad: {data['priority'].upper()}
-🏠 Proyecto: {data['project_id']}
-👤 Cliente: {data['client_name']}
-
-Revisa los detalles en el sistema de soporte."""
-                    )
-                    print(f"[WHATSAPP] Notificación enviada a ingeniero {data['engineer_name']} ({data['engineer_phone']})")
-                
-                # Enviar WhatsApp al cliente si tiene teléfono
-                if data.get('client_phone'):
-                    # WhatsApp al cliente
-                    notification_service.send_whatsapp(
-                        to=data['client_phone'],
-                        message=f"""🔔 *Ticket de soporte creado*
-
-📋 Ticket: {data['ticket_id']}
-📝 Título: {data['ticket_title']}
-⚡ Prioridad: {data['priority'].upper()}
-🏠 Proyecto: {data['project_id']}
-
-Hemos recibido tu solicitud y estamos trabajando en ella.
-Te mantendremos informado del progreso.
-
-Green House Project - Soporte Técnico"""
-                    )
-                    print(f"[WHATSAPP] Notificación enviada a cliente {data['client_name']} ({data['client_phone']})")
-                        
-            except Exception as e:
-                print(f"[NOTIFICATIONS] Error: {e}")
-                import traceback
-                traceback.print_exc()
-                # No fallar el ticket si las notificaciones fallan
-                pass
-        
-        # Ejecutar en thread separado
-        import threading
-        notification_thread = threading.Thread(target=send_notifications_async, args=(notification_data,), daemon=True)
-        notification_thread.start()
+        # Email y WhatsApp solo se encolan (cola de salida y whatsapp_dispatcher):
+        # el request no espera a SendGrid ni a Twilio
+        try:
+            priority = ticket.priority if isinstance(ticket.priority, str) else ticket.priority.value
+            email_service.send_ticket_created_notification(
+                ticket_id=ticket.ticket_id,
+                ticket_title=ticket.title,
+                client_name=client_name,
+                client_email=client_email,
+                priority=priority,
+                category=ticket.category,
+                description=ticket.description
+            )
+            print(f"[EMAIL] Notificación encolada para ticket {ticket.ticket_id}")
+            
+            whatsapp_context = {
+                'ticket_id': ticket.ticket_id,
+                'ticket_title': ticket.title,
+                'priority': priority.upper(),
+                'project_id': ticket.project_id,
+                'client_name': client_name
+            }
+            
+            # WhatsApp al ingeniero si está asignado y es prioridad alta/crítica
+            if engineer_phone and priority in ['high', 'critical']:
+                whatsapp_dispatcher.send_template(engineer_phone, 'ticket_created_engineer', **whatsapp_context)
+                print(f"[WHATSAPP] Notificación encolada para ingeniero {engineer_name} ({engineer_phone})")
+            
+            # WhatsApp al cliente si tiene teléfono
+            if client_phone:
+                whatsapp_dispatcher.send_template(client_phone, 'ticket_created_client', **whatsapp_context)
+                print(f"[WHATSAPP] Notificación encolada para cliente {client_name} ({client_phone})")
+        except Exception as e:
+            # No fallar el ticket si las notificaciones fallan
+            print(f"[NOTIFICATIONS] Error: {e}")
         
         return jsonify({
             'message': 'Ticket creado exitosamente',
@@ -330,6 +335,7 @@ Green House Project - Soporte Técnico"""
 
 @tickets_bp.route('/', methods=['GET'])
 @jwt_required()
+@query_budget(4)
 def list_tickets():
     """
     Listar tickets con filtros
@@ -438,6 +444,7 @@ def list_tickets():
         
         total = query.count()
         tickets = query.limit(per_page).offset((page - 1) * per_page).all()
+        users = preload_ticket_users(tickets)  # Referencia viva hasta serializar
         
         return jsonify({
             'tickets': [ticket.to_dict(include_relations=True) for ticket in tickets],
@@ -457,12 +464,21 @@ def list_tickets():
 
 @tickets_bp.route('/<ticket_id>', methods=['GET'])
 @jwt_required()
+@query_budget(4)
 def get_ticket(ticket_id):
     """
     Obtener detalles de un ticket específico
     """
     try:
         current_user_id = get_jwt_identity()
+        
+        # Revalidación: una lectura de (version, updated_at) por clave primaria;
+        # si el cliente ya tiene esta versión no se carga ni serializa el ticket
+        validators = ticket_versions.lookup(g.db, ticket_id)
+        etag = ticket_versions.etag('ticket', ticket_id, current_user_id, validators) if validators else None
+        if etag and is_not_modified(etag):
+            return not_modified_response(etag)
+        
         user = g.db.query(User).filter_by(user_id=current_user_id).first()
         
         if not user:
@@ -477,9 +493,11 @@ def get_ticket(ticket_id):
         if not user.can_view_ticket(ticket):
             return jsonify({'error': 'No tiene permisos para ver este ticket'}), 403
         
-        return jsonify({
+        users = preload_ticket_users([ticket])  # Referencia viva hasta serializar
+        response = jsonify({
             'ticket': ticket.to_dict(include_relations=True)
-        }), 200
+        })
+        return set_validators(response, etag) if etag else response, 200
         
     except Exception as e:
         return jsonify({'error': 'Error al obtener ticket', 'details': str(e)}), 500
@@ -621,7 +639,7 @@ def assign_ticket(ticket_id):
         g.db.commit()
         
         # Notificar al ingeniero
-        notification_service.notify_ticket_assigned(ticket, engineer)
+        whatsapp_dispatcher.notify_ticket_assigned(ticket, engineer)
         
         # Enviar email al ingeniero
         try:
@@ -692,26 +710,33 @@ def change_ticket_status(ticket_id):
             {'notes': data.get('notes')}
         )
         
-        g.db.commit()
+        # Cambios seguidos se notifican juntos (cambio neto) desde notification_coalescer
+        coalesced = notification_coalescer.record_status_change(
+            g.db, ticket, old_status.value, new_status.value, user.full_name
+        )
         
-        # Notificar cambio de estado
-        notification_service.notify_status_changed(ticket, old_status.value, new_status.value)
+        g.db.commit()
         
-        # Enviar email al cliente
-        try:
+        if not coalesced:
             client = g.db.query(User).filter_by(user_id=ticket.client_id).first()
-            if client:
-                email_service.send_status_change_notification(
-                    ticket_id=ticket.ticket_id,
-                    ticket_title=ticket.title,
-                    old_status=old_status.value,
-                    new_status=new_status.value,
-                    client_email=client.email,
-                    client_name=client.full_name,
-                    changed_by=user.full_name
-                )
-        except Exception as e:
-            print(f"Error sending email: {e}")
+            
+            # Notificar cambio de estado
+            whatsapp_dispatcher.notify_status_changed(ticket, old_status.value, new_status.value, client)
+            
+            # Enviar email al cliente
+            try:
+                if client:
+                    email_service.send_status_change_notification(
+                        ticket_id=ticket.ticket_id,
+                        ticket_title=ticket.title,
+                        old_status=old_status.value,
+                        new_status=new_status.value,
+                        client_email=client.email,
+                        client_name=client.full_name,
+                        changed_by=user.full_name
+                    )
+            except Exception as e:
+                print(f"Error sending email: {e}")
         
         return jsonify({
             'message': 'Estado actualizado exitosamente',
@@ -769,7 +794,8 @@ def resolve_ticket(ticket_id):
         g.db.commit()
         
         # Notificar resolución
-        notification_service.notify_ticket_resolved(ticket)
+        client = g.db.query(User).filter_by(user_id=ticket.client_id).first()
+        whatsapp_dispatcher.notify_ticket_resolved(ticket, client)
         
         return jsonify({
             'message': 'Ticket resuelto exitosamente',
@@ -853,6 +879,13 @@ def get_ticket_history(ticket_id):
     """
     try:
         current_user_id = get_jwt_identity()
+        
+        # El historial solo crece con escrituras que suben tickets.version
+        validators = ticket_versions.lookup(g.db, ticket_id)
+        etag = ticket_versions.etag('history', ticket_id, current_user_id, validators) if validators else None
+        if etag and is_not_modified(etag):
+            return not_modified_response(etag)
+        
         user = g.db.query(User).filter_by(user_id=current_user_id).first()
         
         if not user:
@@ -868,9 +901,10 @@ def get_ticket_history(ticket_id):
         
         history = g.db.query(TicketHistory).filter_by(ticket_id=ticket_id).order_by(TicketHistory.created_at.desc()).all()
         
-        return jsonify({
+        response = jsonify({
             'history': [entry.to_dict() for entry in history]
-        }), 200
+        })
+        return set_validators(response, etag) if etag else response, 200
         
     except Exception as e:
         return jsonify({'error': 'Error al obtener historial', 'details': str(e)}), 500
@@ -1011,6 +1045,12 @@ def delete_ticket(ticket_id):
             'client_id': ticket.client_id
         }
         
+        # Liberar los archivos en Cloudinary; el recolector los borra en segundo plano
+        attachment_urls = g.db.query(Attachment.file_url).filter_by(ticket_id=ticket_id).all()
+        for (file_url,) in attachment_urls:
+            if 'cloudinary.com' in file_url:
+                cloudinary_storage.release_file(g.db, file_url)
+        
         # Eliminar ticket (cascade eliminará comentarios, archivos, historial, etc.)
         g.db.delete(ticket)
         g.db.commit()
@@ -1160,6 +1200,7 @@ def rate_ticket_public(ticket_id):
 
 
 @tickets_bp.route('/<ticket_id>/rate-quick/<int:rating>', methods=['GET'])
+@use_primary  # GET que escribe: leer el ticket del primario
 def rate_ticket_quick(ticket_id, rating):
     """
     Calificación rápida desde email (one-click)
@@ -6,6 +6,8 @@ Green House Project - Sistema de Soporte
 from flask import Blueprint, request, jsonify, g
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import User, Ticket, TicketStatus, UserRole
+from services.notification_coalescer import notification_coalescer
+from services.query_audit import query_budget
 from sqlalchemy import func, desc
 from datetime import datetime, timedelta
 
@@ -13,6 +15,7 @@ users_bp = Blueprint('users', __name__)
 
 @users_bp.route('/me', methods=['GET'])
 @jwt_required()
+@query_budget(1)
 def get_current_user():
     """Obtener datos del usuario actual"""
     try:
@@ -27,8 +30,50 @@ def get_current_user():
     except Exception as e:
         return jsonify({'error': 'Error al obtener usuario', 'details': str(e)}), 500
 
+@users_bp.route('/me/notification-preferences', methods=['GET'])
+@jwt_required()
+def get_notification_preferences():
+    """Obtener preferencias de notificación del usuario actual"""
+    try:
+        current_user_id = get_jwt_identity()
+        preference = notification_coalescer.get_preference(g.db, current_user_id)
+        return jsonify(preference.to_dict()), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Error al obtener preferencias', 'details': str(e)}), 500
+
+@users_bp.route('/me/notification-preferences', methods=['PUT'])
+@jwt_required()
+def update_notification_preferences():
+    """
+    Actualizar preferencias de notificación
+    
+    Body:
+    {
+        "daily_digest": true
+    }
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json() or {}
+        
+        if not isinstance(data.get('daily_digest'), bool):
+            return jsonify({'error': 'daily_digest debe ser booleano'}), 400
+        
+        preference = notification_coalescer.get_preference(g.db, current_user_id)
+        preference.daily_digest = data['daily_digest']
+        g.db.add(preference)
+        g.db.commit()
+        
+        return jsonify(preference.to_dict()), 200
+        
+    except Exception as e:
+        g.db.rollback()
+        return jsonify({'error': 'Error al actualizar preferencias', 'details': str(e)}), 500
+
 @users_bp.route('/me/performance', methods=['GET'])
 @jwt_required()
+@query_budget(5)
 def get_performance_metrics():
     """
     Obtener métricas de desempeño del ingeniero actual
@@ -130,13 +175,15 @@ def get_performance_metrics():
             Ticket.rating.isnot(None)
         ).order_by(desc(Ticket.updated_at)).limit(10).all()
         
+        # Nombres de los clientes en una sola query
+        client_ids = {t.client_id for t in recent_tickets if t.client_id}
+        client_names = dict(
+            g.db.query(User.user_id, User.full_name).filter(User.user_id.in_(client_ids)).all()
+        ) if client_ids else {}
+        
         recent_ratings = []
         for t in recent_tickets:
-            client_name = "Cliente"
-            if t.client_id:
-                client = g.db.query(User).filter_by(user_id=t.client_id).first()
-                if client:
-                    client_name = client.full_name
+            client_name = client_names.get(t.client_id) or "Cliente"
             
             recent_ratings.append({
                 'ticket_id': t.ticket_id,
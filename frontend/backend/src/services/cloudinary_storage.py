@@ -4,80 +4,202 @@ Green House Project - Sistema de Soporte
 """
 
 import os
-import cloudinary
-import cloudinary.uploader
-import cloudinary.api
+import hashlib
 from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Callable, NamedTuple
+from sqlalchemy import Column, String, Integer, DateTime, Text
+from sqlalchemy.exc import IntegrityError
 from werkzeug.utils import secure_filename
+from models import Base, Attachment
+from services.fake_providers import is_fake_mode, fake_providers_url
+from services.registry import lazy_service
+from services.metrics import metrics
 import uuid
 
+
+# === Detección de tipo por contenido (magic bytes) ===
+
+HEIF_BRANDS = frozenset({b'heic', b'heix', b'hevc', b'hevx', b'heim', b'heis', b'mif1', b'msf1'})
+QUICKTIME_ATOMS = frozenset({b'moov', b'mdat', b'wide', b'free', b'skip', b'pnot'})
+
+
+def _is_heif(head):
+    return head[4:8] == b'ftyp' and head[8:12] in HEIF_BRANDS
+
+
+def _is_iso_video(head):
+    # MP4 / MOV modernos: caja ftyp con cualquier marca que no sea de imagen
+    return head[4:8] == b'ftyp' and head[8:12] not in HEIF_BRANDS
+
+
+def _is_quicktime(head):
+    return _is_iso_video(head) or head[4:8] in QUICKTIME_ATOMS
+
+
+def _is_text(head):
+    return b'\x00' not in head
+
+
+class FileKind(NamedTuple):
+    """Todo lo que se deriva de una extensión permitida"""
+    resource_type: str                 # Cloudinary: image / video / raw
+    mime_type: str
+    file_type: Any                     # models.FileType
+    matches: Callable[[bytes], bool]   # Comprueba los primeros bytes del archivo
+
+
+def _kind(resource_type, mime_type, matches):
+    return FileKind(resource_type, mime_type, Attachment.determine_file_type(mime_type), matches)
+
+
+# Tabla única y de solo lectura: extensión -> FileKind
+FILE_KINDS = MappingProxyType({
+    # Images
+    'png': _kind('image', 'image/png', lambda h: h.startswith(b'\x89PNG\r\n\x1a\n')),
+    'jpg': _kind('image', 'image/jpeg', lambda h: h.startswith(b'\xff\xd8\xff')),
+    'jpeg': _kind('image', 'image/jpeg', lambda h: h.startswith(b'\xff\xd8\xff')),
+    'gif': _kind('image', 'image/gif', lambda h: h[:6] in (b'GIF87a', b'GIF89a')),
+    'webp': _kind('image', 'image/webp', lambda h: h[:4] == b'RIFF' and h[8:12] == b'WEBP'),
+    'heic': _kind('image', 'image/heic', _is_heif),
+    # Videos
+    'mp4': _kind('video', 'video/mp4', _is_iso_video),
+    'mov': _kind('video', 'video/quicktime', _is_quicktime),
+    'avi': _kind('video', 'video/x-msvideo', lambda h: h[:4] == b'RIFF' and h[8:12] == b'AVI '),
+    'webm': _kind('video', 'video/webm', lambda h: h.startswith(b'\x1a\x45\xdf\xa3')),
+    'mkv': _kind('video', 'video/x-matroska', lambda h: h.startswith(b'\x1a\x45\xdf\xa3')),
+    # Documents
+    'pdf': _kind('raw', 'application/pdf', lambda h: h.startswith(b'%PDF-')),
+    'doc': _kind('raw', 'application/msword', lambda h: h.startswith(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1')),
+    'docx': _kind('raw', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+                  lambda h: h.startswith(b'PK\x03\x04')),
+    'txt': _kind('raw', 'text/plain', _is_text),
+})
+
+
+class StorageBlob(Base):
+    """
+    Archivo físico en Cloudinary, indexado por el SHA-256 de su contenido.
+    Varios adjuntos pueden apuntar al mismo blob; ref_count lleva la cuenta.
+    """
+    __tablename__ = 'storage_blobs'
+
+    content_hash = Column(String(64), primary_key=True)
+    storage_path = Column(String(500), nullable=False, index=True)
+    # Tal como lo devolvió Cloudinary (los raw lo incluyen con extensión).
+    # NULL en blobs anteriores a la migración 006: se deduce de la URL.
+    public_id = Column(String(500))
+    resource_type = Column(String(20), nullable=False)
+    file_size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=1)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class StorageDeletion(Base):
+    """
+    Archivo pendiente de borrar en Cloudinary.
+    Lo procesa en lote el recolector de services/storage_gc.py.
+    """
+    __tablename__ = 'storage_deletions'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    public_id = Column(String(500), nullable=False)
+    resource_type = Column(String(20), nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, index=True)  # NULL = sin más reintentos
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
 class CloudinaryStorageService:
     """Servicio para gestionar almacenamiento de archivos en Cloudinary"""
     
     # Configuración
     MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
-    ALLOWED_EXTENSIONS = {
-        'image': {'png', 'jpg', 'jpeg', 'gif', 'webp', 'heic'},
-        'video': {'mp4', 'mov', 'avi', 'webm', 'mkv'},
-        'document': {'pdf', 'doc', 'docx', 'txt'}
-    }
+    READ_CHUNK_SIZE = 1024 * 1024  # 1MB
+    SNIFF_SIZE = 512  # Bytes inspected to detect the real content type
+    ALLOWED_EXTENSIONS = frozenset(FILE_KINDS)
+    NOT_ALLOWED_ERROR = f"File type not allowed. Allowed: {', '.join(sorted(FILE_KINDS))}"
     
     def __init__(self):
-        """Initialize Cloudinary storage service"""
+        """Initialize Cloudinary storage service (on first use, see services/registry.py)"""
         self._configure_cloudinary()
     
     def _configure_cloudinary(self):
         """Configure Cloudinary with environment variables"""
+        # Imported here: the SDK is only loaded by workers that touch storage
+        import cloudinary
+        import cloudinary.uploader
+        import cloudinary.api
+        self.uploader = cloudinary.uploader
+        self.api = cloudinary.api
+        
         cloudinary.config(
             cloud_name=os.getenv('CLOUDINARY_CLOUD_NAME', 'dx25wtuzh'),
             api_key=os.getenv('CLOUDINARY_API_KEY', '638696834116625'),
             api_secret=os.getenv('CLOUDINARY_API_SECRET', 'bwXSxb8F8Uq_y65e_qePZc5hM40'),
             secure=True
         )
+        if is_fake_mode():
+            # Uploads y Admin API contra el Cloudinary simulado (scripts/fake_providers.py)
+            cloudinary.config(upload_prefix=fake_providers_url())
         print("✓ Cloudinary configured successfully")
     
-    def validate_file(self, file, filename):
+    def inspect_file(self, file, filename):
         """
-        Validate file before upload
-        Returns: (is_valid, error_message)
+        Validate file in a single streaming pass, hashing its content on the way
+        Returns: (file_size, content_hash, error)
         """
         # Check if file exists
         if not file or not filename:
-            return False, "No file provided"
-        
-        # Check file size
-        file.seek(0, os.SEEK_END)
-        file_size = file.tell()
-        file.seek(0)  # Reset to beginning
+            return None, None, "No file provided"
         
-        if file_size > self.MAX_FILE_SIZE:
-            max_mb = self.MAX_FILE_SIZE / (1024 * 1024)
-            return False, f"File too large. Maximum size is {max_mb}MB"
-        
-        if file_size == 0:
-            return False, "File is empty"
-        
-        # Check extension
-        extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
-        all_allowed = set()
-        for exts in self.ALLOWED_EXTENSIONS.values():
-            all_allowed.update(exts)
+        kind = self.get_file_kind(filename)
+        if kind is None:
+            return None, None, self.NOT_ALLOWED_ERROR
         
-        if extension not in all_allowed:
-            return False, f"File type not allowed. Allowed: {', '.join(all_allowed)}"
+        # Read once: content sniffing, size limit and SHA-256 together
+        digest = hashlib.sha256()
+        file_size = 0
+        file.seek(0)
+        try:
+            chunk = file.read(self.READ_CHUNK_SIZE)
+            if not chunk:
+                return None, None, "File is empty"
+            if not kind.matches(chunk[:self.SNIFF_SIZE]):
+                return None, None, "File content does not match its extension"
+            
+            while chunk:
+                file_size += len(chunk)
+                if file_size > self.MAX_FILE_SIZE:
+                    max_mb = self.MAX_FILE_SIZE / (1024 * 1024)
+                    return None, None, f"File too large. Maximum size is {max_mb}MB"
+                digest.update(chunk)
+                chunk = file.read(self.READ_CHUNK_SIZE)
+        finally:
+            file.seek(0)  # Reset to beginning
         
+        return file_size, digest.hexdigest(), None
+    
+    def validate_file(self, file, filename):
+        """
+        Validate file before upload
+        Returns: (is_valid, error_message)
+        """
+        _, _, error = self.inspect_file(file, filename)
+        if error:
+            return False, error
         return True, None
     
+    def get_file_kind(self, filename):
+        """Look up the FileKind for a filename's extension (None if not allowed)"""
+        extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+        return FILE_KINDS.get(extension)
+    
     def get_resource_type(self, filename):
         """Determine Cloudinary resource type from filename"""
-        extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
-        
-        if extension in self.ALLOWED_EXTENSIONS['image']:
-            return 'image'
-        elif extension in self.ALLOWED_EXTENSIONS['video']:
-            return 'video'
-        else:
-            return 'raw'  # For documents and other files
+        kind = self.get_file_kind(filename)
+        return kind.resource_type if kind else 'raw'  # For documents and other files
     
     def generate_public_id(self, original_filename, ticket_id):
         """Generate unique public ID for Cloudinary"""
@@ -88,49 +210,48 @@ class CloudinaryStorageService:
         # Format: soporte-ghp/ticket_id/timestamp_uniqueid
         return f"soporte-ghp/{ticket_id}/{timestamp}_{unique_id}"
     
-    def save_file(self, file, original_filename, ticket_id):
+    def generate_blob_public_id(self, content_hash):
+        """
+        Public ID for a deduplicated blob
+        The blob can be shared by attachments of any ticket, so the path must
+        not name one. The random suffix keeps concurrent uploads of the same
+        content (see register_blob) from overwriting each other.
+        """
+        unique_id = str(uuid.uuid4())[:8]
+        return f"soporte-ghp/blobs/{content_hash[:16]}_{unique_id}"
+    
+    def save_file(self, file, original_filename, ticket_id, db=None):
         """
         Save file to Cloudinary
+        If a db session is given, identical content is stored only once: the
+        existing blob is reused (ref_count + 1) and the upload is skipped.
+        The caller owns the transaction and must commit.
         Returns: (storage_path, file_size, error)
         """
         try:
-            # Validate file
-            is_valid, error = self.validate_file(file, original_filename)
-            if not is_valid:
+            # Validate file (size + SHA-256 in one pass)
+            file_size, content_hash, error = self.inspect_file(file, original_filename)
+            if error:
                 return None, None, error
             
-            # Get file size before upload
-            file.seek(0, os.SEEK_END)
-            file_size = file.tell()
-            file.seek(0)
-            
             # Determine resource type
             resource_type = self.get_resource_type(original_filename)
             
-            # Generate public ID
-            public_id = self.generate_public_id(original_filename, ticket_id)
-            
-            # Upload to Cloudinary
-            upload_options = {
-                'public_id': public_id,
-                'resource_type': resource_type,
-                'folder': '',  # Already included in public_id
-                'overwrite': True,
-                'unique_filename': False,
-                'use_filename': False
-            }
-            
-            # For raw files (documents), we need to include the extension
-            if resource_type == 'raw':
-                extension = original_filename.rsplit('.', 1)[-1].lower()
-                upload_options['format'] = extension
-            
-            result = cloudinary.uploader.upload(file, **upload_options)
+            if db is not None:
+                blob = self.acquire_blob(db, content_hash)
+                if blob is not None:
+                    print(f"✓ Duplicate content, reusing Cloudinary file: {blob.storage_path}")
+                    return blob.storage_path, file_size, None
             
-            # Return the secure URL as storage path
-            storage_path = result['secure_url']
+            storage_path, public_id = self.upload(
+                file, original_filename, ticket_id, resource_type,
+                content_hash=content_hash if db is not None else None
+            )
             
-            print(f"✓ File uploaded to Cloudinary: {storage_path}")
+            if db is not None:
+                storage_path = self.register_blob(
+                    db, content_hash, storage_path, public_id, resource_type, file_size
+                )
             
             return storage_path, file_size, None
             
@@ -138,40 +259,162 @@ class CloudinaryStorageService:
             print(f"✗ Error uploading to Cloudinary: {e}")
             return None, None, f"Error saving file: {str(e)}"
     
+    def upload(self, file, original_filename, ticket_id, resource_type, content_hash=None):
+        """
+        Upload file content to Cloudinary
+        Returns (secure URL, public_id as reported by Cloudinary)
+        With content_hash the file is stored as a shared blob (not under the ticket)
+        """
+        # Generate public ID
+        if content_hash:
+            public_id = self.generate_blob_public_id(content_hash)
+        else:
+            public_id = self.generate_public_id(original_filename, ticket_id)
+        
+        # Upload to Cloudinary
+        upload_options = {
+            'public_id': public_id,
+            'resource_type': resource_type,
+            'folder': '',  # Already included in public_id
+            'overwrite': True,
+            'unique_filename': False,
+            'use_filename': False
+        }
+        
+        # For raw files (documents), we need to include the extension
+        if resource_type == 'raw':
+            extension = original_filename.rsplit('.', 1)[-1].lower()
+            upload_options['format'] = extension
+        
+        with metrics.outbound('cloudinary'):
+            result = self.uploader.upload(file, **upload_options)
+        
+        # Return the secure URL as storage path
+        storage_path = result['secure_url']
+        
+        print(f"✓ File uploaded to Cloudinary: {storage_path}")
+        
+        return storage_path, result['public_id']
+    
+    def acquire_blob(self, db, content_hash):
+        """Take a reference on an already stored blob. Returns the blob or None"""
+        blob = db.query(StorageBlob).filter_by(
+            content_hash=content_hash
+        ).with_for_update().first()
+        
+        if blob is not None:
+            blob.ref_count += 1
+        return blob
+    
+    def register_blob(self, db, content_hash, storage_path, public_id, resource_type, file_size):
+        """
+        Index a freshly uploaded blob with one reference
+        Returns the storage path to use, which differs from the given one if
+        another request registered the same content while we were uploading.
+        """
+        try:
+            with db.begin_nested():
+                db.add(StorageBlob(
+                    content_hash=content_hash,
+                    storage_path=storage_path,
+                    public_id=public_id,
+                    resource_type=resource_type,
+                    file_size=file_size,
+                    ref_count=1
+                ))
+            return storage_path
+        except IntegrityError:
+            blob = self.acquire_blob(db, content_hash)
+            if blob is None:
+                raise
+            # Our copy is redundant
+            self.schedule_deletion(db, storage_path, public_id)
+            return blob.storage_path
+    
+    def release_file(self, db, storage_path):
+        """
+        Drop one reference to a stored file
+        The file is only scheduled for deletion once no attachment uses it.
+        Files uploaded before deduplication (no blob row) are scheduled directly.
+        Returns: (scheduled, error)
+        """
+        blob = db.query(StorageBlob).filter_by(
+            storage_path=storage_path
+        ).with_for_update().first()
+        
+        public_id = None
+        if blob is not None:
+            if blob.ref_count > 1:
+                blob.ref_count -= 1
+                return False, None
+            public_id = blob.public_id
+            db.delete(blob)
+        
+        return self.schedule_deletion(db, storage_path, public_id)
+    
+    def schedule_deletion(self, db, storage_path, public_id=None):
+        """
+        Queue a Cloudinary file for background deletion
+        public_id, when known, is the one Cloudinary returned on upload;
+        otherwise it is derived from the URL.
+        The row is added to the caller's transaction, so it only takes effect on commit.
+        Returns: (scheduled, error)
+        """
+        parsed_id, resource_type = self.parse_storage_path(storage_path)
+        public_id = public_id or parsed_id
+        if not public_id:
+            return False, "Invalid Cloudinary URL"
+        
+        db.add(StorageDeletion(public_id=public_id, resource_type=resource_type))
+        return True, None
+    
+    def parse_storage_path(self, storage_path):
+        """
+        Extract (public_id, resource_type) from a Cloudinary URL
+        URL format: https://res.cloudinary.com/cloud_name/resource_type/upload/v123/public_id.ext
+        For raw files the extension is part of the public_id and is kept.
+        Returns (None, None) for non-Cloudinary paths
+        """
+        if not storage_path or 'cloudinary.com' not in storage_path:
+            return None, None
+        
+        parts = storage_path.split('/upload/')
+        if len(parts) < 2:
+            return None, None
+        
+        path_part = parts[1]
+        # Remove version (v123456789/)
+        if path_part.startswith('v'):
+            path_part = '/'.join(path_part.split('/')[1:])
+        
+        # Determine resource type from URL
+        if '/image/' in storage_path:
+            resource_type = 'image'
+        elif '/video/' in storage_path:
+            resource_type = 'video'
+        else:
+            resource_type = 'raw'
+        
+        # Images and videos: the extension is only the delivery format
+        public_id = path_part if resource_type == 'raw' else path_part.rsplit('.', 1)[0]
+        
+        return public_id, resource_type
+    
     def delete_file(self, storage_path):
         """Delete file from Cloudinary"""
         try:
-            # Extract public_id from URL
-            # URL format: https://res.cloudinary.com/cloud_name/resource_type/upload/v123/public_id.ext
-            if 'cloudinary.com' in storage_path:
-                # Parse the URL to get public_id
-                parts = storage_path.split('/upload/')
-                if len(parts) > 1:
-                    # Remove version and extension
-                    path_part = parts[1]
-                    # Remove version (v123456789/)
-                    if path_part.startswith('v'):
-                        path_part = '/'.join(path_part.split('/')[1:])
-                    # Remove extension
-                    public_id = path_part.rsplit('.', 1)[0]
-                    
-                    # Determine resource type from URL
-                    if '/image/' in storage_path:
-                        resource_type = 'image'
-                    elif '/video/' in storage_path:
-                        resource_type = 'video'
-                    else:
-                        resource_type = 'raw'
-                    
-                    result = cloudinary.uploader.destroy(public_id, resource_type=resource_type)
-                    
-                    if result.get('result') == 'ok':
-                        print(f"✓ File deleted from Cloudinary: {public_id}")
-                        return True, None
-                    else:
-                        return False, f"Cloudinary delete failed: {result}"
+            public_id, resource_type = self.parse_storage_path(storage_path)
+            if not public_id:
+                return False, "Invalid Cloudinary URL"
             
-            return False, "Invalid Cloudinary URL"
+            with metrics.outbound('cloudinary'):
+                result = self.uploader.destroy(public_id, resource_type=resource_type)
+            
+            if result.get('result') == 'ok':
+                print(f"✓ File deleted from Cloudinary: {public_id}")
+                return True, None
+            else:
+                return False, f"Cloudinary delete failed: {result}"
             
         except Exception as e:
             print(f"✗ Error deleting from Cloudinary: {e}")
@@ -193,31 +436,16 @@ class CloudinaryStorageService:
     
     def get_mime_type(self, filename):
         """Determine MIME type from filename"""
-        extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
-        
-        mime_types = {
-            # Images
-            'png': 'image/png',
-            'jpg': 'image/jpeg',
-            'jpeg': 'image/jpeg',
-            'gif': 'image/gif',
-            'webp': 'image/webp',
-            'heic': 'image/heic',
-            # Videos
-            'mp4': 'video/mp4',
-            'mov': 'video/quicktime',
-            'avi': 'video/x-msvideo',
-            'webm': 'video/webm',
-            'mkv': 'video/x-matroska',
-            # Documents
-            'pdf': 'application/pdf',
-            'doc': 'application/msword',
-            'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            'txt': 'text/plain'
-        }
-        
-        return mime_types.get(extension, 'application/octet-stream')
+        kind = self.get_file_kind(filename)
+        return kind.mime_type if kind else 'application/octet-stream'
+    
+    def get_file_type(self, filename):
+        """Determine the attachment FileType from filename"""
+        kind = self.get_file_kind(filename)
+        if kind:
+            return kind.file_type
+        return Attachment.determine_file_type('application/octet-stream')
 
 
 # Singleton instance
-cloudinary_storage = CloudinaryStorageService()
+cloudinary_storage = lazy_service('cloudinary_storage', CloudinaryStorageService)
@@ -0,0 +1,80 @@
+"""
+Compresión de respuestas (gzip / brotli)
+Green House Project - Sistema de Soporte
+
+Las respuestas JSON y de texto de más de COMPRESS_MIN_BYTES se comprimen
+según Accept-Encoding: brotli si el cliente lo acepta y el módulo brotli
+está instalado, si no gzip. Siempre se agrega Vary: Accept-Encoding para
+que ningún caché intermedio sirva una variante a quien no la pidió.
+Los ETags son débiles (services/http_cache.py), así que siguen valiendo
+para ambas variantes.
+
+Variables:
+  COMPRESS_MIN_BYTES   tamaño mínimo a comprimir (1024)
+  COMPRESS_GZIP_LEVEL  1-9 (6)
+  COMPRESS_BR_QUALITY  0-11 (4: casi la tasa de gzip -9 a una fracción del costo)
+"""
+
+import os
+import gzip
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli es opcional
+    brotli = None
+
+COMPRESSIBLE = ('application/json', 'text/html', 'text/plain', 'text/csv', 'text/css', 'application/javascript')
+
+
+class Compressor:
+    """after_request que comprime con la codificación negociada"""
+
+    def __init__(self):
+        self.min_bytes = int(os.getenv('COMPRESS_MIN_BYTES', '1024'))
+        self.gzip_level = int(os.getenv('COMPRESS_GZIP_LEVEL', '6'))
+        self.br_quality = int(os.getenv('COMPRESS_BR_QUALITY', '4'))
+
+    def init_app(self, app):
+        app.after_request(self._after_request)
+
+    def encodings(self):
+        return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def negotiate(self, accept_encodings):
+        """Codificación preferida por el cliente entre las disponibles (None: sin comprimir)"""
+        best, best_quality = None, 0
+        for encoding in self.encodings():
+            quality = accept_encodings[encoding]
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.br_quality)
+        # mtime=0: mismo cuerpo -> mismos bytes
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def _after_request(self, response):
+        if response.mimetype not in COMPRESSIBLE:
+            return response
+        response.vary.add('Accept-Encoding')
+        if (response.status_code < 200 or response.status_code in (204, 206, 304)
+                or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers):
+            return response
+
+        encoding = self.negotiate(request.accept_encodings)
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_bytes:
+            return response
+
+        response.set_data(self.compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+compressor = Compressor()
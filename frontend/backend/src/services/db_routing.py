@@ -0,0 +1,134 @@
+"""
+Lecturas a la réplica (DATABASE_READ_URL)
+Green House Project - Sistema de Soporte
+
+Con DATABASE_READ_URL configurada, los requests GET/HEAD usan una sesión
+que manda los SELECT al engine de la réplica. Todo lo demás va al primario:
+
+- escrituras (flush, INSERT/UPDATE/DELETE, SELECT ... FOR UPDATE) y toda
+  lectura posterior a una escritura dentro del mismo request;
+- rutas marcadas con @use_primary (GET que escriben o que no toleran lag);
+- read-your-writes: durante REPLICA_STICKY_SECONDS después de que un
+  usuario escribió, sus lecturas van al primario.
+
+La marca de "escribió hace poco" es un archivo por usuario en REPLICA_STICKY_DIR
+(mtime = momento de la escritura): la comparten todos los workers del host
+sin consultas extra. Con varias instancias detrás de un balanceador sin
+afinidad, el directorio debe ser compartido.
+
+Sin DATABASE_READ_URL no cambia nada: todo va al primario.
+"""
+
+import os
+import time
+import hashlib
+import tempfile
+from flask import current_app, g, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+def use_primary(f):
+    """La ruta lee siempre del primario aunque sea GET"""
+    # functools.wraps de los decoradores externos copia el atributo
+    f.use_primary = True
+    return f
+
+
+class RoutingSession(Session):
+    """Session que elige engine por sentencia (ver get_bind de SQLAlchemy)"""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get('replica')
+        if (replica is None or self._flushing or self.info.get('wrote')
+                or isinstance(clause, UpdateBase)
+                or getattr(clause, '_for_update_arg', None) is not None):
+            return super().get_bind(mapper, clause=clause, **kw)
+        return replica
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_written(session, flush_context):
+    # Lo que se lea después de escribir debe ver la escritura
+    session.info['wrote'] = True
+
+
+class StickyWrites:
+    """Usuarios que escribieron hace menos de `window` segundos (archivos por usuario)"""
+
+    def __init__(self, directory, window):
+        self.directory = directory
+        self.window = window
+
+    def _path(self, user_id):
+        return os.path.join(self.directory, hashlib.sha1(str(user_id).encode('utf-8')).hexdigest()[:20])
+
+    def mark(self, user_id):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(user_id)
+            with open(path, 'a'):
+                pass
+            os.utime(path)
+        except OSError as e:
+            print(f"[DB] ✗ No se pudo marcar escritura reciente: {e}")
+
+    def is_sticky(self, user_id):
+        try:
+            return time.time() - os.stat(self._path(user_id)).st_mtime < self.window
+        except OSError:
+            return False
+
+
+class ReadRouter:
+    """Decide por request si la sesión puede leer de la réplica"""
+
+    def __init__(self):
+        self.read_engine = None
+        self.sticky = StickyWrites(
+            os.getenv('REPLICA_STICKY_DIR', os.path.join(tempfile.gettempdir(), 'ghp_sticky')),
+            float(os.getenv('REPLICA_STICKY_SECONDS', '10'))
+        )
+
+    def configure(self, read_engine):
+        self.read_engine = read_engine
+
+    def init_app(self, app):
+        if self.read_engine is not None:
+            app.after_request(self._after_request)
+
+    def route(self, session):
+        """Llamar en before_request con la sesión del request"""
+        if self.read_engine is None or request.method not in READ_METHODS:
+            return
+        view = current_app.view_functions.get(request.endpoint)
+        if getattr(view, 'use_primary', False):
+            return
+        user_id = self._user_id()
+        if user_id is not None and self.sticky.is_sticky(user_id):
+            return
+        session.info['replica'] = self.read_engine
+
+    def _after_request(self, response):
+        db = g.get('db')
+        if db is not None and db.info.get('wrote') and response.status_code < 400:
+            user_id = self._user_id()
+            if user_id is not None:
+                self.sticky.mark(user_id)
+        return response
+
+    @staticmethod
+    def _user_id():
+        """Identidad del JWT si hay uno válido (las rutas lo validan de nuevo con jwt_required)"""
+        try:
+            verify_jwt_in_request(optional=True)
+            return get_jwt_identity()
+        except Exception:
+            return None
+
+
+db_router = ReadRouter()
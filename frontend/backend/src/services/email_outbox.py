@@ -0,0 +1,384 @@
+"""
+Cola de salida de emails con límite de tasa y reintentos
+Green House Project - Sistema de Soporte
+
+Los envíos se encolan y un hilo por proceso los despacha respetando un
+token bucket compartido por todos los workers de gunicorn (archivo con
+flock). Los errores transitorios se reintentan con backoff exponencial y
+jitter; un 429 pausa el bucket de todos los workers durante Retry-After.
+Lo que no se puede enviar termina en la tabla email_dead_letters, desde
+donde se puede reenviar (admin_tools o scripts/replay_email_dead_letters.py).
+
+La cola vive en memoria: los mensajes pendientes de un worker que se
+reinicia se pierden, igual que antes con los hilos de notificación.
+"""
+
+import os
+import json
+import time
+import fcntl
+import heapq
+import random
+import struct
+import itertools
+import tempfile
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+from sqlalchemy import Column, Integer, String, Text, DateTime
+
+from models import Base
+
+
+class EmailDeadLetter(Base):
+    """Email que agotó sus reintentos o que SendGrid rechazó de forma permanente"""
+    __tablename__ = 'email_dead_letters'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    label = Column(String(255), nullable=False)    # Destinatario(s), para el panel
+    subject = Column(String(500))
+    payload = Column(Text, nullable=False)          # JSON de /v3/mail/send
+    attempts = Column(Integer, nullable=False)
+    last_status = Column(Integer)                  # NULL = error de red / timeout
+    last_error = Column(Text)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    replayed_at = Column(DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'label': self.label,
+            'subject': self.subject,
+            'attempts': self.attempts,
+            'last_status': self.last_status,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'replayed_at': self.replayed_at.isoformat() if self.replayed_at else None
+        }
+
+
+class TokenBucket:
+    """
+    Token bucket compartido entre procesos
+    El estado (tokens, última recarga, pausa hasta) vive en un archivo y se
+    actualiza bajo flock, así todos los workers del mismo host comparten cupo.
+    """
+
+    _STATE = struct.Struct('ddd')
+
+    def __init__(self, rate, burst, path):
+        self.rate = rate
+        self.burst = burst
+        self.path = path
+
+    def acquire(self):
+        """
+        Toma un token
+        Returns: 0 si se obtuvo, o los segundos a esperar antes de reintentar
+        """
+        def take(tokens, updated, paused_until, now):
+            if now < paused_until:
+                return (tokens, updated, paused_until), paused_until - now
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                return (tokens - 1, now, paused_until), 0.0
+            return (tokens, now, paused_until), (1 - tokens) / self.rate
+
+        return self._update(take)
+
+    def pause(self, seconds):
+        """Detiene los envíos de todos los workers (429 con Retry-After)"""
+        def extend(tokens, updated, paused_until, now):
+            return (0.0, now, max(paused_until, now + seconds)), None
+
+        self._update(extend)
+
+    def _update(self, fn):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            now = time.time()
+            raw = os.pread(fd, self._STATE.size, 0)
+            if len(raw) == self._STATE.size:
+                state = self._STATE.unpack(raw)
+            else:
+                state = (float(self.burst), now, 0.0)
+            state, result = fn(*state, now)
+            os.pwrite(fd, self._STATE.pack(*state), 0)
+            return result
+        finally:
+            os.close(fd)  # Libera también el flock
+
+
+class _Message:
+    __slots__ = ('payload', 'label', 'attempts', 'last_status', 'last_error')
+
+    def __init__(self, payload, label):
+        self.payload = payload
+        self.label = label
+        self.attempts = 0
+        self.last_status = None
+        self.last_error = None
+
+
+class EmailOutbox:
+    """Despacha los emails encolados respetando el límite de SendGrid"""
+
+    MAX_ATTEMPTS = 6
+    BASE_BACKOFF = 2.0     # segundos
+    MAX_BACKOFF = 300.0
+    RETRYABLE_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.bucket = TokenBucket(
+            rate=float(os.getenv('EMAIL_RATE_PER_SECOND', '10')),
+            burst=float(os.getenv('EMAIL_RATE_BURST', '20')),
+            path=os.getenv('EMAIL_RATE_STATE_FILE', os.path.join(tempfile.gettempdir(), 'ghp_email_bucket'))
+        )
+        self.session_factory = None
+        self.stats = Counter()
+        self._heap = []
+        self._seq = itertools.count()
+        self._finished = deque()
+        self._in_flight = 0
+        # Mensajes aún no enviados ni en dead letters (cola, en vuelo o por reintentar)
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+
+    def configure(self, session_factory):
+        """Fábrica de sesiones para la tabla de dead letters"""
+        self.session_factory = session_factory
+
+    def enqueue(self, payload, label):
+        """Agrega un envío (payload JSON de /v3/mail/send) a la cola"""
+        self._start()
+        with self._cond:
+            self._pending += 1
+            self._push(_Message(payload, label), 0)
+            self.stats['queued'] += 1
+        return True
+
+    def _start(self):
+        """Arranca el despachador una vez por proceso (idempotente)"""
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            # Tras un fork no hay hilo: la cola heredada no es de este proceso
+            self._heap = []
+            self._finished.clear()
+            self._in_flight = 0
+            self._pending = 0
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+            self._thread.start()
+
+    def _push(self, message, delay):
+        heapq.heappush(self._heap, (time.time() + delay, next(self._seq), message))
+        self._cond.notify_all()  # Despachador y drain() esperan en la misma condición
+
+    def _run(self):
+        while True:
+            with self._cond:
+                finished = list(self._finished)
+                self._finished.clear()
+                message = None
+                if self._heap and self._heap[0][0] <= time.time():
+                    message = heapq.heappop(self._heap)[2]
+                if not finished and message is None:
+                    timeout = self._heap[0][0] - time.time() if self._heap else None
+                    self._cond.wait(timeout)
+                    continue
+
+            for done_message, future in finished:
+                try:
+                    self._handle(done_message, future)
+                except Exception as e:
+                    print(f"[EMAIL] Error en la cola de salida: {e}")
+
+            if message is not None:
+                try:
+                    self._dispatch(message)
+                except Exception as e:
+                    print(f"[EMAIL] Error al despachar a {message.label}: {e}")
+                    with self._cond:
+                        self._push(message, self._backoff(message.attempts + 1))
+
+    def _dispatch(self, message):
+        wait = self.bucket.acquire()
+        if wait:
+            with self._cond:
+                self._push(message, wait)
+            return
+
+        future = self.transport.submit(message.payload)
+        with self._cond:
+            self._in_flight += 1
+        future.add_done_callback(lambda f: self._finish(message, f))
+
+    def _finish(self, message, future):
+        # Corre en el hilo del event loop: solo anotar y despertar al despachador
+        with self._cond:
+            self._finished.append((message, future))
+            self._cond.notify_all()
+
+    def _handle(self, message, future):
+        with self._cond:
+            self._in_flight -= 1
+
+        retry_after = None
+        try:
+            response = future.result()
+            status, error = response.status_code, response.body[:1000]
+            retry_after = response.headers.get('Retry-After')
+        except Exception as e:
+            status, error = None, str(e) or type(e).__name__
+
+        if status in (200, 201, 202):
+            self.stats['sent'] += 1
+            print(f"[EMAIL] Enviado exitosamente a {message.label} (Status: {status})")
+            self._settle()
+            return
+
+        message.attempts += 1
+        message.last_status = status
+        message.last_error = error
+
+        if status is not None and status not in self.RETRYABLE_STATUSES:
+            print(f"[EMAIL] Rechazado por SendGrid ({status}) para {message.label}: {error}")
+            self._dead_letter(message)
+            self._settle()
+        elif message.attempts >= self.MAX_ATTEMPTS:
+            print(f"[EMAIL] Sin más reintentos para {message.label}: {status or error}")
+            self._dead_letter(message)
+            self._settle()
+        else:
+            delay = self._backoff(message.attempts)
+            if status == 429:
+                delay = max(delay, self._parse_retry_after(retry_after))
+                self.bucket.pause(delay)
+                self.stats['throttled'] += 1
+            self.stats['retried'] += 1
+            print(f"[EMAIL] Reintento {message.attempts} para {message.label} en {delay:.1f}s ({status or error})")
+            with self._cond:
+                self._push(message, delay)
+
+    def _settle(self):
+        """El mensaje llegó a su estado final (enviado o dead letter)"""
+        with self._cond:
+            self._pending -= 1
+            self._cond.notify_all()
+
+    def _backoff(self, attempts):
+        """Exponencial con jitter: la mitad fija, la otra mitad aleatoria"""
+        delay = min(self.MAX_BACKOFF, self.BASE_BACKOFF * 2 ** (attempts - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _parse_retry_after(self, value):
+        """Retry-After en segundos o como HTTP-date"""
+        if not value:
+            return 0.0
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                return 0.0
+
+    def _dead_letter(self, message):
+        self.stats['dead_lettered'] += 1
+        if self.session_factory is None:
+            print(f"[EMAIL] ✗ Sin base de datos para guardar el dead letter de {message.label}")
+            return
+        session = self.session_factory()
+        try:
+            session.add(EmailDeadLetter(
+                label=message.label[:255],
+                subject=self._subject(message.payload),
+                payload=json.dumps(message.payload),
+                attempts=message.attempts,
+                last_status=message.last_status,
+                last_error=message.last_error
+            ))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"[EMAIL] ✗ No se pudo guardar el dead letter de {message.label}: {e}")
+        finally:
+            session.close()
+
+    @staticmethod
+    def _subject(payload):
+        subject = payload.get('subject')
+        if not subject:
+            personalizations = payload.get('personalizations') or [{}]
+            subject = personalizations[0].get('subject')
+        return (subject or '')[:500]
+
+    def replay(self, ids=None, limit=100):
+        """
+        Vuelve a encolar dead letters no reenviados
+        Returns: número de emails reencolados
+        """
+        session = self.session_factory()
+        try:
+            query = session.query(EmailDeadLetter).filter(EmailDeadLetter.replayed_at.is_(None))
+            if ids:
+                query = query.filter(EmailDeadLetter.id.in_(ids))
+            rows = query.order_by(EmailDeadLetter.id).limit(limit).with_for_update(skip_locked=True).all()
+
+            messages = [(json.loads(row.payload), row.label) for row in rows]
+            now = datetime.utcnow()
+            for row in rows:
+                row.replayed_at = now
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+        for payload, label in messages:
+            self.enqueue(payload, label)
+        return len(messages)
+
+    def drain(self, timeout=60):
+        """
+        Espera a que todos los mensajes encolados terminen (enviados o en
+        dead letters): scripts que salen tras encolar
+        Returns: False si venció el timeout con mensajes pendientes
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            while self._pending:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def get_status(self):
+        """Resumen para el panel de administración"""
+        with self._cond:
+            status = {
+                'queued': len(self._heap),
+                'in_flight': self._in_flight,
+                'pending': self._pending,
+                'stats': dict(self.stats)
+            }
+        if self.session_factory is not None:
+            session = self.session_factory()
+            try:
+                status['dead_letters'] = session.query(EmailDeadLetter).filter(
+                    EmailDeadLetter.replayed_at.is_(None)
+                ).count()
+            finally:
+                session.close()
+        return status
@@ -0,0 +1,102 @@
+"""
+Motor de plantillas de email
+Green House Project - Sistema de Soporte
+
+Las plantillas viven en src/templates/emails (HTML + texto plano por cada
+notificación, con layout y parciales compartidos) y se compilan una sola
+vez al crear el motor. El HTML se auto-escapa.
+"""
+
+import os
+from typing import Dict, Iterable, Tuple
+from markupsafe import escape
+
+from services.registry import lazy_service
+
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates', 'emails')
+
+
+class EmailTemplateEngine:
+    # Una entrada por tipo de notificación: <nombre>.html y <nombre>.txt
+    TEMPLATES = (
+        'ticket_created',
+        'assignment',
+        'status_change',
+        'password_reset',
+        'rating_request',
+        'comment',
+        'digest',
+    )
+
+    def __init__(self, template_dir: str = TEMPLATE_DIR):
+        from jinja2 import Environment, FileSystemLoader, StrictUndefined, select_autoescape
+        self.env = Environment(
+            loader=FileSystemLoader(template_dir),
+            autoescape=select_autoescape(enabled_extensions=('html',), default_for_string=False),
+            undefined=StrictUndefined,
+            trim_blocks=True,
+            keep_trailing_newline=True,
+            lstrip_blocks=True,
+            auto_reload=False,   # Compiladas una vez; no se vuelve a mirar el disco
+            cache_size=-1
+        )
+        self.env.globals.update(
+            frontend_url=os.getenv('FRONTEND_URL', 'https://soporte-frontend-ghp.vercel.app'),
+            backend_url=os.getenv('BACKEND_URL', 'https://soporte-backend-ghp.up.railway.app')
+        )
+        self._compiled = {}
+        self.compile_all()
+
+    def compile_all(self) -> None:
+        """Compila todas las plantillas; un error de sintaxis falla al arrancar"""
+        for name in self.TEMPLATES:
+            self._compiled[name] = (
+                self.env.get_template(f'{name}.html'),
+                self.env.get_template(f'{name}.txt')
+            )
+
+    def render(self, name: str, **context) -> Tuple[str, str]:
+        """Devuelve (html, texto plano) de una notificación"""
+        html_template, text_template = self._compiled[name]
+        return html_template.render(**context), text_template.render(**context)
+
+    def render_personalized(self, name: str, shared_context: dict, fields: Iterable[str]) -> Tuple[str, str]:
+        """
+        Renderiza una sola vez para muchos destinatarios
+        Los campos personales quedan como tokens (ver substitution_tokens) que
+        SendGrid reemplaza por destinatario. No deben pasar por filtros que
+        transformen el valor (upper, lower...), porque transformarían el token.
+        """
+        html_template, text_template = self._compiled[name]
+        html_tokens = {field: self.html_token(field) for field in fields}
+        text_tokens = {field: self.text_token(field) for field in html_tokens}
+        return (
+            html_template.render(**shared_context, **html_tokens),
+            text_template.render(**shared_context, **text_tokens)
+        )
+
+    def substitution_tokens(self, context: dict, fields: Iterable[str]) -> Dict[str, str]:
+        """Valores de los tokens de un destinatario (escapados en la parte HTML)"""
+        substitutions = {}
+        for field in fields:
+            value = str(context[field])
+            substitutions[self.html_token(field)] = str(escape(value))
+            substitutions[self.text_token(field)] = value
+        return substitutions
+
+    @staticmethod
+    def html_token(field: str) -> str:
+        return f'-{field}-'
+
+    @staticmethod
+    def text_token(field: str) -> str:
+        return f'-{field}.text-'
+
+    def render_all(self, contexts: Dict[str, dict]) -> Dict[str, Tuple[str, str]]:
+        """Renderiza varias notificaciones (benchmarks y snapshots)"""
+        return {name: self.render(name, **context) for name, context in contexts.items()}
+
+
+# Instancia global del motor (se compila en el primer uso)
+email_templates = lazy_service('email_templates', EmailTemplateEngine)
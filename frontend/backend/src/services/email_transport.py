@@ -0,0 +1,32 @@
+"""
+Transporte HTTP asíncrono para SendGrid
+Green House Project - Sistema de Soporte
+
+AsyncHTTPTransport (services/http_transport.py) configurado para
+/v3/mail/send: payload JSON, API key como Bearer y límites propios
+(EMAIL_MAX_CONCURRENCY, EMAIL_TIMEOUT_SECONDS).
+"""
+
+import os
+from typing import Optional
+
+from services.http_transport import AsyncHTTPTransport
+
+
+SENDGRID_API_URL = 'https://api.sendgrid.com/v3/mail/send'
+
+
+class AsyncEmailTransport(AsyncHTTPTransport):
+    """POST de payloads JSON a SendGrid desde un event loop dedicado"""
+
+    def __init__(self, api_key: str, api_url: Optional[str] = None,
+                 max_concurrency: Optional[int] = None, timeout: Optional[float] = None):
+        super().__init__(
+            api_url or os.getenv('SENDGRID_API_URL', SENDGRID_API_URL),
+            headers={'Authorization': f'Bearer {api_key}'},
+            max_concurrency=max_concurrency or int(os.getenv('EMAIL_MAX_CONCURRENCY', '8')),
+            timeout=timeout or float(os.getenv('EMAIL_TIMEOUT_SECONDS', '10')),
+            name='email-transport'
+        )
+        self.api_key = api_key
+
@@ -0,0 +1,348 @@
+"""
+Proveedores externos simulados para benchmarks y pruebas locales
+Green House Project - Sistema de Soporte
+
+Con PROVIDER_MODE=fake el backend no habla con ningún proveedor real:
+
+- SendGrid, Twilio (WhatsApp) y Cloudinary van por HTTP a un servidor
+  local (scripts/fake_providers.py, en FAKE_PROVIDERS_URL) que responde
+  como sus APIs; así se ejercitan los transportes, las colas y el SDK reales.
+- OpenSolar se reemplaza dentro del proceso, porque su cliente vive en
+  OpenSolarService.
+
+Todos tienen latencia, tasa de errores y límite de requests por segundo
+configurables (429 con Retry-After, como los reales).
+"""
+
+import os
+import re
+import json
+import time
+import random
+import threading
+from collections import Counter
+from datetime import datetime
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+def is_fake_mode():
+    return os.getenv('PROVIDER_MODE', 'live').lower() == 'fake'
+
+
+def fake_providers_url():
+    return os.getenv('FAKE_PROVIDERS_URL', 'http://127.0.0.1:8025')
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # El default (5) resetea conexiones bajo carga
+
+
+class _RateWindow:
+    """Ventana fija de un segundo compartida por los hilos de un proceso"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._window = (0, 0)  # (segundo, requests en ese segundo)
+        self._lock = threading.Lock()
+
+    def exceeded(self):
+        if not self.limit:
+            return False
+        with self._lock:
+            second = int(time.time())
+            current, used = self._window
+            used = used + 1 if current == second else 1
+            self._window = (second, used)
+            return used > self.limit
+
+
+class FakeProviderServer:
+    """Stand-in HTTP de proveedores; cada ruta es (método, regex de path) -> handler"""
+
+    COUNTS_PATH = '/__counts'
+
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=50, error_rate=0.0, rate_limit=None):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.rate = _RateWindow(rate_limit)  # requests por segundo; None = sin límite
+        self.routes = []
+        self.counts = Counter()
+        self._counts_lock = threading.Lock()
+        self._server = _Server((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def route(self, method, pattern, handler):
+        """handler(params: dict, match) -> (status, headers, body dict o None)"""
+        self.routes.append((method, re.compile(pattern + '$'), handler))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-provider', daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def serve_forever(self):
+        """Bloquea sirviendo (para correr el simulado en su propio proceso)"""
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self, key):
+        with self._counts_lock:
+            self.counts[key] += 1
+
+    def _snapshot(self):
+        with self._counts_lock:
+            return dict(self.counts)
+
+    def _resolve(self, method, path):
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(path) if route_method == method else None
+            if match:
+                return handler, match
+        return None, None
+
+    def _respond(self, method, path, params):
+        """(status, headers, body) con latencia, límite y errores inyectados"""
+        handler, match = self._resolve(method, path)
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        if handler is None:
+            return 404, {}, {'errors': [{'message': 'not found'}]}
+        if self.rate.exceeded():
+            return 429, {'Retry-After': '1'}, {'errors': [{'message': 'too many requests'}]}
+        if self.error_rate and random.random() < self.error_rate:
+            return 500, {}, {'errors': [{'message': 'injected error'}]}
+        return handler(params, match)
+
+    def _handler_class(self):
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive
+
+            def _params(self, query):
+                """Query string + cuerpo JSON, form o multipart en un solo dict"""
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                params = {
+                    key[:-2] if key.endswith('[]') else key: values if key.endswith('[]') else values[0]
+                    for key, values in parse_qs(query).items()
+                }
+                content_type = self.headers.get('Content-Type', '')
+                if not raw:
+                    return params
+                if content_type.startswith('application/json'):
+                    params.update(json.loads(raw))
+                elif content_type.startswith('multipart/form-data'):
+                    message = BytesParser(policy=policy.default).parsebytes(
+                        f'Content-Type: {content_type}\r\n\r\n'.encode('latin-1') + raw
+                    )
+                    for part in message.iter_parts():
+                        name = part.get_param('name', header='content-disposition')
+                        if name and not part.get_filename():
+                            params[name] = part.get_payload(decode=True).decode('utf-8')
+                else:
+                    params.update({key: values[0] for key, values in parse_qs(raw.decode('utf-8')).items()})
+                return params
+
+            def _dispatch(self, method):
+                path, _, query = self.path.partition('?')
+                try:
+                    params = self._params(query)
+                    if path == provider.COUNTS_PATH:
+                        status, headers, body = 200, {}, provider._snapshot()
+                    else:
+                        status, headers, body = provider._respond(method, path, params)
+                        provider._count(f'{method} {counter_label(path)} {status}')
+                except ValueError:
+                    status, headers, body = 400, {}, {'errors': [{'message': 'invalid body'}]}
+
+                data = json.dumps(body).encode('utf-8') if body is not None else b''
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._dispatch('GET')
+
+            def do_POST(self):
+                self._dispatch('POST')
+
+            def do_DELETE(self):
+                self._dispatch('DELETE')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def counter_label(path):
+    """Agrupa los contadores por proveedor y operación, sin ids"""
+    if path.startswith('/v3/'):
+        return 'sendgrid' + path[len('/v3'):]
+    parts = path.strip('/').split('/')
+    if parts[0] == '2010-04-01' and len(parts) >= 4:
+        return 'twilio/' + '/'.join(parts[3:])
+    if parts[0] == 'v1_1' and len(parts) >= 4:
+        return 'cloudinary/' + '/'.join(parts[2:])
+    return path
+
+
+# --- SendGrid -----------------------------------------------------------------
+
+def sendgrid_mail_send(params, match=None):
+    """POST /v3/mail/send: 202 sin cuerpo, o 400 como SendGrid si falta algo"""
+    personalizations = params.get('personalizations') or []
+    if not personalizations or not params.get('from') or not params.get('content'):
+        return 400, {}, {'errors': [{'message': 'missing personalizations, from or content'}]}
+    if len(personalizations) > 1000:
+        return 400, {}, {'errors': [{'message': 'too many personalizations'}]}
+    return 202, {'X-Message-Id': f'fake-{random.getrandbits(48):012x}'}, None
+
+
+# --- Twilio ---------------------------------------------------------------------
+
+def twilio_messages(params, match):
+    """POST /2010-04-01/Accounts/<sid>/Messages.json: 201 con el mensaje en cola"""
+    if not params.get('To') or not params.get('From') or not params.get('Body'):
+        return 400, {}, {'code': 21604, 'message': 'A To, From and Body are required', 'status': 400}
+    if len(params['Body']) > 1600:
+        return 400, {}, {'code': 21617, 'message': 'The concatenated message body exceeds the 1600 character limit', 'status': 400}
+    return 201, {}, {
+        'sid': f'SM{random.getrandbits(128):032x}',
+        'account_sid': match.group('sid'),
+        'to': params['To'],
+        'from': params['From'],
+        'status': 'queued'
+    }
+
+
+# --- Cloudinary (rutas bajo upload_prefix) -----------------------------------
+
+def cloudinary_upload(params, match):
+    cloud, resource_type = match.group('cloud'), match.group('type')
+    public_id = params.get('public_id') or f'soporte-ghp/fake/{random.getrandbits(48):012x}'
+    fmt = params.get('format')
+    suffix = f'.{fmt}' if fmt and resource_type == 'raw' else ''
+    version = int(time.time())
+    return 200, {}, {
+        'public_id': public_id,
+        'version': version,
+        'resource_type': resource_type,
+        'type': 'upload',
+        'created_at': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'secure_url': f'https://res.cloudinary.com/{cloud}/{resource_type}/upload/v{version}/{public_id}{suffix}'
+    }
+
+
+def cloudinary_destroy(params, match):
+    return 200, {}, {'result': 'ok'}
+
+
+def cloudinary_delete_resources(params, match):
+    public_ids = params.get('public_ids') or []
+    if isinstance(public_ids, str):
+        public_ids = [public_ids]
+    return 200, {}, {'deleted': {public_id: 'deleted' for public_id in public_ids}, 'partial': False}
+
+
+def cloudinary_list_resources(params, match):
+    return 200, {}, {'resources': []}
+
+
+def fake_sendgrid(latency_ms=50, error_rate=0.0, rate_limit=None, port=0):
+    """Servidor que imita SendGrid; apuntar SENDGRID_API_URL a base_url + /v3/mail/send"""
+    server = FakeProviderServer(port=port, latency_ms=latency_ms, error_rate=error_rate, rate_limit=rate_limit)
+    server.route('POST', r'/v3/mail/send', sendgrid_mail_send)
+    return server
+
+
+def fake_server(latency_ms=50, error_rate=0.0, rate_limit=None, port=0):
+    """SendGrid + Twilio + Cloudinary en un solo servidor (el de FAKE_PROVIDERS_URL)"""
+    server = fake_sendgrid(latency_ms, error_rate, rate_limit, port)
+    server.route('POST', r'/2010-04-01/Accounts/(?P<sid>[^/]+)/Messages\.json', twilio_messages)
+    cloud = r'/v1_1/(?P<cloud>[^/]+)'
+    server.route('POST', cloud + r'/(?P<type>image|video|raw)/upload', cloudinary_upload)
+    server.route('POST', cloud + r'/(?P<type>image|video|raw)/destroy', cloudinary_destroy)
+    server.route('DELETE', cloud + r'/resources/(?P<type>image|video|raw)/upload', cloudinary_delete_resources)
+    server.route('GET', cloud + r'/resources/(?P<type>image|video|raw)/upload', cloudinary_list_resources)
+    return server
+
+
+# --- OpenSolar (dentro del proceso) -------------------------------------------
+
+class FakeProviderError(Exception):
+    pass
+
+
+class FakeProvider:
+    """Latencia, errores y límite de tasa de un proveedor simulado en el proceso"""
+
+    calls = Counter()  # Compartido por todos los simulados del proceso
+    _calls_lock = threading.Lock()
+
+    def __init__(self, name):
+        self.name = name
+        self.latency_ms = int(os.getenv('FAKE_PROVIDER_LATENCY_MS', '50'))
+        self.error_rate = float(os.getenv('FAKE_PROVIDER_ERROR_RATE', '0'))
+        self.rate = _RateWindow(int(os.getenv('FAKE_PROVIDER_RATE_LIMIT', '0')) or None)
+
+    def call(self, operation):
+        """Simula una llamada; lanza FakeProviderError como lo haría el cliente real"""
+        time.sleep(self.latency_ms / 1000)
+        if self.rate.exceeded():
+            status = 429
+        elif self.error_rate and random.random() < self.error_rate:
+            status = 500
+        else:
+            status = 200
+        with self._calls_lock:
+            self.calls[f'{self.name}/{operation} {status}'] += 1
+        if status != 200:
+            raise FakeProviderError(f'{self.name} {operation}: HTTP {status}')
+
+    @classmethod
+    def snapshot(cls):
+        with cls._calls_lock:
+            return dict(cls.calls)
+
+
+class FakeOpenSolarService:
+    """Misma interfaz que OpenSolarService; devuelve un proyecto determinista"""
+
+    def __init__(self):
+        self.opensolar = FakeProvider('opensolar')
+
+    def get_project_data(self, project_id):
+        self.opensolar.call('projects')
+        return {
+            'project_id': project_id,
+            'client_email': f'cliente-{project_id}@example.com'.lower(),
+            'client_name': f'Cliente {project_id}',
+            # Contacto sin teléfono: cadena vacía, no None
+            'client_phone': ''
+        }
+
+
+def opensolar_service():
+    """OpenSolarService real, o su simulado con PROVIDER_MODE=fake"""
+    if is_fake_mode():
+        return FakeOpenSolarService()
+    from services.opensolar_service import OpenSolarService
+    return OpenSolarService()
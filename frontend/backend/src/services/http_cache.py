@@ -0,0 +1,51 @@
+"""
+Utilidades de caché HTTP (ETag / Last-Modified / 304)
+Green House Project - Sistema de Soporte
+"""
+
+import hashlib
+from flask import request, make_response, redirect
+
+# Respuestas privadas que el navegador puede guardar pero debe revalidar siempre
+REVALIDATE = 'private, no-cache'
+
+
+def make_etag(*parts):
+    """ETag compacto a partir de los valores que determinan la respuesta"""
+    raw = '|'.join('' if part is None else str(part) for part in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:32]
+
+
+def is_not_modified(etag, last_modified=None):
+    """
+    Evalúa If-None-Match / If-Modified-Since del request actual
+    If-None-Match tiene prioridad, como indica RFC 9110.
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        # HTTP-date tiene resolución de segundos
+        return last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+    return False
+
+
+def set_validators(response, etag, last_modified=None, cache_control=REVALIDATE):
+    """Agrega ETag (débil), Last-Modified y Cache-Control a la respuesta"""
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def not_modified_response(etag, last_modified=None, cache_control=REVALIDATE):
+    """Respuesta 304 vacía con los mismos validadores"""
+    response = make_response('', 304)
+    return set_validators(response, etag, last_modified, cache_control)
+
+
+def cached_redirect(location, cache_control):
+    """302 que el navegador puede reutilizar sin volver a pasar por el backend"""
+    response = redirect(location)
+    response.headers['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,123 @@
+"""
+Transporte HTTP asíncrono con pool de conexiones
+Green House Project - Sistema de Soporte
+
+Una sesión aiohttp con pool de conexiones keep-alive vive en un event loop
+propio (un hilo por proceso). Un semáforo limita los requests simultáneos y
+cada llamada tiene timeout. send() es la fachada síncrona; submit() devuelve
+un Future para quien quiera no bloquear. Lo usan el transporte de email
+(SendGrid) y el despachador de WhatsApp (Twilio).
+"""
+
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import NamedTuple, Optional
+from services.metrics import metrics
+
+
+class TransportResponse(NamedTuple):
+    status_code: int
+    headers: dict
+    body: str
+
+
+class AsyncHTTPTransport:
+    """POST a una URL fija desde un event loop dedicado"""
+
+    def __init__(self, api_url: str, headers: Optional[dict] = None, max_concurrency: int = 8,
+                 timeout: float = 10.0, form: bool = False, name: str = 'http-transport'):
+        self.api_url = api_url
+        self.headers = headers or {}
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.form = form    # True: application/x-www-form-urlencoded; False: JSON
+        self.name = name
+        self._loop = None
+        self._client = None
+        self._semaphore = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        """Arranca el event loop una vez por proceso (los workers heredan el objeto tras el fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            failure = []
+
+            def run():
+                asyncio.set_event_loop(loop)
+                try:
+                    self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                    self._client = loop.run_until_complete(self._create_session())
+                except BaseException as e:
+                    failure.append(e)
+                    loop.close()
+                    return
+                finally:
+                    # Siempre: si no, quien espera abajo queda colgado con el lock tomado
+                    ready.set()
+                loop.run_forever()
+
+            threading.Thread(target=run, name=self.name, daemon=True).start()
+            ready.wait()
+            if failure:
+                # _pid queda sin asignar: el próximo submit() vuelve a intentar
+                raise failure[0]
+            self._loop = loop
+            self._pid = os.getpid()
+
+    async def _create_session(self):
+        # La sesión debe crearse dentro del loop que la usa; aiohttp se carga
+        # con el primer envío y no al importar
+        import aiohttp
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers=self.headers
+        )
+
+    async def _post(self, payload: dict) -> TransportResponse:
+        body = {'data': payload} if self.form else {'json': payload}
+        async with self._semaphore:
+            start = time.perf_counter()
+            outcome = 'error'
+            try:
+                async with self._client.post(self.api_url, **body) as response:
+                    text = await response.text()
+                    outcome = f'{response.status // 100}xx'
+                    return TransportResponse(response.status, dict(response.headers), text)
+            finally:
+                metrics.observe_outbound(self.name, outcome, time.perf_counter() - start)
+
+    def submit(self, payload: dict) -> Future:
+        """Encola el request en el event loop; no bloquea"""
+        self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(self._post(payload), self._loop)
+
+    def send(self, payload: dict) -> TransportResponse:
+        """
+        Fachada síncrona: espera la respuesta
+        El timeout cubre también la espera por un cupo del semáforo.
+        """
+        future = self.submit(payload)
+        try:
+            return future.result(timeout=self.timeout * 3)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def close(self):
+        """Cierra el pool y detiene el loop (scripts y benchmarks)"""
+        if self._pid != os.getpid():
+            return
+        asyncio.run_coroutine_threadsafe(self._client.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._pid = None
@@ -0,0 +1,70 @@
+"""
+Proveedor JSON de Flask con orjson
+Green House Project - Sistema de Soporte
+
+jsonify() y request.get_json() pasan por app.json. Con orjson instalado
+serializa varias veces más rápido que el json de la stdlib; la salida es
+equivalente a la de DefaultJSONProvider:
+
+- claves ordenadas (sort_keys de Flask) e indentación en modo debug;
+- date/datetime como http_date, Decimal/UUID como str, dataclasses e
+  __html__ igual que Flask (OPT_PASSTHROUGH_DATETIME + _default de Flask);
+- Enum por su .value (to_dict ya los convierte; stdlib fallaría);
+- claves no string (p. ej. ratings_breakdown {1: 0, ...}) como en json.dumps.
+
+Diferencia: los caracteres no ASCII salen en UTF-8 y no como \\uXXXX (JSON
+equivalente y más corto). Si orjson no puede con un valor (enteros de más
+de 64 bits...) se usa el proveedor por defecto. JSON_PROVIDER=default lo
+desactiva.
+"""
+
+import os
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """DefaultJSONProvider con dumps/loads de orjson"""
+
+    OPTIONS = (
+        orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if orjson else 0
+    )
+
+    def _options(self, indent=False):
+        options = self.OPTIONS if self.sort_keys else self.OPTIONS & ~orjson.OPT_SORT_KEYS
+        return options | orjson.OPT_INDENT_2 if indent else options
+
+    def dumps_bytes(self, obj, indent=False):
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options(indent))
+        except TypeError:
+            layout = {'indent': 2} if indent else {'separators': (',', ':')}
+            return super().dumps(obj, **layout).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Opciones propias de json.dumps (cls, separators...): stdlib
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self._app.debug if self.compact is None else not self.compact
+        return self._app.response_class(self.dumps_bytes(obj, indent) + b'\n', mimetype=self.mimetype)
+
+
+def provider_class():
+    """Clase para app.json_provider_class según JSON_PROVIDER y si orjson está instalado"""
+    if orjson is None or os.getenv('JSON_PROVIDER', 'orjson').lower() == 'default':
+        return DefaultJSONProvider
+    return OrjsonProvider
@@ -0,0 +1,332 @@
+"""
+Métricas de rendimiento por request (formato Prometheus)
+Green House Project - Sistema de Soporte
+
+Por endpoint: latencia (histograma), queries SQL y tiempo en la base de
+datos (eventos before/after_cursor_execute) y tiempo en llamadas HTTP
+salientes. Además: espera por una conexión del pool, duración de cada
+llamada saliente por servicio y ocupación del pool.
+
+Cada worker acumula en memoria y vuelca su snapshot a METRICS_DIR/<pid>.json
+como mucho cada METRICS_FLUSH_SECONDS (al terminar un request). /api/metrics
+suma los snapshots de todos los workers: los contadores de workers que ya
+murieron se conservan (Prometheus espera contadores monótonos) y los gauges
+solo cuentan workers vivos. gunicorn.conf.py limpia el directorio al arrancar.
+
+    metrics.init_app(app)              # middleware
+    metrics.instrument_engine(engine, 'primary')  # queries y pool
+    with metrics.outbound('opensolar'):
+        ...
+"""
+
+import os
+import json
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+from flask import Response, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'ghp_metrics'))
+FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '5'))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+# nombre -> (tipo, ayuda, buckets)
+METRICS = {
+    'ghp_http_requests_total': ('counter', 'Requests atendidos', None),
+    'ghp_http_request_duration_seconds': ('histogram', 'Latencia por endpoint', LATENCY_BUCKETS),
+    'ghp_http_db_queries': ('histogram', 'Queries SQL por request', QUERY_COUNT_BUCKETS),
+    'ghp_db_queries_total': ('counter', 'Queries SQL ejecutadas', None),
+    'ghp_db_query_seconds_total': ('counter', 'Tiempo total en queries SQL', None),
+    'ghp_http_outbound_seconds_total': ('counter', 'Tiempo de los requests en llamadas HTTP salientes', None),
+    'ghp_db_pool_wait_seconds': ('histogram', 'Espera por una conexión del pool', LATENCY_BUCKETS),
+    'ghp_outbound_request_duration_seconds': ('histogram', 'Llamadas HTTP salientes por servicio', LATENCY_BUCKETS),
+    'ghp_db_pool_size': ('gauge', 'Tamaño configurado del pool', None),
+    'ghp_db_pool_checked_out': ('gauge', 'Conexiones del pool en uso', None),
+    'ghp_db_pool_overflow': ('gauge', 'Conexiones abiertas por encima del pool', None),
+    'ghp_workers': ('gauge', 'Workers que reportan métricas', None),
+}
+
+# Queries hechas fuera de un request (cola de emails, GC, coalescedor...)
+BACKGROUND = 'background'
+
+
+class MetricsStore:
+    """Contadores e histogramas de un proceso; clave (nombre, labels ordenados)"""
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, labels, value=1.0):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        buckets = METRICS[name][2]
+        with self._lock:
+            state = self.histograms.get(key)
+            if state is None:
+                # Un contador por bucket (+Inf al final), suma y cantidad
+                state = self.histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, dict(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, dict(labels), list(state[0]), state[1], state[2]]
+                               for (name, labels), state in self.histograms.items()]
+            }
+
+
+class Metrics:
+    """Middleware, instrumentación del engine y exportación"""
+
+    def __init__(self):
+        self.store = MetricsStore()
+        self.engines = {}
+        self._last_flush = 0.0
+
+    # ------------------------------------------------------------------
+    # Middleware
+    # ------------------------------------------------------------------
+    def init_app(self, app):
+        """Registrar antes que los demás before_request para medir también la sesión"""
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/api/metrics', 'metrics', self.metrics_view, methods=['GET'])
+
+    def _before_request(self):
+        g._metrics = {'start': time.perf_counter(), 'queries': 0, 'db_time': 0.0, 'outbound': 0.0}
+
+    def _after_request(self, response):
+        stats = g.pop('_metrics', None)
+        if stats is None:
+            return response
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        elapsed = time.perf_counter() - stats['start']
+
+        self.store.inc('ghp_http_requests_total', {
+            'endpoint': endpoint, 'method': request.method, 'status': str(response.status_code)
+        })
+        self.store.observe('ghp_http_request_duration_seconds', {'endpoint': endpoint, 'method': request.method}, elapsed)
+        self.store.observe('ghp_http_db_queries', {'endpoint': endpoint}, stats['queries'])
+        if stats['queries']:
+            self.store.inc('ghp_db_queries_total', {'endpoint': endpoint}, stats['queries'])
+            self.store.inc('ghp_db_query_seconds_total', {'endpoint': endpoint}, stats['db_time'])
+        if stats['outbound']:
+            self.store.inc('ghp_http_outbound_seconds_total', {'endpoint': endpoint}, stats['outbound'])
+
+        if time.time() - self._last_flush >= FLUSH_SECONDS:
+            self.flush()
+        return response
+
+    @staticmethod
+    def _request_stats():
+        return g.get('_metrics') if has_app_context() else None
+
+    # ------------------------------------------------------------------
+    # Base de datos
+    # ------------------------------------------------------------------
+    def instrument_engine(self, engine, name='primary'):
+        """Cuenta y cronometra cada query del engine; el pool se lee al exportar (label engine)"""
+        self.engines[name] = engine
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.listen(engine, 'handle_error', self._handle_error)
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_metrics_query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['_metrics_query_start'].pop()
+        stats = self._request_stats()
+        if stats is not None:
+            stats['queries'] += 1
+            stats['db_time'] += elapsed
+        else:
+            self.store.inc('ghp_db_queries_total', {'endpoint': BACKGROUND})
+            self.store.inc('ghp_db_query_seconds_total', {'endpoint': BACKGROUND}, elapsed)
+
+    @staticmethod
+    def _handle_error(context):
+        # La query falló: after_cursor_execute no se llama
+        starts = context.connection.info.get('_metrics_query_start') if context.connection else None
+        if starts:
+            starts.pop()
+
+    def _pool_gauges(self):
+        gauges = []
+        for name, engine in self.engines.items():
+            pool = engine.pool
+            if not isinstance(pool, QueuePool):
+                continue
+            labels = {'engine': name}
+            gauges.append(['ghp_db_pool_size', labels, pool.size()])
+            gauges.append(['ghp_db_pool_checked_out', labels, pool.checkedout()])
+            gauges.append(['ghp_db_pool_overflow', labels, max(pool.overflow(), 0)])
+        return gauges
+
+    # ------------------------------------------------------------------
+    # Llamadas salientes
+    # ------------------------------------------------------------------
+    def observe_outbound(self, service, outcome, elapsed):
+        self.store.observe('ghp_outbound_request_duration_seconds', {'service': service, 'outcome': outcome}, elapsed)
+        stats = self._request_stats()
+        if stats is not None:
+            stats['outbound'] += elapsed
+
+    @contextmanager
+    def outbound(self, service):
+        """Cronometra una llamada síncrona a un proveedor (Cloudinary, OpenSolar...)"""
+        start = time.perf_counter()
+        outcome = 'error'
+        try:
+            yield
+            outcome = 'ok'
+        finally:
+            self.observe_outbound(service, outcome, time.perf_counter() - start)
+
+    # ------------------------------------------------------------------
+    # Agregación entre workers y exportación
+    # ------------------------------------------------------------------
+    def _snapshot(self):
+        snapshot = self.store.snapshot()
+        snapshot['pid'] = os.getpid()
+        snapshot['gauges'] = self._pool_gauges()
+        return snapshot
+
+    def flush(self):
+        """Escribe el snapshot de este worker (reemplazo atómico)"""
+        self._last_flush = time.time()
+        try:
+            os.makedirs(METRICS_DIR, exist_ok=True)
+            path = os.path.join(METRICS_DIR, f'{os.getpid()}.json')
+            with open(f'{path}.tmp', 'w') as f:
+                json.dump(self._snapshot(), f)
+            os.replace(f'{path}.tmp', path)
+        except OSError as e:
+            print(f"[METRICS] ✗ No se pudo escribir el snapshot: {e}")
+
+    def _collect(self):
+        """Snapshots de todos los workers; el de este proceso, al momento"""
+        own = self._snapshot()
+        snapshots = [own]
+        try:
+            names = os.listdir(METRICS_DIR)
+        except OSError:
+            names = []
+        for name in names:
+            if not name.endswith('.json') or name == f"{own['pid']}.json":
+                continue
+            try:
+                with open(os.path.join(METRICS_DIR, name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def aggregate(self):
+        """Suma por (nombre, labels) de todos los workers"""
+        counters, histograms, gauges = {}, {}, {}
+        live = 0
+        for snapshot in self._collect():
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(sorted(labels.items())))
+                counters[key] = counters.get(key, 0.0) + value
+            for name, labels, buckets, total, count in snapshot['histograms']:
+                key = (name, tuple(sorted(labels.items())))
+                state = histograms.setdefault(key, [[0] * len(buckets), 0.0, 0])
+                state[0] = [a + b for a, b in zip(state[0], buckets)]
+                state[1] += total
+                state[2] += count
+            if _pid_alive(snapshot['pid']):
+                live += 1
+                for name, labels, value in snapshot['gauges']:
+                    key = (name, tuple(sorted(labels.items())))
+                    gauges[key] = gauges.get(key, 0) + value
+        gauges[('ghp_workers', ())] = live
+        return counters, histograms, gauges
+
+    def render(self):
+        counters, histograms, gauges = self.aggregate()
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'counter':
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{_labels(labels)} {_number(value)}')
+            elif kind == 'histogram':
+                for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, bucket_count in zip(list(buckets) + ['+Inf'], counts):
+                        cumulative += bucket_count
+                        le = bound if bound == '+Inf' else _number(bound)
+                        lines.append(f'{name}_bucket{_labels(labels + (("le", le),))} {cumulative}')
+                    lines.append(f'{name}_sum{_labels(labels)} {_number(total)}')
+                    lines.append(f'{name}_count{_labels(labels)} {count}')
+            else:
+                for (metric, labels), value in sorted(gauges.items()):
+                    if metric == name:
+                        lines.append(f'{name}{_labels(labels)} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que mide cuánto espera cada checkout (incluye abrir la conexión)"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            # pool_logging_name del engine (app.py): primary / replica
+            metrics.store.observe('ghp_db_pool_wait_seconds', {'engine': self.logging_name or 'primary'},
+                                  time.perf_counter() - start)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _number(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+metrics = Metrics()
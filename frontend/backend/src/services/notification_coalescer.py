@@ -0,0 +1,288 @@
+"""
+Agrupación de notificaciones por ticket y resumen diario
+Green House Project - Sistema de Soporte
+
+Los cambios de estado no se notifican en el momento: se guardan en
+notification_events (en la misma transacción que el cambio) y un hilo de
+fondo los agrupa por (ticket, destinatario). Cuando el primer evento de un
+grupo cumple NOTIFICATION_COALESCE_SECONDS se envía un solo email y un
+solo WhatsApp con el cambio neto (estado inicial -> estado final). Si el
+ticket volvió al estado de partida no se envía nada.
+
+Los usuarios que lo activen reciben además un resumen diario con toda la
+actividad de sus tickets (notification_preferences.daily_digest).
+"""
+
+import os
+import time
+import random
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, func, or_
+
+from models import Base, User, Ticket, TicketHistory
+from services.email_service_sendgrid import email_service
+from services.whatsapp_dispatcher import whatsapp_dispatcher
+
+
+class NotificationEvent(Base):
+    """Evento pendiente de notificar, agrupado por (ticket_id, recipient_id)"""
+    __tablename__ = 'notification_events'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ticket_id = Column(String(50), nullable=False, index=True)
+    recipient_id = Column(String(50), nullable=False)
+    event_type = Column(String(50), nullable=False)
+    old_value = Column(String(50))
+    new_value = Column(String(50))
+    actor_name = Column(String(255))
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+class NotificationPreference(Base):
+    """Preferencias de notificación por usuario"""
+    __tablename__ = 'notification_preferences'
+
+    user_id = Column(String(50), ForeignKey('users.user_id', ondelete='CASCADE'), primary_key=True)
+    daily_digest = Column(Boolean, nullable=False, default=False)
+    last_digest_at = Column(DateTime)
+
+    def to_dict(self):
+        return {
+            'daily_digest': self.daily_digest,
+            'last_digest_at': self.last_digest_at.isoformat() if self.last_digest_at else None
+        }
+
+
+class NotificationCoalescer:
+    """Envía una notificación por grupo de eventos y los resúmenes diarios"""
+
+    STATUS_CHANGED = 'status_changed'
+    FLUSH_BATCH_SIZE = 100
+
+    # Texto del resumen por acción del historial
+    HISTORY_LABELS = {
+        'ticket_created': 'Ticket creado',
+        'ticket_assigned': 'Ticket asignado',
+        'ticket_resolved': 'Ticket resuelto',
+        'ticket_closed': 'Ticket cerrado',
+        'ticket_rated': 'Ticket calificado',
+        'comment_added': 'Nuevo comentario'
+    }
+
+    def __init__(self):
+        self.enabled = os.getenv('NOTIFICATION_COALESCE_ENABLED', 'true').lower() == 'true'
+        self.window = timedelta(seconds=int(os.getenv('NOTIFICATION_COALESCE_SECONDS', '60')))
+        self.poll_interval = int(os.getenv('NOTIFICATION_FLUSH_INTERVAL_SECONDS', '10'))
+        self.digest_hour = int(os.getenv('NOTIFICATION_DIGEST_HOUR_UTC', '12'))  # 7:00 en Colombia
+        self.session_factory = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def configure(self, session_factory):
+        """Fábrica de sesiones propia: el envío ocurre fuera de los requests"""
+        self.session_factory = session_factory
+
+    def start(self):
+        """Arranca el hilo de fondo una vez por proceso (idempotente)"""
+        if self.session_factory is None:
+            return
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='notification-coalescer', daemon=True)
+            self._thread.start()
+            print(f"✓ Notification coalescer started (pid {self._pid})")
+
+    def record_status_change(self, db, ticket, old_status, new_status, actor_name):
+        """
+        Registra un cambio de estado para el cliente del ticket
+        Se agrega a la sesión del request: queda confirmado con el mismo commit.
+        Returns: False si la agrupación está desactivada (el llamador notifica directo)
+        """
+        if not self.enabled:
+            return False
+        db.add(NotificationEvent(
+            ticket_id=ticket.ticket_id,
+            recipient_id=ticket.client_id,
+            event_type=self.STATUS_CHANGED,
+            old_value=old_status,
+            new_value=new_status,
+            actor_name=actor_name
+        ))
+        return True
+
+    def _run(self):
+        # Desfasar workers para que no consulten a la vez
+        time.sleep(random.uniform(0, self.poll_interval))
+        while True:
+            try:
+                self.flush()
+                self.send_digests()
+            except Exception as e:
+                print(f"✗ Notification coalescer error: {e}")
+            time.sleep(self.poll_interval)
+
+    def flush(self, force=False):
+        """
+        Notifica los grupos cuyo primer evento ya cumplió la ventana
+        force=True ignora la ventana (scripts y pruebas)
+        Returns: número de notificaciones enviadas
+        """
+        session = self.session_factory()
+        sent = 0
+        try:
+            cutoff = datetime.utcnow() - (timedelta(0) if force else self.window)
+            groups = session.query(
+                NotificationEvent.ticket_id, NotificationEvent.recipient_id
+            ).group_by(
+                NotificationEvent.ticket_id, NotificationEvent.recipient_id
+            ).having(func.min(NotificationEvent.created_at) <= cutoff).limit(self.FLUSH_BATCH_SIZE).all()
+
+            for ticket_id, recipient_id in groups:
+                # Otro worker puede estar enviando el mismo grupo
+                events = session.query(NotificationEvent).filter_by(
+                    ticket_id=ticket_id, recipient_id=recipient_id
+                ).order_by(NotificationEvent.id).with_for_update(skip_locked=True).all()
+                if not events:
+                    continue
+
+                change = self._net_change(events)
+                for event in events:
+                    session.delete(event)
+                # Confirmar antes de enviar: como mucho una notificación por grupo
+                session.commit()
+
+                if change and self._notify_status_change(session, ticket_id, recipient_id, *change):
+                    sent += 1
+
+            return sent
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _net_change(self, events):
+        """(estado inicial, estado final, autores) o None si no hubo cambio neto"""
+        status_events = [e for e in events if e.event_type == self.STATUS_CHANGED]
+        if not status_events:
+            return None
+        old_status = status_events[0].old_value
+        new_status = status_events[-1].new_value
+        if old_status == new_status:
+            print(f"[NOTIFICATIONS] Ticket {events[0].ticket_id}: {len(status_events)} cambios sin cambio neto, no se notifica")
+            return None
+        actors = list(dict.fromkeys(e.actor_name for e in status_events if e.actor_name))
+        return old_status, new_status, ', '.join(actors)
+
+    def _notify_status_change(self, session, ticket_id, recipient_id, old_status, new_status, changed_by):
+        ticket = session.query(Ticket).filter_by(ticket_id=ticket_id).first()
+        client = session.query(User).filter_by(user_id=recipient_id).first()
+        if not ticket or not client:
+            return False
+
+        try:
+            whatsapp_dispatcher.notify_status_changed(ticket, old_status, new_status, client)
+        except Exception as e:
+            print(f"[NOTIFICATIONS] Error: {e}")
+
+        try:
+            email_service.send_status_change_notification(
+                ticket_id=ticket.ticket_id,
+                ticket_title=ticket.title,
+                old_status=old_status,
+                new_status=new_status,
+                client_email=client.email,
+                client_name=client.full_name,
+                changed_by=changed_by
+            )
+        except Exception as e:
+            print(f"Error sending email: {e}")
+        return True
+
+    def send_digests(self):
+        """
+        Envía el resumen diario a quien lo tenga activo y aún no lo recibió hoy
+        Returns: número de resúmenes enviados
+        """
+        now = datetime.utcnow()
+        digest_time = now.replace(hour=self.digest_hour, minute=0, second=0, microsecond=0)
+        if now < digest_time:
+            return 0
+
+        session = self.session_factory()
+        sent = 0
+        try:
+            preferences = session.query(NotificationPreference).filter(
+                NotificationPreference.daily_digest.is_(True),
+                or_(
+                    NotificationPreference.last_digest_at.is_(None),
+                    NotificationPreference.last_digest_at < digest_time
+                )
+            ).limit(self.FLUSH_BATCH_SIZE).with_for_update(skip_locked=True).all()
+
+            for preference in preferences:
+                since = preference.last_digest_at or now - timedelta(days=1)
+                user = session.query(User).filter_by(user_id=preference.user_id).first()
+                tickets = self._digest_activity(session, preference.user_id, since, now) if user else []
+                if tickets and email_service.send_activity_digest(
+                    to_email=user.email,
+                    user_name=user.full_name,
+                    tickets=tickets
+                ):
+                    sent += 1
+                # Sin actividad también cuenta como enviado: no volver a revisar hoy
+                preference.last_digest_at = now
+
+            session.commit()
+            if sent:
+                print(f"✓ Notification digests: {sent} sent")
+            return sent
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _digest_activity(self, session, user_id, since, until):
+        """Historial de los tickets del usuario (cliente o ingeniero), agrupado por ticket"""
+        rows = session.query(TicketHistory, Ticket.title).join(
+            Ticket, Ticket.ticket_id == TicketHistory.ticket_id
+        ).filter(
+            or_(Ticket.client_id == user_id, Ticket.assigned_to == user_id),
+            TicketHistory.created_at > since,
+            TicketHistory.created_at <= until
+        ).order_by(TicketHistory.ticket_id, TicketHistory.created_at).all()
+
+        tickets = {}
+        for history, title in rows:
+            ticket = tickets.setdefault(history.ticket_id, {
+                'ticket_id': history.ticket_id,
+                'ticket_title': title,
+                'events': []
+            })
+            ticket['events'].append({
+                'time': history.created_at.strftime('%H:%M'),
+                'description': self._describe(history)
+            })
+        return list(tickets.values())
+
+    def _describe(self, history):
+        if history.action == 'status_changed':
+            labels = email_service.STATUS_LABELS
+            return f"Estado: {labels.get(history.old_value, history.old_value)} → {labels.get(history.new_value, history.new_value)}"
+        return self.HISTORY_LABELS.get(history.action, history.action.replace('_', ' ').capitalize())
+
+    def get_preference(self, db, user_id):
+        preference = db.query(NotificationPreference).filter_by(user_id=user_id).first()
+        return preference or NotificationPreference(user_id=user_id, daily_digest=False)
+
+
+# Singleton instance
+notification_coalescer = NotificationCoalescer()
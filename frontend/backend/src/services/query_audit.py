@@ -0,0 +1,147 @@
+"""
+Detector de N+1 y presupuesto de queries por endpoint (desarrollo y pruebas)
+Green House Project - Sistema de Soporte
+
+Con QUERY_AUDIT activo escucha before_cursor_execute y, por request, agrupa
+las queries por forma (la sentencia sin literales ni parámetros). Al terminar
+el request:
+
+- cada forma repetida más de QUERY_AUDIT_THRESHOLD veces se reporta como
+  posible N+1 junto con la línea del código de la app que la originó;
+- si la ruta declara @query_budget(n) y hizo más de n queries, se reporta.
+
+Las respuestas llevan X-Query-Count (y X-Query-Budget / X-Query-Audit si
+aplica); scripts/check_query_budgets.py las usa para fallar en CI.
+
+Modos (QUERY_AUDIT):
+  off     sin listeners (por defecto; con DEBUG=true, warn)
+  warn    solo log [QUERY_AUDIT]
+  strict  además la respuesta se reemplaza por un 500
+
+    @tickets_bp.route('/<ticket_id>', methods=['GET'])
+    @jwt_required()
+    @query_budget(4)
+    def get_ticket(ticket_id): ...
+"""
+
+import os
+import re
+import traceback
+from collections import Counter
+from flask import current_app, g, has_app_context, jsonify, request
+from sqlalchemy import event
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Literales y parámetros -> '?', listas de IN -> '(?...)'
+_NORMALIZERS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'%\(\w+\)s|%s|\$\d+|(?<!:):\w+'), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(?...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def fingerprint(statement):
+    """Forma de la sentencia: igual para la misma query con distintos valores"""
+    for pattern, replacement in _NORMALIZERS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+def query_budget(max_queries):
+    """Declara cuántas queries puede hacer la ruta (se valida con QUERY_AUDIT activo)"""
+    def decorator(f):
+        # functools.wraps de los decoradores externos copia el atributo
+        f.query_budget = max_queries
+        return f
+    return decorator
+
+
+def _origin():
+    """Primera línea del código de la app (no de SQLAlchemy ni de este módulo) en la pila"""
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(SRC_DIR) and frame.filename != __file__:
+            return f'{os.path.relpath(frame.filename, SRC_DIR)}:{frame.lineno} en {frame.name}'
+    return 'origen desconocido'
+
+
+class QueryAudit:
+    """Listener de SQLAlchemy + hooks de request"""
+
+    def __init__(self):
+        mode = os.getenv('QUERY_AUDIT', 'warn' if os.getenv('DEBUG') == 'true' else 'off').lower()
+        self.mode = mode if mode in ('off', 'warn', 'strict') else 'off'
+        self.threshold = int(os.getenv('QUERY_AUDIT_THRESHOLD', '5'))
+
+    @property
+    def enabled(self):
+        return self.mode != 'off'
+
+    def init_app(self, app, *engines):
+        if not self.enabled:
+            return
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        print(f"[QUERY_AUDIT] Activo ({self.mode}), umbral N+1: {self.threshold} repeticiones")
+
+    def _before_request(self):
+        g._query_audit = {'count': 0, 'shapes': Counter(), 'origins': {}}
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        state = g.get('_query_audit') if has_app_context() else None
+        if state is None:
+            return
+        shape = fingerprint(statement)
+        state['count'] += 1
+        state['shapes'][shape] += 1
+        if shape not in state['origins']:
+            state['origins'][shape] = _origin()
+
+    def _after_request(self, response):
+        state = g.pop('_query_audit', None)
+        if state is None:
+            return response
+
+        view = current_app.view_functions.get(request.endpoint)
+        budget = getattr(view, 'query_budget', None)
+        label = f'{request.method} {request.path}'
+        issues = []
+
+        for shape, count in state['shapes'].most_common():
+            if count <= self.threshold:
+                break
+            issues.append('n+1')
+            print(f"[QUERY_AUDIT] ✗ Posible N+1 en {label}: {count}x desde {state['origins'][shape]}")
+            print(f"    {shape[:300]}")
+
+        if budget is not None and state['count'] > budget:
+            issues.append('budget')
+            print(f"[QUERY_AUDIT] ✗ {label}: {state['count']} queries (presupuesto {budget})")
+
+        response.headers['X-Query-Count'] = str(state['count'])
+        if budget is not None:
+            response.headers['X-Query-Budget'] = str(budget)
+        if not issues:
+            return response
+
+        response.headers['X-Query-Audit'] = ','.join(sorted(set(issues)))
+        if self.mode != 'strict':
+            return response
+        failure = jsonify({
+            'error': 'Auditoría de queries fallida',
+            'queries': state['count'],
+            'budget': budget,
+            'issues': sorted(set(issues))
+        })
+        failure.status_code = 500
+        for header in ('X-Query-Count', 'X-Query-Budget', 'X-Query-Audit'):
+            if header in response.headers:
+                failure.headers[header] = response.headers[header]
+        return failure
+
+
+query_audit = QueryAudit()
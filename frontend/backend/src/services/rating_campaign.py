@@ -0,0 +1,188 @@
+"""
+Campaña masiva de solicitudes de calificación
+Green House Project - Sistema de Soporte
+
+Recorre los tickets resueltos/cerrados sin calificación en bloques por
+ticket_id (keyset), los agrupa por cliente y los envía con send_batch: la
+plantilla se renderiza una vez por bloque y cada bloque es un solo request
+a SendGrid. tickets.rating_requested_at marca lo ya solicitado, así que
+repetir la campaña solo toma los tickets nuevos.
+
+Con EMAIL_ENABLED=false send_batch acepta todo sin enviar nada: la campaña
+real se rechaza (EmailDisabled) para no marcar tickets que nunca recibieron
+el email. dry_run sí funciona.
+"""
+
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import DateTime, bindparam, column, or_, text
+from sqlalchemy.orm import aliased
+
+from models import User, Ticket, TicketStatus
+from services.email_service_sendgrid import email_service
+
+
+# La columna no está en el modelo Ticket (la agrega la migración 003); se consulta directamente
+RATING_REQUESTED_AT = column('rating_requested_at', DateTime)
+
+
+class EmailDisabled(Exception):
+    """El servicio de email no envía (EMAIL_ENABLED=false)"""
+
+
+class RatingCampaign:
+    """Solicita calificación de los tickets terminados que aún no la tienen"""
+
+    CHUNK_SIZE = 500
+    # Dar tiempo a la solicitud individual antes de incluir un ticket
+    MIN_AGE = timedelta(hours=24)
+    # Clave para pg_try_advisory_lock: una campaña a la vez
+    LOCK_KEY = 0x6768705f7261  # 'ghp_ra'
+    SUBJECT = "⭐ Califica el servicio - Ticket {ticket_id}"
+    PERSONAL_FIELDS = ('ticket_id', 'ticket_title', 'client_name', 'engineer_name')
+
+    def run(self, session, dry_run=False, limit=None, per_client=1):
+        """
+        Ejecuta la campaña
+        per_client: máximo de solicitudes por cliente en esta ejecución; el
+        resto queda pendiente para la próxima
+        Returns: dict con el resumen, o None si otra campaña está en curso
+        Raises: EmailDisabled si no es dry_run y los emails están deshabilitados
+        """
+        if not dry_run and not email_service.enabled:
+            raise EmailDisabled('EMAIL_ENABLED=false: no se envían solicitudes ni se marcan tickets')
+
+        lock = self._try_lock(session)
+        if lock is None:
+            return None
+
+        try:
+            summary = Counter()
+            sent_per_client = Counter()
+            cutoff = datetime.utcnow() - self.MIN_AGE
+            last_ticket_id = None
+
+            while limit is None or summary['selected'] < limit:
+                rows = self._eligible(session, cutoff, last_ticket_id)
+                if not rows:
+                    break
+                last_ticket_id = rows[-1].ticket_id
+                summary['chunks'] += 1
+
+                selected = []
+                for client_tickets in self._group_by_client(rows).values():
+                    for row in client_tickets:
+                        if sent_per_client[row.client_id] >= per_client:
+                            summary['deferred'] += 1
+                            continue
+                        if limit is not None and summary['selected'] >= limit:
+                            break
+                        sent_per_client[row.client_id] += 1
+                        summary['selected'] += 1
+                        selected.append(row)
+
+                if dry_run or not selected:
+                    continue
+
+                requested = self._send(selected)
+                summary['sent'] += len(requested)
+                summary['failed'] += len(selected) - len(requested)
+                if requested:
+                    session.execute(
+                        text(
+                            "UPDATE tickets SET rating_requested_at = :now WHERE ticket_id IN :ids"
+                        ).bindparams(bindparam('ids', expanding=True)),
+                        {'now': datetime.utcnow(), 'ids': requested}
+                    )
+                # Confirmar por bloque: si algo falla después, lo enviado ya quedó marcado
+                session.commit()
+
+            summary['clients'] = len(sent_per_client)
+            result = {key: summary[key] for key in ('chunks', 'selected', 'sent', 'failed', 'deferred', 'clients')}
+            result['dry_run'] = dry_run
+            print(f"✓ Rating campaign: {result}")
+            return result
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            self._unlock(lock)
+
+    def _eligible(self, session, cutoff, after):
+        client = aliased(User)
+        engineer = aliased(User)
+        query = session.query(
+            Ticket.ticket_id,
+            Ticket.title,
+            Ticket.client_id,
+            client.email.label('client_email'),
+            client.full_name.label('client_name'),
+            engineer.full_name.label('engineer_name')
+        ).join(
+            client, client.user_id == Ticket.client_id
+        ).outerjoin(
+            engineer, engineer.user_id == Ticket.assigned_to
+        ).filter(
+            Ticket.status.in_([TicketStatus.RESOLVED, TicketStatus.CLOSED]),
+            Ticket.rating.is_(None),
+            RATING_REQUESTED_AT.is_(None),
+            or_(Ticket.resolved_at.is_(None), Ticket.resolved_at <= cutoff),
+            client.email.isnot(None)
+        )
+        if after is not None:
+            query = query.filter(Ticket.ticket_id > after)
+        return query.order_by(Ticket.ticket_id).limit(self.CHUNK_SIZE).all()
+
+    def _group_by_client(self, rows):
+        """Cliente -> tickets, del más reciente (ticket_id mayor) al más antiguo"""
+        by_client = defaultdict(list)
+        for row in reversed(rows):
+            by_client[row.client_id].append(row)
+        return by_client
+
+    def _send(self, rows):
+        """Un send_batch por bloque; Returns: ticket_ids aceptados"""
+        recipients = [{
+            'email': row.client_email,
+            'name': row.client_name,
+            'context': {
+                'ticket_id': row.ticket_id,
+                'ticket_title': row.title,
+                'client_name': row.client_name or 'Cliente',
+                'engineer_name': row.engineer_name or 'Equipo de Soporte'
+            }
+        } for row in rows]
+
+        results = email_service.send_batch(
+            'rating_request',
+            self.SUBJECT,
+            recipients,
+            shared_context={'rating_labels': email_service.RATING_LABELS},
+            personal_fields=self.PERSONAL_FIELDS
+        )
+        return [row.ticket_id for row in rows if results.get(row.client_email)]
+
+    def _try_lock(self, session):
+        """
+        El lock de sesión vive en una conexión propia: los commits por bloque
+        devuelven la conexión de la sesión al pool
+        Returns: la conexión que tiene el lock (False fuera de PostgreSQL), o None si está tomado
+        """
+        engine = session.get_bind()
+        if engine.dialect.name != 'postgresql':
+            return False
+        conn = engine.connect()
+        if conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {'key': self.LOCK_KEY}).scalar():
+            return conn
+        conn.close()
+        return None
+
+    def _unlock(self, conn):
+        if conn:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': self.LOCK_KEY})
+            conn.close()
+
+
+# Singleton instance
+rating_campaign = RatingCampaign()
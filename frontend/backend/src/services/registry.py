@@ -0,0 +1,99 @@
+"""
+Registro de servicios con inicialización diferida
+Green House Project - Sistema de Soporte
+
+Los singletons de los servicios (clientes de SendGrid, Cloudinary, Twilio,
+OpenSolar, plantillas) se construyen en el primer uso y no al importar el
+módulo: arrancar o reciclar un worker no paga clientes que quizá no use.
+Los módulos siguen exponiendo su singleton con el mismo nombre; ahora es un
+LazyService que delega todo en la instancia real.
+
+    email_service = lazy_service('email_service', SendGridEmailService)
+
+Configuración que depende de la app (p. ej. la sesión de la cola de emails)
+se registra con on_build: corre al construir el servicio, no al importar.
+
+    registry.on_build('email_service', lambda service: service.outbox.configure(Session))
+"""
+
+import threading
+
+
+class ServiceRegistry:
+    """Fábricas por nombre; cada servicio se construye una sola vez por proceso"""
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._hooks = {}
+        self._lock = threading.RLock()
+
+    def register(self, name, factory):
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def get(self, name):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            # RLock: una fábrica puede pedir otros servicios del registro
+            if name not in self._instances:
+                instance = self._factories[name]()
+                for hook in self._hooks.get(name, ()):
+                    hook(instance)
+                self._instances[name] = instance
+            return self._instances[name]
+
+    def on_build(self, name, hook):
+        """hook(instance) al construir el servicio (ya, si está construido); se repite tras reset"""
+        with self._lock:
+            self._hooks.setdefault(name, []).append(hook)
+            instance = self._instances.get(name)
+        if instance is not None:
+            hook(instance)
+
+    def is_built(self, name):
+        return name in self._instances
+
+    def reset(self, name=None):
+        """Descarta instancias (scripts y pruebas); se reconstruyen en el próximo uso"""
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+            else:
+                self._instances.pop(name, None)
+
+    def status(self):
+        with self._lock:
+            return {name: name in self._instances for name in sorted(self._factories)}
+
+
+class LazyService:
+    """Proxy del singleton: el primer acceso a un atributo construye el servicio"""
+
+    __slots__ = ('_registry', '_name')
+
+    def __init__(self, registry, name):
+        object.__setattr__(self, '_registry', registry)
+        object.__setattr__(self, '_name', name)
+
+    def __getattr__(self, attr):
+        return getattr(self._registry.get(self._name), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._registry.get(self._name), attr, value)
+
+    def __repr__(self):
+        state = 'built' if self._registry.is_built(self._name) else 'not built'
+        return f'<LazyService {self._name} ({state})>'
+
+
+registry = ServiceRegistry()
+
+
+def lazy_service(name, factory):
+    """Registra la fábrica y devuelve el proxy que se exporta como singleton"""
+    registry.register(name, factory)
+    return LazyService(registry, name)
@@ -0,0 +1,254 @@
+"""
+Recolector de basura del almacenamiento en Cloudinary
+Green House Project - Sistema de Soporte
+
+Procesa en segundo plano la cola storage_deletions (borrado masivo con
+delete_resources, hasta 100 public_ids por llamada) y periódicamente
+compara lo que hay bajo soporte-ghp/ con la tabla de adjuntos para
+eliminar archivos huérfanos.
+"""
+
+import os
+import time
+import random
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from models import Attachment
+from services.cloudinary_storage import cloudinary_storage, StorageBlob, StorageDeletion
+
+
+class StorageGarbageCollector:
+    """Borra en lote los archivos encolados y purga huérfanos de Cloudinary"""
+
+    STORAGE_PREFIX = 'soporte-ghp/'
+    RESOURCE_TYPES = ('image', 'video', 'raw')
+    DELETE_BATCH_SIZE = 100  # Límite de delete_resources
+    LIST_PAGE_SIZE = 500     # Límite de resources
+    MAX_ATTEMPTS = 5
+    # Subidas recientes pueden no tener aún su fila (transacción en curso)
+    ORPHAN_GRACE_PERIOD = timedelta(hours=24)
+    # Clave para pg_try_advisory_xact_lock: una sola reconciliación a la vez
+    RECONCILE_LOCK_KEY = 0x6768705f6763  # 'ghp_gc'
+
+    def __init__(self):
+        self.enabled = os.getenv('STORAGE_GC_ENABLED', 'true').lower() == 'true'
+        self.poll_interval = int(os.getenv('STORAGE_GC_INTERVAL_SECONDS', '30'))
+        self.reconcile_interval = int(os.getenv('STORAGE_GC_RECONCILE_HOURS', '24')) * 3600
+        self.session_factory = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._last_reconcile = 0.0
+
+    def configure(self, session_factory):
+        """Fábrica de sesiones propia: el recolector trabaja fuera de los requests"""
+        self.session_factory = session_factory
+
+    def start(self):
+        """Arranca el hilo de fondo una vez por proceso (idempotente)"""
+        if not self.enabled or self.session_factory is None:
+            return
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            # Repartir la primera reconciliación entre workers
+            self._last_reconcile = time.monotonic() - random.uniform(0, self.reconcile_interval)
+            self._thread = threading.Thread(target=self._run, name='storage-gc', daemon=True)
+            self._thread.start()
+            print(f"✓ Storage GC started (pid {self._pid})")
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.process_pending()
+                if time.monotonic() - self._last_reconcile >= self.reconcile_interval:
+                    self._last_reconcile = time.monotonic()
+                    self.reconcile()
+            except Exception as e:
+                print(f"✗ Storage GC error: {e}")
+
+    def process_pending(self, limit=1000):
+        """
+        Borra los archivos pendientes cuyo reintento ya venció
+        Returns: dict con deleted / failed
+        """
+        session = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            pending = session.query(StorageDeletion).filter(
+                StorageDeletion.next_attempt_at.isnot(None),
+                StorageDeletion.next_attempt_at <= now
+            ).order_by(StorageDeletion.id).limit(limit).with_for_update(skip_locked=True).all()
+
+            by_type = defaultdict(list)
+            for row in pending:
+                by_type[row.resource_type].append(row)
+
+            deleted = failed = 0
+            for resource_type, rows in by_type.items():
+                for start in range(0, len(rows), self.DELETE_BATCH_SIZE):
+                    batch = rows[start:start + self.DELETE_BATCH_SIZE]
+                    ok, errors = self._delete_batch(resource_type, [r.public_id for r in batch])
+                    for row in batch:
+                        if row.public_id in ok:
+                            session.delete(row)
+                            deleted += 1
+                        else:
+                            self._schedule_retry(row, errors.get(row.public_id, 'unknown error'), now)
+                            failed += 1
+
+            session.commit()
+            if deleted or failed:
+                print(f"✓ Storage GC: {deleted} files deleted, {failed} pending retry")
+            return {'deleted': deleted, 'failed': failed}
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _delete_batch(self, resource_type, public_ids):
+        """
+        Una llamada a delete_resources
+        Returns: (set de public_ids borrados, dict public_id -> error)
+        """
+        try:
+            result = cloudinary_storage.api.delete_resources(
+                public_ids, resource_type=resource_type, type='upload'
+            )
+        except Exception as e:
+            return set(), {public_id: str(e) for public_id in public_ids}
+
+        statuses = result.get('deleted', {})
+        ok = set()
+        errors = {}
+        for public_id in public_ids:
+            status = statuses.get(public_id)
+            if status == 'deleted':
+                ok.add(public_id)
+            elif status == 'not_found':
+                # Puede ser un public_id mal derivado (el archivo sigue ahí):
+                # se reintenta y, si persiste, queda para revisión manual
+                print(f"⚠ Storage GC: {resource_type}/{public_id} not found in Cloudinary")
+                errors[public_id] = "delete_resources status: not_found"
+            else:
+                errors[public_id] = f"delete_resources status: {status}"
+        return ok, errors
+
+    def _schedule_retry(self, row, error, now):
+        """Backoff exponencial; tras MAX_ATTEMPTS queda para revisión manual"""
+        row.attempts += 1
+        row.last_error = error[:1000]
+        if row.attempts >= self.MAX_ATTEMPTS:
+            row.next_attempt_at = None
+            print(f"✗ Storage GC gave up on {row.public_id}: {error}")
+        else:
+            row.next_attempt_at = now + timedelta(minutes=2 ** row.attempts)
+
+    def reconcile(self):
+        """
+        Encola para borrado los archivos bajo soporte-ghp/ que ya no
+        referencia ningún adjunto
+        Returns: número de huérfanos encolados, o None si otro proceso ya reconcilia
+        """
+        session = self.session_factory()
+        try:
+            if not self._try_lock(session):
+                return None
+
+            known = set()
+            for (file_url,) in session.query(Attachment.file_url).yield_per(1000):
+                known.add(self._key(*cloudinary_storage.parse_storage_path(file_url)))
+            for storage_path, public_id, resource_type in session.query(
+                StorageBlob.storage_path, StorageBlob.public_id, StorageBlob.resource_type
+            ).yield_per(1000):
+                if public_id:
+                    known.add(self._key(public_id, resource_type))
+                known.add(self._key(*cloudinary_storage.parse_storage_path(storage_path)))
+            for public_id, resource_type in session.query(
+                StorageDeletion.public_id, StorageDeletion.resource_type
+            ).yield_per(1000):
+                known.add(self._key(public_id, resource_type))
+
+            cutoff = datetime.utcnow() - self.ORPHAN_GRACE_PERIOD
+            orphans = 0
+            for resource_type in self.RESOURCE_TYPES:
+                for resource in self._list_resources(resource_type):
+                    if self._key(resource['public_id'], resource_type) in known:
+                        continue
+                    created_at = datetime.strptime(resource['created_at'], '%Y-%m-%dT%H:%M:%SZ')
+                    if created_at > cutoff:
+                        continue
+                    session.add(StorageDeletion(
+                        public_id=resource['public_id'],
+                        resource_type=resource_type
+                    ))
+                    orphans += 1
+
+            session.commit()
+            print(f"✓ Storage GC reconcile: {orphans} orphan files queued")
+            return orphans
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _list_resources(self, resource_type):
+        """Recorre todas las páginas de resources bajo el prefijo del sistema"""
+        next_cursor = None
+        while True:
+            options = {
+                'type': 'upload',
+                'prefix': self.STORAGE_PREFIX,
+                'resource_type': resource_type,
+                'max_results': self.LIST_PAGE_SIZE
+            }
+            if next_cursor:
+                options['next_cursor'] = next_cursor
+            result = cloudinary_storage.api.resources(**options)
+            yield from result.get('resources', [])
+            next_cursor = result.get('next_cursor')
+            if not next_cursor:
+                break
+
+    def _key(self, public_id, resource_type):
+        """
+        Comparación exacta: los raw se listan con extensión y parse_storage_path
+        la conserva; imágenes y videos se listan y se parsean sin ella
+        """
+        return (resource_type, public_id)
+
+    def _try_lock(self, session):
+        if session.bind.dialect.name != 'postgresql':
+            return True
+        return session.execute(
+            text("SELECT pg_try_advisory_xact_lock(:key)"),
+            {'key': self.RECONCILE_LOCK_KEY}
+        ).scalar()
+
+    def get_status(self):
+        """Resumen de la cola para el panel de administración"""
+        session = self.session_factory()
+        try:
+            pending = session.query(StorageDeletion).filter(
+                StorageDeletion.next_attempt_at.isnot(None)
+            ).count()
+            failed = session.query(StorageDeletion).filter(
+                StorageDeletion.next_attempt_at.is_(None)
+            ).count()
+            return {'pending': pending, 'failed': failed}
+        finally:
+            session.close()
+
+
+# Singleton instance
+storage_gc = StorageGarbageCollector()
@@ -0,0 +1,106 @@
+"""
+Versión de tickets para ETags (detalle e historial)
+Green House Project - Sistema de Soporte
+
+tickets.version (migración 004) sube en cada flush que modifica el ticket o
+le agrega/quita historial, adjuntos o comentarios: un listener de after_flush
+cubre todas las rutas de escritura (update, assign, status, resolve, close,
+rate, adjuntos, comentarios) sin que cada una tenga que acordarse. Como el
+detalle y el historial embeben datos de usuarios (cliente, ingeniero,
+autores), un cambio en esos campos del usuario sube también la versión de
+sus tickets. Las lecturas revalidan con
+una sola consulta por clave primaria, sin cargar ni serializar el ticket.
+
+    validators = ticket_versions.lookup(g.db, ticket_id)
+    etag = ticket_versions.etag('ticket', ticket_id, current_user_id, validators)
+"""
+
+from sqlalchemy import Integer, String, DateTime, column, event, inspect, or_, select, table, update
+from sqlalchemy.orm import Session
+from models import Ticket, TicketHistory, Attachment, Comment, User
+from services.http_cache import make_etag
+
+# La columna no está en el modelo Ticket: se accede con una tabla liviana
+tickets = table(
+    'tickets',
+    column('ticket_id', String),
+    column('version', Integer),
+    column('updated_at', DateTime)
+)
+
+# Objetos cuyo alta/baja/cambio altera el detalle o el historial del ticket
+RELATED = (TicketHistory, Attachment, Comment)
+
+# Campos de User que se serializan dentro del detalle, historial y comentarios
+# (last_login y similares no: subirían la versión en cada login)
+USER_FIELDS = ('full_name', 'email', 'phone', 'role')
+
+
+def lookup(db, ticket_id):
+    """(version, updated_at) del ticket o None si no existe"""
+    return db.execute(
+        select(tickets.c.version, tickets.c.updated_at).where(tickets.c.ticket_id == ticket_id)
+    ).first()
+
+
+def etag(kind, ticket_id, user_id, validators):
+    """
+    ETag por recurso, versión y usuario
+    El usuario entra en la clave porque la respuesta depende de sus permisos:
+    así un 304 nunca se sirve sin que la misma identidad haya visto el cuerpo.
+    """
+    version, updated_at = validators
+    return make_etag(kind, ticket_id, version, updated_at.isoformat() if updated_at else None, user_id)
+
+
+def _changed_ticket_ids(session):
+    ids = set()
+    for obj in session.dirty:
+        if isinstance(obj, (Ticket,) + RELATED) and session.is_modified(obj):
+            ids.add(obj.ticket_id)
+    for obj in session.new:
+        if isinstance(obj, RELATED):
+            ids.add(obj.ticket_id)
+    for obj in session.deleted:
+        if isinstance(obj, RELATED):
+            ids.add(obj.ticket_id)
+    ids.discard(None)
+    return ids
+
+
+def _changed_user_ids(session):
+    ids = set()
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            attrs = inspect(obj).attrs
+            if any(attrs[name].history.has_changes() for name in USER_FIELDS if name in attrs):
+                ids.add(obj.user_id)
+    return ids
+
+
+def _user_tickets(user_ids):
+    """Tickets que muestran a alguno de los usuarios: como partes o como autores"""
+    return or_(
+        tickets.c.ticket_id.in_(select(Ticket.ticket_id).where(or_(
+            Ticket.client_id.in_(user_ids),
+            Ticket.assigned_to.in_(user_ids),
+            Ticket.created_by_id.in_(user_ids)
+        ))),
+        tickets.c.ticket_id.in_(select(TicketHistory.ticket_id).where(TicketHistory.user_id.in_(user_ids))),
+        tickets.c.ticket_id.in_(select(Comment.ticket_id).where(Comment.user_id.in_(user_ids)))
+    )
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_versions(session, flush_context):
+    ids = _changed_ticket_ids(session)
+    user_ids = _changed_user_ids(session)
+    conditions = []
+    if ids:
+        conditions.append(tickets.c.ticket_id.in_(ids))
+    if user_ids:
+        conditions.append(_user_tickets(user_ids))
+    if conditions:
+        session.connection().execute(
+            update(tickets).where(or_(*conditions)).values(version=tickets.c.version + 1)
+        )
@@ -0,0 +1,331 @@
+"""
+Despachador de WhatsApp (Twilio) con cola y agrupación por destinatario
+Green House Project - Sistema de Soporte
+
+Los mensajes se renderizan al encolar (plantillas string.Template
+compiladas una vez) y un hilo por proceso los envía por el transporte HTTP
+asíncrono con pool de conexiones y concurrencia limitada
+(WHATSAPP_MAX_CONCURRENCY). Los mensajes al mismo teléfono dentro de
+WHATSAPP_COALESCE_SECONDS se unen en uno solo: menos requests a Twilio y
+menos costo por mensaje. Los errores transitorios (429, 5xx, red) se
+reintentan con backoff; el resto se descarta con log, como antes.
+
+La cola vive en memoria, igual que la de emails.
+
+Cambios frente a NotificationService: los mensajes de creación de ticket
+conservan el texto que armaba tickets.py; los de asignación, cambio de
+estado y resolución son textos nuevos (WhatsAppTemplates). Los números
+locales (sin '+', hasta 10 dígitos) se prefijan con
+WHATSAPP_DEFAULT_COUNTRY_CODE (57 por defecto); antes se enviaban tal cual.
+"""
+
+import os
+import time
+import heapq
+import base64
+import random
+import itertools
+import threading
+from collections import Counter
+from string import Template
+
+from services.http_transport import AsyncHTTPTransport
+from services.email_service_sendgrid import email_service
+from services.fake_providers import is_fake_mode, fake_providers_url
+from services.registry import lazy_service
+
+
+TWILIO_API_URL = 'https://api.twilio.com/2010-04-01/Accounts/{sid}/Messages.json'
+
+
+class WhatsAppTemplates:
+    """Plantillas de los mensajes; se compilan al importar el módulo"""
+
+    TEMPLATES = {
+        'ticket_created_engineer': Template("""🔔 *Nuevo ticket asignado*
+
+📋 Ticket: $ticket_id
+📝 Título: $ticket_title
+⚡ Prioridad: $priority
+🏠 Proyecto: $project_id
+👤 Cliente: $client_name
+
+Revisa los detalles en el sistema de soporte."""),
+        'ticket_created_client': Template("""🔔 *Ticket de soporte creado*
+
+📋 Ticket: $ticket_id
+📝 Título: $ticket_title
+⚡ Prioridad: $priority
+🏠 Proyecto: $project_id
+
+Hemos recibido tu solicitud y estamos trabajando en ella.
+Te mantendremos informado del progreso.
+
+Green House Project - Soporte Técnico"""),
+        'ticket_assigned': Template("""🔔 *Ticket asignado*
+
+📋 Ticket: $ticket_id
+📝 Título: $ticket_title
+⚡ Prioridad: $priority
+
+Revisa los detalles en el sistema de soporte."""),
+        'status_changed': Template("""🔄 *Actualización de tu ticket*
+
+📋 Ticket: $ticket_id
+📝 Título: $ticket_title
+Estado: $old_status → *$new_status*"""),
+        'ticket_resolved': Template("""✅ *Ticket resuelto*
+
+📋 Ticket: $ticket_id
+📝 Título: $ticket_title
+
+Si el problema persiste responde a este mensaje o abre un nuevo ticket.
+Green House Project - Soporte Técnico""")
+    }
+
+    def render(self, name, **context):
+        return self.TEMPLATES[name].substitute(context)
+
+
+class _Pending:
+    __slots__ = ('phone', 'bodies', 'size', 'attempts')
+
+    def __init__(self, phone):
+        self.phone = phone
+        self.bodies = []
+        self.size = 0
+        self.attempts = 0
+
+
+class WhatsAppDispatcher:
+    """
+    Envía WhatsApp por Twilio sin bloquear al llamador
+    Mantiene la interfaz de NotificationService (send_whatsapp, notify_*).
+    """
+
+    MAX_BODY = 1600         # Límite de Twilio por mensaje
+    SEPARATOR = '\n\n— — —\n\n'
+    MAX_ATTEMPTS = 3
+    BASE_BACKOFF = 2.0
+    RETRYABLE_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+    def __init__(self):
+        self.account_sid = os.getenv('TWILIO_ACCOUNT_SID', '')
+        auth_token = os.getenv('TWILIO_AUTH_TOKEN', '')
+        self.from_number = os.getenv('TWILIO_WHATSAPP_FROM', '')
+        self.default_country_code = os.getenv('WHATSAPP_DEFAULT_COUNTRY_CODE', '57')
+        self.window = float(os.getenv('WHATSAPP_COALESCE_SECONDS', '5'))
+        self.templates = WhatsAppTemplates()
+
+        api_url = os.getenv('TWILIO_API_URL', TWILIO_API_URL)
+        if is_fake_mode():
+            self.account_sid = self.account_sid or 'ACfake'
+            auth_token = auth_token or 'fake-token'
+            self.from_number = self.from_number or '+10000000000'
+            api_url = fake_providers_url() + '/2010-04-01/Accounts/{sid}/Messages.json'
+
+        self.enabled = bool(self.account_sid and auth_token and self.from_number)
+        self.transport = None
+        if self.enabled:
+            credentials = base64.b64encode(f'{self.account_sid}:{auth_token}'.encode()).decode()
+            self.transport = AsyncHTTPTransport(
+                api_url.format(sid=self.account_sid),
+                headers={'Authorization': f'Basic {credentials}'},
+                max_concurrency=int(os.getenv('WHATSAPP_MAX_CONCURRENCY', '4')),
+                timeout=float(os.getenv('WHATSAPP_TIMEOUT_SECONDS', '10')),
+                form=True,
+                name='whatsapp-transport'
+            )
+        else:
+            print("[WHATSAPP] Twilio no configurado, los mensajes se omitirán")
+
+        self.stats = Counter()
+        self._open = {}     # teléfono -> grupo que aún acepta mensajes
+        self._heap = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._pid = None
+
+    # --- Interfaz de NotificationService ------------------------------------
+
+    def send_whatsapp(self, to, message):
+        """
+        Encola un mensaje; se agrupa con los demás para el mismo teléfono
+        Returns: True si quedó encolado
+        """
+        phone = self._normalize(to)
+        if not self.enabled or not phone:
+            return False
+
+        self._start()
+        with self._cond:
+            group = self._open.get(phone)
+            if group and message in group.bodies:
+                self.stats['duplicates'] += 1
+                return True
+            # Un grupo que ya no cabe en un mensaje se cierra y sale en su turno
+            if group and group.size + len(self.SEPARATOR) + len(message) > self.MAX_BODY:
+                del self._open[phone]
+                group = None
+            if group is None:
+                group = _Pending(phone)
+                if self.window > 0:
+                    self._open[phone] = group
+                self._push(group, self.window)
+            else:
+                self.stats['coalesced'] += 1
+                group.size += len(self.SEPARATOR)
+            group.bodies.append(message)
+            group.size += len(message)
+            self.stats['queued'] += 1
+        return True
+
+    def send_template(self, to, template_name, **context):
+        return self.send_whatsapp(to, self.templates.render(template_name, **context))
+
+    def notify_ticket_assigned(self, ticket, engineer):
+        return self.send_template(
+            getattr(engineer, 'phone', None), 'ticket_assigned',
+            **self._ticket_context(ticket)
+        )
+
+    def notify_status_changed(self, ticket, old_status, new_status, client=None):
+        labels = email_service.STATUS_LABELS
+        return self.send_template(
+            self._client_phone(ticket, client), 'status_changed',
+            old_status=labels.get(old_status, old_status),
+            new_status=labels.get(new_status, new_status),
+            **self._ticket_context(ticket)
+        )
+
+    def notify_ticket_resolved(self, ticket, client=None):
+        return self.send_template(
+            self._client_phone(ticket, client), 'ticket_resolved',
+            **self._ticket_context(ticket)
+        )
+
+    def _ticket_context(self, ticket):
+        priority = ticket.priority if isinstance(ticket.priority, str) else ticket.priority.value
+        return {
+            'ticket_id': ticket.ticket_id,
+            'ticket_title': ticket.title,
+            'priority': priority.upper(),
+            'project_id': ticket.project_id
+        }
+
+    def _client_phone(self, ticket, client):
+        client = client or getattr(ticket, 'client', None)
+        return getattr(client, 'phone', None)
+
+    def _normalize(self, phone):
+        """'300 123-4567' -> 'whatsapp:+573001234567'"""
+        if not phone:
+            return None
+        phone = str(phone).strip()
+        if phone.startswith('whatsapp:'):
+            return phone
+        digits = ''.join(c for c in phone if c.isdigit())
+        if not digits:
+            return None
+        if not phone.startswith('+') and len(digits) <= 10:
+            digits = self.default_country_code + digits
+        return f'whatsapp:+{digits}'
+
+    # --- Cola ---------------------------------------------------------------
+
+    def _start(self):
+        """Arranca el despachador una vez por proceso (idempotente)"""
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            # Tras un fork no hay hilo: la cola heredada no es de este proceso
+            self._open = {}
+            self._heap = []
+            self._in_flight = 0
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='whatsapp-dispatcher', daemon=True).start()
+
+    def _push(self, group, delay):
+        heapq.heappush(self._heap, (time.time() + delay, next(self._seq), group))
+        self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._heap or self._heap[0][0] > time.time():
+                    self._cond.wait(self._heap[0][0] - time.time() if self._heap else None)
+                    continue
+                group = heapq.heappop(self._heap)[2]
+                if self._open.get(group.phone) is group:
+                    del self._open[group.phone]
+                self._in_flight += 1
+
+            try:
+                future = self.transport.submit(self._payload(group))
+                future.add_done_callback(lambda f, group=group: self._done(group, f))
+            except Exception as e:
+                print(f"[WHATSAPP] Error al despachar a {group.phone}: {e}")
+                self._done(group, None)
+
+    def _payload(self, group):
+        body = self.SEPARATOR.join(group.bodies)
+        if len(body) > self.MAX_BODY:
+            body = body[:self.MAX_BODY - 1] + '…'
+        return {
+            'From': f'whatsapp:{self.from_number.replace("whatsapp:", "")}',
+            'To': group.phone,
+            'Body': body
+        }
+
+    def _done(self, group, future):
+        # Corre en el hilo del event loop: solo anotar y, si toca, reprogramar
+        status, error = None, 'dispatch error'
+        if future is not None:
+            try:
+                response = future.result()
+                status, error = response.status_code, response.body[:300]
+            except Exception as e:
+                error = str(e) or type(e).__name__
+
+        with self._cond:
+            self._in_flight -= 1
+            if status in (200, 201):
+                self.stats['sent'] += 1
+                print(f"[WHATSAPP] ✓ Enviado a {group.phone} ({len(group.bodies)} mensaje(s))")
+                return
+
+            group.attempts += 1
+            if (status is None or status in self.RETRYABLE_STATUSES) and group.attempts < self.MAX_ATTEMPTS:
+                delay = self.BASE_BACKOFF * 2 ** (group.attempts - 1)
+                self.stats['retried'] += 1
+                self._push(group, delay / 2 + random.uniform(0, delay / 2))
+                print(f"[WHATSAPP] Reintento {group.attempts} para {group.phone} ({status or error})")
+            else:
+                self.stats['failed'] += 1
+                print(f"[WHATSAPP] ✗ Error enviando a {group.phone}: {status or ''} {error}")
+
+    def drain(self, timeout=60):
+        """Espera a que la cola se vacíe (scripts que terminan tras encolar)"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self._cond:
+                if not self._heap and not self._in_flight:
+                    return True
+            time.sleep(0.1)
+        return False
+
+    def get_status(self):
+        with self._cond:
+            return {
+                'enabled': self.enabled,
+                'queued': len(self._heap),
+                'in_flight': self._in_flight,
+                'stats': dict(self.stats)
+            }
+
+
+# Singleton instance (se construye en el primer uso)
+whatsapp_dispatcher = lazy_service('whatsapp_dispatcher', WhatsAppDispatcher)
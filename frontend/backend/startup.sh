@@ -1,7 +1,7 @@
 #!/bin/bash
 
 # Startup script for backend - drops audit_logs table before starting app
-# This allows SQLAlchemy to recreate it correctly
+# This allows src/migrate.py to recreate it correctly
 
 echo "Running pre-startup migration..."
 
@@ -12,11 +12,16 @@ python3 apply_migration.py
 echo "Running additional migrations..."
 python3 run_migrations.py
 
+# Versioned schema migrations (src/migrate.py); runs after the scripts above so
+# dropped tables are recreated here. Workers no longer run DDL on import
+python3 src/migrate.py
+MIGRATE_STATUS=$?
+
 # Fix timestamps in existing tickets (DISABLED TEMPORARILY)
 # echo "Fixing timestamps in existing tickets..."
 # python3 fix_timestamps_migration.py || echo "⚠ Timestamp migration failed, continuing anyway..."
 
-if [ $? -eq 0 ]; then
+if [ $MIGRATE_STATUS -eq 0 ]; then
     echo "✓ Migrations completed successfully"
 else
     echo "⚠ Some migrations failed, but continuing anyway..."
@@ -24,5 +29,6 @@ fi
 
 # Start the application
 echo "Starting application..."
-exec gunicorn wsgi:app --bind 0.0.0.0:$PORT --workers 2 --timeout 120 --access-logfile - --error-logfile -
+# Workers, worker class (gthread by default), threads and DB pool: gunicorn.conf.py
+exec gunicorn wsgi:app -c gunicorn.conf.py
 
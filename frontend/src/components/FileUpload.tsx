@@ -14,6 +14,10 @@ interface UploadingFile {
   error?: string;
 }
 
+// Límites por petición (el backend acepta 50MB por request y 20 archivos por lote)
+const MAX_BATCH_FILES = 10;
+const MAX_BATCH_BYTES = 45 * 1024 * 1024;
+
 const FileUpload: React.FC<FileUploadProps> = ({ ticketId, onUploadComplete }) => {
   const [isDragging, setIsDragging] = useState(false);
   const [uploadingFiles, setUploadingFiles] = useState<UploadingFile[]>([]);
@@ -72,58 +76,78 @@ const FileUpload: React.FC<FileUploadProps> = ({ ticketId, onUploadComplete }) =
 
     setUploadingFiles(prev => [...prev, ...newUploadingFiles]);
 
-    // Upload each file
-    for (let i = 0; i < validFiles.length; i++) {
-      await uploadFile(validFiles[i], uploadingFiles.length + i);
+    // Agrupar en lotes: una sola petición sube varios archivos en paralelo
+    const batches: { file: File; index: number }[][] = [];
+    let current: { file: File; index: number }[] = [];
+    let currentSize = 0;
+    validFiles.forEach((file, i) => {
+      if (current.length > 0 && (current.length >= MAX_BATCH_FILES || currentSize + file.size > MAX_BATCH_BYTES)) {
+        batches.push(current);
+        current = [];
+        currentSize = 0;
+      }
+      current.push({ file, index: uploadingFiles.length + i });
+      currentSize += file.size;
+    });
+    if (current.length > 0) batches.push(current);
+
+    for (const batch of batches) {
+      await uploadBatch(batch);
     }
   };
 
-  const uploadFile = async (file: File, index: number) => {
+  const updateFile = (index: number, changes: Partial<UploadingFile>) => {
+    setUploadingFiles(prev => {
+      const updated = [...prev];
+      if (updated[index]) {
+        updated[index] = { ...updated[index], ...changes };
+      }
+      return updated;
+    });
+  };
+
+  const uploadBatch = async (batch: { file: File; index: number }[]) => {
     const formData = new FormData();
-    formData.append('file', file);
+    batch.forEach(({ file }) => formData.append('files', file));
     formData.append('ticket_id', ticketId);
 
     try {
-      await api.uploadAttachment(formData, (progressEvent) => {
+      const data = await api.uploadAttachmentsBatch(formData, (progressEvent) => {
         const progress = progressEvent.total
           ? Math.round((progressEvent.loaded * 100) / progressEvent.total)
           : 0;
-        
-        setUploadingFiles(prev => {
-          const updated = [...prev];
-          if (updated[index]) {
-            updated[index].progress = progress;
-          }
-          return updated;
-        });
+        batch.forEach(({ index }) => updateFile(index, { progress }));
       });
+      applyResults(batch, data.results || []);
+    } catch (error: any) {
+      console.error('Error uploading files:', error);
+      const results = error.response?.data?.results;
+      if (results) {
+        applyResults(batch, results);
+      } else {
+        const message = error.response?.data?.error || 'Error al subir archivo';
+        batch.forEach(({ index }) => updateFile(index, { status: 'error', error: message }));
+      }
+    }
+  };
 
-      // Mark as success
-      setUploadingFiles(prev => {
-        const updated = [...prev];
-        if (updated[index]) {
-          updated[index].status = 'success';
-          updated[index].progress = 100;
-        }
-        return updated;
-      });
+  const applyResults = (batch: { file: File; index: number }[], results: any[]) => {
+    batch.forEach(({ index }, i) => {
+      const result = results[i];
+      if (result?.success) {
+        updateFile(index, { status: 'success', progress: 100 });
+      } else {
+        updateFile(index, { status: 'error', error: result?.error || 'Error al subir archivo' });
+      }
+    });
 
-      // Remove from list after 2 seconds
+    // Remove successful uploads from list after 2 seconds
+    if (results.some(result => result?.success)) {
+      const done = new Set(batch.filter((_, i) => results[i]?.success).map(({ index }) => index));
       setTimeout(() => {
-        setUploadingFiles(prev => prev.filter((_, i) => i !== index));
+        setUploadingFiles(prev => prev.filter((_, i) => !done.has(i)));
         onUploadComplete();
       }, 2000);
-
-    } catch (error: any) {
-      console.error('Error uploading file:', error);
-      setUploadingFiles(prev => {
-        const updated = [...prev];
-        if (updated[index]) {
-          updated[index].status = 'error';
-          updated[index].error = error.response?.data?.error || 'Error al subir archivo';
-        }
-        return updated;
-      });
     }
   };
 
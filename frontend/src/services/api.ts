@@ -214,6 +214,16 @@ class ApiService {
     return response.data;
   }
 
+  async uploadAttachmentsBatch(formData: FormData, onProgress?: (progressEvent: any) => void) {
+    const response = await this.api.post('/attachments/upload-batch', formData, {
+      headers: {
+        'Content-Type': 'multipart/form-data',
+      },
+      onUploadProgress: onProgress,
+    });
+    return response.data;
+  }
+
   async getTicketAttachments(ticketId: string) {
     const response = await this.api.get(`/attachments/ticket/${ticketId}`);
     return response.data;